@@ -0,0 +1,133 @@
+"""
+N parallel askers against the database, with an uploader writing at the
+same time: fresh default connections per query vs the shared WAL pool.
+
+    python -m bench.concurrency --askers 8 --employees 200000 --seconds 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from bench.synth import build_database
+from db_pool import ConnectionPool
+
+
+QUERIES = [
+    "SELECT department, AVG(salary) FROM employees GROUP BY department",
+    "SELECT COUNT(*) FROM employees WHERE salary > 100000",
+    "SELECT e.name, p.project_name FROM employees e "
+    "JOIN employee_projects ep ON ep.employee_id = e.id "
+    "JOIN projects p ON p.id = ep.project_id WHERE e.id % 997 = 0",
+    "SELECT name, salary FROM employees ORDER BY salary DESC LIMIT 10",
+]
+
+
+def run_fresh(path, sql):
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def run_pooled(pool, sql):
+    with pool.read() as conn:
+        return conn.execute(sql).fetchall()
+
+
+def uploader(write, stop, stats):
+    """Keeps inserting small batches, like repeated CSV uploads."""
+    batch = [("bench", "Sales", 50000, "2024-01-01")] * 200
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            write(batch)
+            stats["writes"] += 1
+        except sqlite3.OperationalError:
+            stats["write_errors"] += 1
+        stats["write_ms"].append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.01)
+
+
+def bench(label, ask, write, askers, seconds):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+    wstats = {"writes": 0, "write_errors": 0, "write_ms": []}
+
+    def asker(i):
+        n = i
+        while not stop.is_set():
+            sql = QUERIES[n % len(QUERIES)]
+            n += 1
+            t0 = time.perf_counter()
+            try:
+                ask(sql)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=asker, args=(i,)) for i in range(askers)]
+    threads.append(threading.Thread(target=uploader, args=(write, stop, wstats)))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    lat = sorted(latencies) or [0.0]
+    wlat = sorted(wstats["write_ms"]) or [0.0]
+    print(
+        f"{label:8} {len(latencies) / seconds:8.1f} q/s  "
+        f"p50 {statistics.median(lat):7.1f} ms  p95 {lat[int(len(lat) * 0.95)]:7.1f} ms  "
+        f"read errors {errors[0]:3}  writes {wstats['writes']:4} "
+        f"(p95 {wlat[int(len(wlat) * 0.95)]:6.1f} ms, errors {wstats['write_errors']})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--askers", type=int, default=8)
+    parser.add_argument("--employees", type=int, default=200_000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    insert = "INSERT INTO employees (name, department, salary, hire_date) VALUES (?, ?, ?, ?)"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_database(os.path.join(tmp, "bench.db"), n_employees=args.employees)
+
+        # Baseline: rollback journal, default pragmas, connect per query
+        def fresh_write(batch):
+            conn = sqlite3.connect(path, timeout=5)
+            try:
+                conn.executemany(insert, batch)
+                conn.commit()
+            finally:
+                conn.close()
+
+        bench("fresh", lambda sql: run_fresh(path, sql), fresh_write,
+              args.askers, args.seconds)
+
+        pool = ConnectionPool(path, size=args.askers)
+
+        def pooled_write(batch):
+            with pool.write() as conn:
+                conn.executemany(insert, batch)
+
+        bench("pooled", lambda sql: run_pooled(pool, sql), pooled_write,
+              args.askers, args.seconds)
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
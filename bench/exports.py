@@ -0,0 +1,103 @@
+"""
+Download generation for a large result: the old eager DataFrame exports
+(to_csv / to_excel / one reportlab Table) vs the streaming writers.
+Reports time-to-file and peak Python memory (tracemalloc).
+
+    python -m bench.exports --rows 1000000 --old-rows 20000
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from exports import ExportCache
+from sql_executor import QueryResult
+
+
+COLUMNS = ["id", "name", "department", "salary", "hire_date"]
+DEPARTMENTS = ["Engineering", "Sales", "HR", "Finance", "Marketing"]
+
+
+def make_result(n_rows, seed=0):
+    rng = random.Random(seed)
+    result = QueryResult(COLUMNS)
+    chunk = 100_000
+    for start in range(0, n_rows, chunk):
+        result.extend([
+            (i, f"employee_{i}", rng.choice(DEPARTMENTS), rng.randint(30000, 200000),
+             f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+            for i in range(start, min(start + chunk, n_rows))
+        ])
+    return result
+
+
+def old_csv(result):
+    return result.to_frame().to_csv(index=False).encode("utf-8")
+
+
+def old_excel(result):
+    buf = io.BytesIO()
+    result.to_frame().to_excel(buf, index=False, sheet_name="Results")
+    return buf.getvalue()
+
+
+def old_pdf(result):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table
+
+    df = result.to_frame()
+    buf = io.BytesIO()
+    SimpleDocTemplate(buf, pagesize=letter).build(
+        [Table([df.columns.tolist()] + df.values.tolist())]
+    )
+    return buf.getvalue()
+
+
+TRACE = True
+
+
+def measure(label, fn):
+    # tracemalloc slows allocation-heavy code a lot; --no-trace for timings
+    if TRACE:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+    peak = f"peak {tracemalloc.get_traced_memory()[1] / 1e6:8.1f} MB" if TRACE else ""
+    tracemalloc.stop()
+    print(f"{label:16} {seconds:8.2f} s  {peak}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--old-rows", type=int, default=20_000,
+                        help="rows for the eager exports (reportlab's single Table is very slow)")
+    parser.add_argument("--no-trace", action="store_true",
+                        help="time only, without tracemalloc overhead")
+    args = parser.parse_args()
+
+    global TRACE
+    TRACE = not args.no_trace
+
+    with tempfile.TemporaryDirectory() as tmp:
+        small = make_result(args.old_rows)
+        print(f"eager exports, {args.old_rows:,} rows")
+        for label, fn in (("csv", old_csv), ("excel", old_excel), ("pdf", old_pdf)):
+            small._frame = None
+            measure(label, lambda: fn(small))
+
+        big = make_result(args.rows)
+        cache = ExportCache(os.path.join(tmp, "exports"))
+        print(f"streaming exports, {args.rows:,} rows")
+        for fmt in ("csv", "xlsx", "pdf"):
+            measure(fmt, lambda: cache.path(big, fmt))
+        measure("csv (cached)", lambda: cache.path(big, "csv"))
+        print("a rerun that shows the result but downloads nothing now builds 0 files")
+
+
+if __name__ == "__main__":
+    main()
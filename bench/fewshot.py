@@ -0,0 +1,188 @@
+"""
+Few-shot retrieval: first-try success rate and LLM calls per answered
+question, zero-shot vs prompts with the top similar verified examples.
+
+Offline, the LLM is a stub that behaves like a weak model: for the
+harder intents its zero-shot SQL is wrong (and only an LLM repair
+fixes it), but it follows a matching example when the prompt has one.
+That models the mechanism, not the real model; pass --live to run the
+same questions against Groq (needs GROQ_API_KEY). Answers count as
+correct when their rows match the gold SQL's.
+
+The store is filled by running training paraphrases first, and in the
+"confirmed" run a user also 👍s the right answer to each.
+
+    python -m bench.fewshot
+    python -m bench.fewshot --live
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+from difflib import SequenceMatcher
+
+from bench.llm import StubLLM, example_sql_of, failed_sql_of, question_of
+from bench.synth import build_database
+from fewshot import FewShotStore
+from langgraph_workflow import QueryPipeline, build_llm
+from sql_cache import SQLCache
+from templates import TemplateMatcher
+
+
+# gold: correct SQL; zero_shot: what the weak model writes without help
+INTENTS = [
+    {
+        "gold": "SELECT e.name, p.project_name FROM employees e "
+                "JOIN employee_projects ep ON ep.employee_id = e.id "
+                "JOIN projects p ON p.id = ep.project_id",
+        "zero_shot": "SELECT e.name, p.project_name FROM employees e "
+                     "JOIN projects p ON p.id = e.project_id",
+        "train": ["Which projects is each employee working on?",
+                  "Show every employee and the projects they are assigned to"],
+        "test": ["What projects does each employee work on?",
+                 "For each employee list the projects they work on"],
+    },
+    {
+        "gold": "SELECT d.department_name, COUNT(p.id) AS projects FROM departments d "
+                "LEFT JOIN projects p ON p.department_id = d.id GROUP BY d.department_name",
+        "zero_shot": "SELECT d.department_name, COUNT(*) AS projects FROM departments d "
+                     "JOIN projects p ON p.department = d.department_name GROUP BY d.department_name",
+        "train": ["How many projects does each department run?",
+                  "Number of projects per department"],
+        "test": ["Count the projects in each department",
+                 "How many projects are there per department?"],
+    },
+    {
+        "gold": "SELECT e.name, ep.role FROM employees e "
+                "JOIN employee_projects ep ON ep.employee_id = e.id",
+        "zero_shot": "SELECT name, role FROM employees",
+        "train": ["What role does each employee have on their projects?",
+                  "Show employees and their project roles"],
+        "test": ["List each employee with their role on projects",
+                 "Which role does every employee play in projects?"],
+    },
+    {
+        "gold": "SELECT department, AVG(salary) AS avg_salary FROM employees GROUP BY department",
+        "zero_shot": "SELECT department, AVG(salary) AS avg_salary FROM employees GROUP BY department",
+        "train": ["What is the average salary in each department?"],
+        "test": ["Average salary per department",
+                 "Show the mean salary by department"],
+    },
+    {
+        "gold": "SELECT d.manager, COUNT(e.id) AS employees FROM departments d "
+                "JOIN employees e ON e.department = d.department_name GROUP BY d.manager",
+        "zero_shot": "SELECT d.manager, COUNT(e.id) AS employees FROM departments d "
+                     "JOIN employees e ON e.department_id = d.id GROUP BY d.manager",
+        "train": ["How many employees does each manager have?"],
+        "test": ["Number of employees under each manager",
+                 "Count employees per department manager"],
+    },
+]
+
+
+def intent_of(question):
+    for intent in INTENTS:
+        if question in intent["train"] + intent["test"]:
+            return intent
+    return None
+
+
+def stub_answer(prompt):
+    failed = failed_sql_of(prompt)
+    if failed is not None:
+        # Repairs always succeed: the intent whose zero-shot SQL this was
+        best = max(INTENTS, key=lambda i: SequenceMatcher(None, failed, i["zero_shot"]).ratio())
+        return best["gold"]
+
+    intent = intent_of(question_of(prompt))
+    if intent is None:
+        return "SELECT 1"
+    if intent["gold"] in example_sql_of(prompt):
+        return intent["gold"]
+    return intent["zero_shot"]
+
+
+class Counted:
+    """Counts the LLM calls the pipeline makes (stub or live)."""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.calls = 0
+
+    def stream(self, prompt):
+        self.calls += 1
+        return self.llm.stream(prompt)
+
+    def astream(self, prompt):
+        self.calls += 1
+        return self.llm.astream(prompt)
+
+
+class NoExamples(FewShotStore):
+    """Zero-shot baseline: stores examples but never retrieves any."""
+
+    def similar(self, question, tables=None, **kwargs):
+        return []
+
+
+def same_rows(db_path, result, sql):
+    """Whether a result holds the rows the gold SQL returns (any order)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        expected = conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    return sorted(map(repr, result.iter_rows())) == sorted(map(repr, expected))
+
+
+def run(label, db_path, store, llm, confirm=False):
+    pipeline = QueryPipeline(
+        db_path, llm=llm, fewshot=store,
+        sql_cache=SQLCache(":memory:", fuzzy_threshold=0),
+        templates=TemplateMatcher(enabled=False),
+    )
+    # Training questions fill the store from their runs; with confirm,
+    # a user also 👍s the correct answer to each
+    for intent in INTENTS:
+        for question in intent["train"]:
+            pipeline.run(question)
+            if confirm:
+                pipeline.confirm(question, intent["gold"])
+
+    calls_before = llm.calls
+    answered = first_try = 0
+    tests = [q for intent in INTENTS for q in intent["test"]]
+    for question in tests:
+        res = pipeline.run(question)
+        # Answered = the right rows (a local name-guess fix may run but be wrong)
+        if res["error"] is None and same_rows(db_path, res["result"], intent_of(question)["gold"]):
+            answered += 1
+            first_try += res["repaired_by"] is None
+
+    calls = llm.calls - calls_before
+    print(
+        f"{label:22} first try {first_try}/{len(tests)} ({first_try / len(tests):4.0%})  "
+        f"answered {answered}/{len(tests)}  "
+        f"LLM calls/answered {calls / answered if answered else float('nan'):.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", action="store_true", help="use the Groq model")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_database(os.path.join(tmp, "bench.db"), n_employees=200)
+        def llm():
+            return Counted(build_llm() if args.live else StubLLM(stub_answer))
+
+        run("zero-shot", db_path, NoExamples(os.path.join(tmp, "none.db")), llm())
+        run("few-shot (self-filled)", db_path,
+            FewShotStore(os.path.join(tmp, "filled.db")), llm())
+        run("few-shot (confirmed)", db_path,
+            FewShotStore(os.path.join(tmp, "confirmed.db")), llm(), confirm=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+CSV upload: pandas read_csv + to_sql vs the streaming ingest path, then
+the same data as Parquet, Arrow IPC and JSONL (needs pyarrow).
+Reports wall time, rows/s and peak Python memory (tracemalloc).
+
+    python -m bench.ingest --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from db_pool import ConnectionPool
+from ingest import ingest_csv, ingest_file
+
+
+DEPARTMENTS = ["Engineering", "Sales", "HR", "Finance", "Marketing"]
+
+
+def write_csv(path, n_rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,name,department,salary,rating,hire_date\n")
+        for i in range(n_rows):
+            f.write(
+                f"{i},employee_{i},{rng.choice(DEPARTMENTS)},{rng.randint(30000, 200000)},"
+                f"{rng.random() * 5:.2f},20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}\n"
+            )
+
+
+def measure(label, load, n_rows):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{label:10} {seconds:7.2f} s  {n_rows / seconds:10,.0f} rows/s  "
+        f"peak {peak / 1e6:8.1f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "upload.csv")
+        write_csv(csv_path, args.rows)
+        print(f"{args.rows:,} rows, {os.path.getsize(csv_path) / 1e6:.0f} MB of CSV")
+
+        def pandas_load():
+            import pandas as pd
+
+            conn = sqlite3.connect(os.path.join(tmp, "pandas.db"))
+            pd.read_csv(csv_path).to_sql("upload", conn, if_exists="replace", index=False)
+            conn.close()
+
+        measure("pandas", pandas_load, args.rows)
+
+        pool = ConnectionPool(os.path.join(tmp, "stream.db"))
+
+        def stream_load():
+            with open(csv_path, "rb") as f:
+                ingest_csv(pool, f, "upload")
+
+        measure("streaming", stream_load, args.rows)
+
+        try:
+            import pyarrow.csv
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            print("pyarrow not installed; skipping Parquet / Arrow / JSONL")
+            pool.close()
+            return
+
+        data = pyarrow.csv.read_csv(csv_path)
+        paths = {fmt: os.path.join(tmp, f"upload.{fmt}") for fmt in ("parquet", "arrow", "jsonl")}
+        pyarrow.parquet.write_table(data, paths["parquet"], row_group_size=100_000)
+        with pyarrow.ipc.new_file(paths["arrow"], data.schema) as writer:
+            writer.write_table(data, max_chunksize=100_000)
+        data.to_pandas().to_json(paths["jsonl"], orient="records", lines=True)
+        del data
+
+        for fmt, path in paths.items():
+            measure(fmt, lambda: ingest_file(pool, path, "upload"), args.rows)
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
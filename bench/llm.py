@@ -0,0 +1,87 @@
+import asyncio
+import re
+import time
+
+
+# ====================================================
+#        DETERMINISTIC STAND-IN FOR ChatGroq
+# ====================================================
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubLLM:
+    """
+    Offline replacement for the Groq client with the interface the
+    pipeline uses (invoke/ainvoke/stream/astream). `answer(prompt)`
+    returns the completion text; it is streamed in `chunk_chars` pieces
+    after `latency` seconds (time to first token) plus `per_chunk`
+    seconds per piece.
+    """
+
+    def __init__(self, answer, latency=0.0, per_chunk=0.0, chunk_chars=8):
+        self.answer = answer
+        self.latency = latency
+        self.per_chunk = per_chunk
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.chunks_sent = 0
+
+    def _pieces(self, prompt):
+        self.calls += 1
+        text = self.answer(prompt)
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def invoke(self, prompt):
+        pieces = self._pieces(prompt)
+        time.sleep(self.latency + self.per_chunk * len(pieces))
+        self.chunks_sent += len(pieces)
+        return Chunk("".join(pieces))
+
+    async def ainvoke(self, prompt):
+        pieces = self._pieces(prompt)
+        await asyncio.sleep(self.latency + self.per_chunk * len(pieces))
+        self.chunks_sent += len(pieces)
+        return Chunk("".join(pieces))
+
+    def stream(self, prompt):
+        pieces = self._pieces(prompt)
+        time.sleep(self.latency)
+        for piece in pieces:
+            time.sleep(self.per_chunk)
+            self.chunks_sent += 1
+            yield Chunk(piece)
+
+    async def astream(self, prompt):
+        pieces = self._pieces(prompt)
+        await asyncio.sleep(self.latency)
+        for piece in pieces:
+            await asyncio.sleep(self.per_chunk)
+            self.chunks_sent += 1
+            yield Chunk(piece)
+
+
+# ====================================================
+#        PROMPT PARSING (FOR ANSWER FUNCTIONS)
+# ====================================================
+
+_QUESTION = re.compile(r"USER QUESTION:\n(.*?)\n", re.S)
+_FAILED = re.compile(r"FAILED SQL:\n(.*?)\n\n", re.S)
+_EXAMPLE_SQL = re.compile(r"^SQL: (.*)$", re.M)
+
+
+def question_of(prompt):
+    match = _QUESTION.search(prompt)
+    return match.group(1).strip() if match else None
+
+
+def failed_sql_of(prompt):
+    """The SQL a repair prompt asks to fix (None for generation prompts)."""
+    match = _FAILED.search(prompt)
+    return match.group(1).strip() if match else None
+
+
+def example_sql_of(prompt):
+    return [sql.strip() for sql in _EXAMPLE_SQL.findall(prompt)]
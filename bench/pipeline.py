@@ -0,0 +1,241 @@
+"""
+End-to-end run_graph benchmark, fully offline: synthetic copies of the
+create_db.py schema (plus wide uploaded-CSV-style tables) at growing
+sizes, with ChatGroq replaced by the deterministic StubLLM.
+
+Per scale it reports latency (cold = empty SQL cache, warm = repeated
+questions), batch throughput, peak RSS and mean time per stage (from
+the pipeline's trace spans). Each scale runs in its own subprocess so
+peak RSS is not inherited from the previous one.
+
+    python -m bench.pipeline --scales 1000 10000 100000
+    python -m bench.pipeline --scales 1000 10000000 --latency 0.3
+    python -m bench.pipeline --json out.json --baseline base.json --tolerance 1.5
+
+With --baseline, exits 1 when a scale's p50/p95 latency grows, or its
+throughput drops, by more than --tolerance times the baseline.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.synth import build_database
+
+
+# Questions the stub answers (the template-shaped ones never reach it)
+STUB_SQL = {
+    "Average salary per department":
+        "SELECT department, AVG(salary) AS avg_salary FROM employees GROUP BY department",
+    "How many employees earn more than 100k?":
+        "SELECT COUNT(*) FROM employees WHERE salary > 100000",
+    "Which projects does each employee work on?":
+        "SELECT e.name, p.project_name FROM employees e "
+        "JOIN employee_projects ep ON ep.employee_id = e.id "
+        "JOIN projects p ON p.id = ep.project_id",
+    "How many employees does each manager have?":
+        "SELECT d.manager, COUNT(e.id) FROM departments d "
+        "JOIN employees e ON e.department = d.department_name GROUP BY d.manager",
+}
+
+TEMPLATE_QUESTIONS = [
+    "List all tables and their row counts",
+    "Top 5 rows by salary in employees",
+    "Show average, min and max of salary in employees",
+]
+
+
+def wide_questions(db_path):
+    """One GROUP BY question per wide table, on its first column."""
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    tables = [
+        t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        if t not in ("employees", "departments", "projects", "employee_projects")
+        and not t.startswith("sqlite_")
+    ]
+    questions = {}
+    for table in tables[:3]:
+        column = conn.execute(f'PRAGMA table_info("{table}")').fetchone()[1]
+        questions[f"Count rows by {column} in {table}"] = (
+            f'SELECT "{column}", COUNT(*) FROM "{table}" GROUP BY "{column}"'
+        )
+    conn.close()
+    return questions
+
+
+def stub_answer(sql_by_question):
+    from bench.llm import failed_sql_of, question_of
+
+    def answer(prompt):
+        if failed_sql_of(prompt) is not None:
+            return "SELECT 1"
+        sql = sql_by_question.get(question_of(prompt), "SELECT COUNT(*) FROM employees")
+        # Fenced with trailing chatter, like the real model; the
+        # extractor should stop reading at the closing fence
+        return f"```sql\n{sql};\n```\nThis query answers the question by ..."
+
+    return answer
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+# ====================================================
+#        ONE SCALE (RUNS IN A SUBPROCESS)
+# ====================================================
+
+def run_scale(db_path, args):
+    import langgraph_workflow
+    from bench.llm import StubLLM
+    from langgraph_workflow import QueryPipeline, run_batch, run_graph
+    from sql_cache import SQLCache
+
+    sql_by_question = {**STUB_SQL, **wide_questions(db_path)}
+    questions = TEMPLATE_QUESTIONS + list(sql_by_question)
+    llm = StubLLM(stub_answer(sql_by_question), latency=args.latency,
+                  per_chunk=args.per_chunk)
+
+    # run_graph end to end, on this database instead of database.db
+    langgraph_workflow._pipeline = QueryPipeline(
+        db_path, llm=llm, sql_cache=SQLCache(":memory:")
+    )
+
+    stages = {}
+    latencies = {"cold": [], "warm": []}
+    errors = 0
+    for phase in ("cold", "warm"):
+        for question in questions:
+            t0 = time.perf_counter()
+            res = run_graph(question)
+            latencies[phase].append((time.perf_counter() - t0) * 1000)
+            errors += res["error"] is not None
+            for span in res["trace"]["spans"]:
+                stages.setdefault(span["name"], []).append(span["duration_ms"])
+            if res["result"] is not None:
+                res["result"].close()
+
+    batch = questions * args.batch_repeat
+    t0 = time.perf_counter()
+    answers = run_batch(batch, concurrency=args.concurrency, timeout=args.timeout)
+    seconds = time.perf_counter() - t0
+    for res in answers:
+        if res["result"] is not None:
+            res["result"].close()
+
+    everything = latencies["cold"] + latencies["warm"]
+    return {
+        "questions": len(questions),
+        "errors": errors,
+        "cold_p50_ms": round(statistics.median(latencies["cold"]), 2),
+        "warm_p50_ms": round(statistics.median(latencies["warm"]), 2),
+        "p50_ms": round(statistics.median(everything), 2),
+        "p95_ms": round(percentile(everything, 0.95), 2),
+        "throughput_qps": round(len(batch) / seconds, 2),
+        "llm_calls": llm.calls,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages_ms": {name: round(statistics.mean(ms), 3) for name, ms in stages.items()},
+    }
+
+
+# ====================================================
+#        DRIVER
+# ====================================================
+
+def compare(results, baseline, tolerance):
+    """Regression messages for metrics worse than tolerance x baseline."""
+    problems = []
+    for scale, now in results.items():
+        before = baseline.get(scale)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if now[metric] > before[metric] * tolerance:
+                problems.append(f"{scale} rows: {metric} {before[metric]} -> {now[metric]}")
+        if now["throughput_qps"] < before["throughput_qps"] / tolerance:
+            problems.append(
+                f"{scale} rows: throughput_qps {before['throughput_qps']} -> {now['throughput_qps']}"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="employee rows per database (10^3 .. 10^7)")
+    parser.add_argument("--wide-tables", type=int, default=10,
+                        help="uploaded-CSV-style tables, each with scale/10 rows")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="stub LLM seconds to first token")
+    parser.add_argument("--per-chunk", type=float, default=0.002,
+                        help="stub LLM seconds per streamed chunk")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-repeat", type=int, default=4,
+                        help="times the question set is repeated in the throughput batch")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="write the results here")
+    parser.add_argument("--baseline", help="earlier --json output to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scale(args.child, args)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            db_path = os.path.join(tmp, f"bench_{scale}.db")
+            t0 = time.perf_counter()
+            build_database(db_path, n_employees=scale, n_wide_tables=args.wide_tables,
+                           wide_rows=max(scale // 10, 20))
+            built = time.perf_counter() - t0
+
+            child = subprocess.run(
+                [sys.executable, "-m", "bench.pipeline", "--child", db_path] + sys.argv[1:],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            results[str(scale)] = result
+
+            print(
+                f"{scale:>10,} rows (built in {built:.1f}s)  "
+                f"cold p50 {result['cold_p50_ms']:8.1f} ms  warm p50 {result['warm_p50_ms']:8.1f} ms  "
+                f"p95 {result['p95_ms']:8.1f} ms  {result['throughput_qps']:7.1f} q/s  "
+                f"RSS {result['peak_rss_mb']:7.1f} MB  errors {result['errors']}"
+            )
+            print("           per stage (mean ms): " + ", ".join(
+                f"{name} {ms:.1f}" for name, ms in result["stages_ms"].items()
+            ))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Prompt size with and without relevant-table schema pruning.
+
+    python -m bench.prompt_tokens --tables 300 --top-k 5
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from bench.synth import build_database
+from langgraph_workflow import build_prompt
+from schema_cache import SchemaCache
+
+
+QUESTIONS = [
+    "List all employees with their project names",
+    "Average salary per department",
+    "Which employees were hired after 2020?",
+    "Total amount of orders by region",
+    "Count open tickets by priority",
+    "Top 5 customers by score",
+]
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """Rough BPE-like estimate: words and punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, default=300, help="extra wide tables")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_database(os.path.join(tmp, "bench.db"), n_wide_tables=args.tables)
+
+        cache = SchemaCache(path)
+        t0 = time.perf_counter()
+        snapshot = cache.get()
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"{len(snapshot.tables)} tables, schema cache + index built in {build_ms:.1f} ms")
+        print(f"{'question':48} {'full':>8} {'pruned':>8} {'tables':>7} {'rank ms':>8}")
+
+        total_full = total_pruned = 0
+        for q in QUESTIONS:
+            full = count_tokens(build_prompt(q, snapshot.render()))
+
+            t0 = time.perf_counter()
+            tables = snapshot.relevant_tables(q, args.top_k)
+            rank_ms = (time.perf_counter() - t0) * 1000
+            pruned = count_tokens(build_prompt(q, snapshot.render(tables)))
+
+            total_full += full
+            total_pruned += pruned
+            print(f"{q[:48]:48} {full:>8} {pruned:>8} {len(tables):>7} {rank_ms:>8.2f}")
+
+        print(f"\n≈tokens per prompt: {total_full // len(QUESTIONS)} → "
+              f"{total_pruned // len(QUESTIONS)} "
+              f"({100 * (1 - total_pruned / total_full):.1f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import random
+import sqlite3
+
+
+# ====================================================
+#        SYNTHETIC DATABASES FOR BENCHMARKS
+# ====================================================
+
+COMPANY_DDL = [
+    """
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        department TEXT,
+        salary INTEGER,
+        hire_date TEXT
+    )
+    """,
+    """
+    CREATE TABLE departments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        department_name TEXT,
+        manager TEXT
+    )
+    """,
+    """
+    CREATE TABLE projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_name TEXT,
+        department_id INTEGER,
+        start_date TEXT,
+        end_date TEXT,
+        FOREIGN KEY (department_id) REFERENCES departments(id)
+    )
+    """,
+    """
+    CREATE TABLE employee_projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER,
+        project_id INTEGER,
+        role TEXT,
+        FOREIGN KEY (employee_id) REFERENCES employees(id),
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    )
+    """,
+]
+
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Finance", "Support", "Legal"]
+ROLES = ["Developer", "Tech Lead", "Coordinator", "Sales Lead", "Analyst"]
+NAMES = ["Aarav", "Diya", "Kabir", "Neha", "Ravi", "Isha", "Arjun", "Meera"]
+
+TOPICS = [
+    "orders", "invoices", "shipments", "inventory", "customers", "suppliers",
+    "payments", "refunds", "tickets", "campaigns", "leads", "visits",
+    "sensors", "readings", "devices", "alerts", "contracts", "vendors",
+    "warehouses", "returns", "subscriptions", "plans", "coupons", "reviews",
+]
+FIELDS = [
+    "amount", "status", "region", "country", "city", "category", "priority",
+    "channel", "score", "quantity", "price", "discount", "currency", "owner",
+    "created_at", "updated_at", "code", "label", "weight", "rating",
+]
+VALUES = ["north", "south", "east", "west", "open", "closed", "pending",
+          "gold", "silver", "bronze", "web", "store", "phone", "email"]
+
+
+def build_company(conn, n_employees, seed=0):
+    """Creates the create_db.py schema with n_employees employee rows."""
+    rng = random.Random(seed)
+    cur = conn.cursor()
+    for ddl in COMPANY_DDL:
+        cur.execute(ddl)
+
+    cur.executemany(
+        "INSERT INTO departments (department_name, manager) VALUES (?, ?)",
+        [(d, rng.choice(NAMES)) for d in DEPARTMENTS],
+    )
+
+    n_projects = max(4, n_employees // 50)
+    cur.executemany(
+        "INSERT INTO projects (project_name, department_id, start_date, end_date) "
+        "VALUES (?, ?, ?, ?)",
+        (
+            (f"Project {i}", rng.randint(1, len(DEPARTMENTS)),
+             f"202{rng.randint(0, 4)}-01-01", f"202{rng.randint(5, 9)}-01-01")
+            for i in range(n_projects)
+        ),
+    )
+
+    cur.executemany(
+        "INSERT INTO employees (name, department, salary, hire_date) VALUES (?, ?, ?, ?)",
+        (
+            (f"{rng.choice(NAMES)} {i}", rng.choice(DEPARTMENTS),
+             rng.randint(40, 200) * 1000,
+             f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-01")
+            for i in range(n_employees)
+        ),
+    )
+
+    cur.executemany(
+        "INSERT INTO employee_projects (employee_id, project_id, role) VALUES (?, ?, ?)",
+        (
+            (i + 1, rng.randint(1, n_projects), rng.choice(ROLES))
+            for i in range(n_employees)
+        ),
+    )
+    conn.commit()
+
+
+def build_wide_tables(conn, n_tables, n_cols=12, n_rows=20, seed=0):
+    """Adds uploaded-CSV-style tables: untyped, many columns, no indexes."""
+    rng = random.Random(seed)
+    cur = conn.cursor()
+    names = []
+
+    for t in range(n_tables):
+        table = f"{TOPICS[t % len(TOPICS)]}_{t}"
+        cols = rng.sample(FIELDS, min(n_cols, len(FIELDS)))
+        col_sql = ", ".join(f'"{c}" TEXT' for c in cols)
+        cur.execute(f'CREATE TABLE "{table}" ({col_sql})')
+
+        marks = ", ".join("?" for _ in cols)
+        cur.executemany(
+            f'INSERT INTO "{table}" VALUES ({marks})',
+            (
+                tuple(rng.choice(VALUES) if rng.random() < 0.5 else rng.randint(0, 999)
+                      for _ in cols)
+                for _ in range(n_rows)
+            ),
+        )
+        names.append(table)
+
+    conn.commit()
+    return names
+
+
+def build_database(path, n_employees=1000, n_wide_tables=0, wide_rows=20):
+    conn = sqlite3.connect(path)
+    build_company(conn, n_employees)
+    if n_wide_tables:
+        build_wide_tables(conn, n_wide_tables, n_rows=wide_rows)
+    conn.close()
+    return path
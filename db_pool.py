@@ -0,0 +1,210 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# ====================================================
+#               TUNING (ENV OVERRIDABLE)
+# ====================================================
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024)))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+# ====================================================
+#               CONNECTION POOL
+# ====================================================
+
+class ConnectionPool:
+    """
+    Shared SQLite connections for the executor, debugger, schema cache
+    and uploader.
+
+    The database runs in WAL mode, so readers and the single writer do
+    not block each other. Reads get `mode=ro` URI connections from a
+    bounded pool (extra connections are opened on demand and closed on
+    release); writes are serialized through one read-write connection.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, cache_size_kib=CACHE_SIZE_KIB,
+                 mmap_size=MMAP_SIZE, busy_timeout_ms=BUSY_TIMEOUT_MS):
+        self.db_path = os.path.abspath(db_path)
+        self.size = size
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._readers = queue.LifoQueue(maxsize=size)
+        self._write_lock = threading.Lock()
+        self.writes = 0
+
+        # Creates the file if needed and switches it to WAL (persistent)
+        self._writer = self._connect(readonly=False)
+        self._writer.execute("PRAGMA journal_mode=WAL;")
+        self._writer.execute("PRAGMA synchronous=NORMAL;")
+
+        # Sees commits from other connections via PRAGMA data_version
+        self._monitor = self._connect(readonly=True)
+        self._monitor_lock = threading.Lock()
+        self._seen = self._data_version()
+        self._writing = False
+        self.external_epoch = 0
+
+    def _connect(self, readonly):
+        if readonly:
+            conn = sqlite3.connect(
+                Path(self.db_path).as_uri() + "?mode=ro", uri=True,
+                timeout=self.busy_timeout_ms / 1000, check_same_thread=False
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000, check_same_thread=False
+            )
+
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)};")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kib)};")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)};")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        return conn
+
+    # ---------------- read-only connections ----------------
+
+    def acquire(self):
+        """Checks out a read-only connection; pair with release()."""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            return self._connect(readonly=True)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._readers.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def read(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # ---------------- the writer ----------------
+
+    @contextmanager
+    def write(self):
+        """The read-write connection, one user at a time; commits on success."""
+        with self._write_lock:
+            # data_version is read before and after: a commit by another
+            # connection before this write is counted, not taken for ours
+            with self._monitor_lock:
+                self._check_external()
+                self._writing = True
+            try:
+                yield self._writer
+                self._writer.commit()
+                self.writes += 1
+            except Exception:
+                self._writer.rollback()
+                raise
+            finally:
+                with self._monitor_lock:
+                    self._seen = self._data_version()
+                    self._writing = False
+
+    # ---------------- data versions ----------------
+
+    def data_stamp(self, tables):
+        """
+        A value that changes whenever rows of `tables` may have changed:
+        their versions in the _qs_data_versions table (bumped by writers
+        through bump_data_version) plus an epoch that moves whenever a
+        connection outside this pool commits, since those writes are
+        not attributed to any table.
+        """
+        with self._monitor_lock:
+            if not self._writing:
+                self._check_external()
+
+            tables = sorted({t.lower() for t in tables})
+            try:
+                versions = self._monitor.execute(
+                    f"SELECT name, version FROM {VERSIONS_TABLE} "
+                    f"WHERE name IN ({', '.join('?' for _ in tables)})",
+                    tables
+                ).fetchall()
+            except sqlite3.OperationalError:      # nothing uploaded yet
+                versions = []
+        return (self.external_epoch, tuple(sorted(versions)))
+
+    def _data_version(self):
+        # Changes on every commit by a connection other than the monitor
+        return self._monitor.execute("PRAGMA data_version;").fetchone()[0]
+
+    def _check_external(self):
+        """
+        Moves the external epoch if anything committed since the last
+        look (hold the monitor lock). Pool writes resync the seen version
+        when they finish, so outside of one a change is someone else's.
+        """
+        version = self._data_version()
+        if version != self._seen:
+            self.external_epoch += 1
+            self._seen = version
+
+    def close(self):
+        with self._monitor_lock:
+            self._monitor.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
+
+
+# ====================================================
+#               DATA VERSIONS
+# ====================================================
+
+VERSIONS_TABLE = "_qs_data_versions"
+
+
+def bump_data_version(conn, table):
+    """Marks the rows of `table` as changed; call inside the write transaction."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} "
+        "(name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+    )
+    conn.execute(
+        f"INSERT INTO {VERSIONS_TABLE} VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+        (table.lower(),)
+    )
+
+
+# ====================================================
+#               PROCESS-WIDE REGISTRY
+# ====================================================
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """Returns the shared ConnectionPool for a database file."""
+    path = os.path.abspath(db_path)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
@@ -0,0 +1,189 @@
+import csv
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+
+# ====================================================
+#               SETTINGS (ENV OVERRIDABLE)
+# ====================================================
+
+EXPORT_DIR = os.getenv(
+    "EXPORT_DIR", os.path.join(tempfile.gettempdir(), "queryspeak_exports")
+)
+
+# Rows written per chunk; memory use is bounded by this, not the result
+EXPORT_CHUNK_ROWS = 10_000
+
+# reportlab lays out each Table in memory, so PDFs get one small Table per
+# page and stop after PDF_MAX_ROWS (a PDF of millions of rows helps nobody)
+PDF_ROWS_PER_TABLE = 30
+PDF_MAX_ROWS = int(os.getenv("PDF_MAX_ROWS", "50000"))
+
+# One Excel sheet holds 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+
+FORMATS = {
+    "csv": ("results.csv", "text/csv"),
+    "xlsx": ("results.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("results.pdf", "application/pdf"),
+}
+
+
+def _chunks(rows, size=EXPORT_CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ====================================================
+#               STREAMING WRITERS
+# ====================================================
+
+def write_csv(result, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(result.columns)
+        for chunk in _chunks(result.iter_rows()):
+            writer.writerows(chunk)
+
+
+def write_excel(result, path):
+    """openpyxl write-only mode: rows go to disk as they are appended."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    written = EXCEL_MAX_ROWS
+
+    for chunk in _chunks(result.iter_rows()):
+        for row in chunk:
+            if written == EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Results {len(workbook.worksheets) + 1}"
+                                              if workbook.worksheets else "Results")
+                sheet.append(result.columns)
+                written = 0
+            sheet.append(row)
+            written += 1
+
+    if sheet is None:
+        workbook.create_sheet("Results").append(result.columns)
+    workbook.save(path)
+
+
+def write_pdf(result, path, max_rows=PDF_MAX_ROWS):
+    """Paginated PDF: many small Tables instead of one huge one."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#7C3AED")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ])
+    header = [str(c) for c in result.columns]
+    shown = min(result.num_rows, max_rows)
+
+    story = []
+    for chunk in _chunks(result.iter_rows(stop=shown), PDF_ROWS_PER_TABLE):
+        rows = [["" if v is None else str(v) for v in row] for row in chunk]
+        table = Table([header] + rows, repeatRows=1)
+        table.setStyle(style)
+        story += [table, PageBreak()]
+
+    note = f"{shown:,} rows"
+    if shown < result.num_rows:
+        note = f"First {shown:,} of {result.num_rows:,} rows — download CSV or Excel for all of them."
+    story.append(Paragraph(note, getSampleStyleSheet()["Normal"]))
+
+    SimpleDocTemplate(path, pagesize=landscape(letter)).build(story)
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_excel, "pdf": write_pdf}
+
+
+# ====================================================
+#               CACHE BY RESULT ID
+# ====================================================
+
+class ExportCache:
+    """
+    Export files on disk, built on first request and keyed by result_id
+    and row count (loading more rows makes a new export). The newest
+    `capacity` files are kept; older ones are deleted.
+    """
+
+    def __init__(self, directory=EXPORT_DIR, capacity=32):
+        self.directory = directory
+        self.capacity = capacity
+        self.hits = 0
+        self.builds = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, result, fmt):
+        """Path of the export, writing it first if needed."""
+        key = (result.result_id, result.num_rows, fmt)
+
+        with self._lock:
+            if key in self._files and os.path.exists(self._files[key]):
+                self._files.move_to_end(key)
+                self.hits += 1
+                return self._files[key]
+            # One build per key; concurrent requests wait for it
+            key_lock = self._building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                with self._lock:
+                    if key in self._files and os.path.exists(self._files[key]):
+                        self.hits += 1
+                        return self._files[key]
+
+                path = os.path.join(
+                    self.directory, f"{result.result_id}_{result.num_rows}.{fmt}"
+                )
+                # Per-thread name: after a failed build, a waiter and a new
+                # request may both retry it
+                tmp = f"{path}.{threading.get_ident()}.part"
+                try:
+                    WRITERS[fmt](result, tmp)
+                    os.replace(tmp, path)
+                except BaseException:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+                    raise
+
+                with self._lock:
+                    self.builds += 1
+                    self._files[key] = path
+                    while len(self._files) > self.capacity:
+                        _, old = self._files.popitem(last=False)
+                        try:
+                            os.remove(old)
+                        except OSError:
+                            pass
+                return path
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def open_file(self, result, fmt):
+        """The export opened for reading in binary mode; the caller closes it."""
+        return open(self.path(result, fmt), "rb")
+
+    def stats(self):
+        return {"hits": self.hits, "builds": self.builds, "files": len(self._files)}
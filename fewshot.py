@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from sql_cache import normalize_question
+
+
+# ====================================================
+#               SETTINGS (ENV OVERRIDABLE)
+# ====================================================
+
+# Examples put into the generate_sql prompt
+FEWSHOT_K = int(os.getenv("FEWSHOT_K", "3"))
+
+# Cosine similarity an example needs to be worth showing
+FEWSHOT_MIN_SCORE = float(os.getenv("FEWSHOT_MIN_SCORE", "0.3"))
+
+# Stored examples; the oldest unconfirmed ones are dropped first
+FEWSHOT_MAX_EXAMPLES = int(os.getenv("FEWSHOT_MAX_EXAMPLES", "5000"))
+
+# Hashed feature space; collisions only blur scores a little
+VECTOR_DIM = 2048
+
+# Ranking bonus for user-confirmed (👍) examples over merely successful ones
+CONFIRMED_BONUS = 0.05
+
+
+# ====================================================
+#               HASHED N-GRAM VECTORS
+# ====================================================
+
+def _features(question):
+    """Words, word bigrams and character trigrams of the normalized question."""
+    words = normalize_question(question).split()
+    feats = list(words)
+    feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return feats
+
+
+def vectorize(question, dim=VECTOR_DIM):
+    """L2-normalized signed feature hashing (crc32, stable across processes)."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feat in _features(question):
+        h = zlib.crc32(feat.encode("utf-8"))
+        vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+# ====================================================
+#               STORE
+# ====================================================
+
+class FewShotStore:
+    """
+    Verified (question, SQL) pairs for few-shot prompting, kept in a
+    local SQLite file and mirrored into a NumPy matrix of question
+    vectors, so retrieval is one matrix-vector product.
+
+    Pairs come from runs whose SQL executed ("run") and from results a
+    user confirmed ("confirmed", ranked slightly higher and never
+    overwritten by a run). Each pair remembers the tables its SQL reads;
+    pairs naming a table the current schema lacks are never retrieved.
+    """
+
+    def __init__(self, path, max_examples=FEWSHOT_MAX_EXAMPLES, dim=VECTOR_DIM):
+        self.path = path
+        self.max_examples = max_examples
+        self.dim = dim
+        self.lookups = 0
+        self.served = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fewshot (
+                key TEXT PRIMARY KEY,
+                question TEXT,
+                sql TEXT,
+                tables TEXT,
+                source TEXT,
+                created REAL
+            )
+        """)
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT key, question, sql, tables, source FROM fewshot ORDER BY created"
+        ).fetchall()
+        self._examples = [
+            {"key": key, "question": q, "sql": sql, "tables": json.loads(tables), "source": source}
+            for key, q, sql, tables, source in rows
+        ]
+        self._index = {ex["key"]: i for i, ex in enumerate(self._examples)}
+        self._matrix = np.zeros((max(len(rows), 64), self.dim), dtype=np.float32)
+        for i, ex in enumerate(self._examples):
+            self._matrix[i] = vectorize(ex["question"], self.dim)
+
+    def add(self, question, sql, tables, source="run"):
+        key = normalize_question(question)
+        if not key or not sql:
+            return
+
+        with self._lock:
+            i = self._index.get(key)
+            if i is not None and self._examples[i]["source"] == "confirmed" and source != "confirmed":
+                return
+
+            example = {"key": key, "question": question, "sql": sql,
+                       "tables": sorted(tables), "source": source}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fewshot VALUES (?, ?, ?, ?, ?, ?)",
+                (key, question, sql, json.dumps(example["tables"]), source, time.time())
+            )
+            self._conn.commit()
+
+            if i is None:
+                i = len(self._examples)
+                if i == len(self._matrix):
+                    grown = np.zeros((2 * i, self.dim), dtype=np.float32)
+                    grown[:i] = self._matrix
+                    self._matrix = grown
+                self._examples.append(example)
+                self._index[key] = i
+            self._examples[i] = example
+            self._matrix[i] = vectorize(question, self.dim)
+
+            if len(self._examples) > self.max_examples:
+                self._evict()
+
+    def _evict(self):
+        """Drops the oldest unconfirmed examples (under self._lock)."""
+        excess = len(self._examples) - self.max_examples
+        self._conn.execute(
+            "DELETE FROM fewshot WHERE key IN ("
+            "SELECT key FROM fewshot ORDER BY source = 'confirmed', created LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._load()
+
+    def similar(self, question, tables=None, k=FEWSHOT_K, min_score=FEWSHOT_MIN_SCORE):
+        """
+        Up to k examples most similar to the question, best first, as
+        dicts with question, sql, source and score. With `tables` (the
+        current schema's table names), only examples whose SQL reads
+        nothing but those tables are returned.
+        """
+        with self._lock:
+            n = len(self._examples)
+            self.lookups += 1
+            if not n or not k:
+                return []
+
+            scores = self._matrix[:n] @ vectorize(question, self.dim)
+            scores += np.array(
+                [CONFIRMED_BONUS if ex["source"] == "confirmed" else 0.0 for ex in self._examples],
+                dtype=np.float32
+            )
+            allowed = None if tables is None else {t.lower() for t in tables}
+
+            found = []
+            for i in np.argsort(-scores):
+                if scores[i] < min_score or len(found) == k:
+                    break
+                ex = self._examples[i]
+                if allowed is not None and not {t.lower() for t in ex["tables"]} <= allowed:
+                    continue
+                found.append({**ex, "score": round(float(scores[i]), 3)})
+
+            if found:
+                self.served += 1
+            return found
+
+    def stats(self):
+        with self._lock:
+            confirmed = sum(ex["source"] == "confirmed" for ex in self._examples)
+            return {
+                "examples": len(self._examples),
+                "confirmed": confirmed,
+                "lookups": self.lookups,
+                "served": self.served,
+            }
+
+
+def default_fewshot_path(db_path):
+    """Sidecar file next to the database: database.db -> .queryspeak_fewshot.db"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ".queryspeak_fewshot.db")
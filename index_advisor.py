@@ -0,0 +1,379 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db_pool import get_pool
+from sql_guard import estimate_rows, table_aliases
+
+
+# ====================================================
+#               THRESHOLDS (ENV OVERRIDABLE)
+# ====================================================
+
+# "suggest" only lists indexes (the sidebar offers to create them), "auto"
+# (opt-in) builds them in the background and drops idle ones, "off"
+INDEX_ADVISOR_MODE = os.getenv("INDEX_ADVISOR_MODE", "suggest")
+
+# A candidate is built once hits x table rows reaches INDEX_MIN_SCORE
+INDEX_MIN_HITS = int(os.getenv("INDEX_MIN_HITS", "2"))
+INDEX_MIN_SCORE = int(os.getenv("INDEX_MIN_SCORE", "50000"))
+
+# Advisor indexes that none of the last N observed queries used are dropped
+INDEX_IDLE_QUERIES = int(os.getenv("INDEX_IDLE_QUERIES", "500"))
+
+MAX_INDEX_COLUMNS = 4
+INDEX_PREFIX = "qs_idx_"
+
+
+# ====================================================
+#               SQL INSPECTION
+# ====================================================
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_CLAUSE = re.compile(
+    r"\b(where|on|order\s+by)\b(.*?)"
+    r"(?=\b(?:where|on|join|inner|left|right|cross|natural|group|order|limit|"
+    r"having|union|except|intersect|select|from|window)\b|\)|$)",
+    re.I | re.S
+)
+_SELECT_LIST = re.compile(r"^\s*select\s+(?:distinct\s+)?(.*?)\bfrom\b", re.I | re.S)
+_IDENT = re.compile(r'(?:["`\[]?(\w+)["`\]]?\s*\.\s*)?["`\[]?([A-Za-z_]\w*)["`\]]?')
+_USED_INDEX = re.compile(rf"\bINDEX ({INDEX_PREFIX}\w+)")
+
+
+def sql_fingerprint(sql):
+    """Hash of the SQL with literals and whitespace normalized away."""
+    shape = _NUMBER.sub("?", _STRING.sub("?", sql.lower()))
+    shape = " ".join(shape.replace(";", " ").split())
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+
+
+def _resolve(qualifier, name, aliases, columns):
+    """(table, column) for a column reference, or None if it is not one."""
+    name = name.lower()
+    if qualifier:
+        table = aliases.get(qualifier.lower())
+        if table and name in columns[table]:
+            return table, columns[table][name]
+        return None
+
+    owners = {t for t in aliases.values() if name in columns[t]}
+    if len(owners) == 1:
+        table = owners.pop()
+        return table, columns[table][name]
+    return None
+
+
+def _is_equality(text, start, end):
+    after = text[end:].lstrip()
+    before = text[:start].rstrip()
+    return (
+        (after.startswith("=") and not after.startswith("=>"))
+        or (before.endswith("=") and not before.endswith(("<=", ">=", "!=")))
+    )
+
+
+def predicate_columns(sql, tables):
+    """
+    {table: ([predicate columns, equality first], [selected columns])}
+    for the WHERE / JOIN ON / ORDER BY clauses of sql. Selected columns
+    are None when the table's columns are not listed explicitly (*).
+    """
+    text = _STRING.sub("''", sql)
+    aliases = table_aliases(text, tables)
+    columns = {
+        t: {c["name"].lower(): c["name"] for c in tables[t]}
+        for t in set(aliases.values())
+    }
+
+    equal, other, order = {}, {}, {}
+    for clause, body in _CLAUSE.findall(text):
+        for m in _IDENT.finditer(body):
+            ref = _resolve(m.group(1), m.group(2), aliases, columns)
+            if ref is None:
+                continue
+            table, column = ref
+            if clause.lower().startswith("order"):
+                bucket = order
+            elif clause.lower() == "on" or _is_equality(body, m.start(), m.end()):
+                bucket = equal
+            else:
+                bucket = other
+            bucket.setdefault(table, []).append(column)
+
+    selected = {t: [] for t in columns}
+    match = _SELECT_LIST.search(text)
+    select_list = match.group(1) if match else "*"
+    for m in _IDENT.finditer(select_list):
+        ref = _resolve(m.group(1), m.group(2), aliases, columns)
+        if ref is not None:
+            selected[ref[0]].append(ref[1])
+    if "*" in select_list:
+        selected = {t: None for t in columns}
+
+    found = {}
+    for table in columns:
+        ordered = []
+        for bucket in (equal, other, order):
+            for column in bucket.get(table, []):
+                if column not in ordered:
+                    ordered.append(column)
+        if ordered:
+            found[table] = (ordered, selected[table])
+    return found
+
+
+def scanned_tables(plan, sql, tables):
+    """Tables the plan reads with a full table scan (no index at all)."""
+    aliases = table_aliases(_STRING.sub("''", sql), tables)
+    scanned = set()
+    for detail in plan:
+        if detail.startswith("SCAN ") and " INDEX " not in detail:
+            table = aliases.get(detail.split()[1].lower())
+            if table:
+                scanned.add(table)
+    return scanned
+
+
+def index_name(table, columns):
+    return INDEX_PREFIX + re.sub(r"\W", "_", "_".join([table, *columns])).lower()
+
+
+# ====================================================
+#               ADVISOR
+# ====================================================
+
+class IndexAdvisor:
+    """
+    Learns which columns executed queries filter, join and sort on while
+    the plan still scans the whole table, and indexes the ones worth it.
+
+    Each full-scan query votes for one candidate per scanned table: its
+    predicate columns (equality first), widened into a covering index
+    when the selected columns fit. Once hits x table rows passes the
+    threshold, the index is created (mode "auto") or listed (mode
+    "suggest"). Advisor indexes (named qs_idx_*) that no recent query
+    used are dropped again. Per query fingerprint, run times with and
+    without an advisor index are kept for the speedup report.
+    """
+
+    def __init__(self, pool, mode=INDEX_ADVISOR_MODE, min_hits=INDEX_MIN_HITS,
+                 min_score=INDEX_MIN_SCORE, idle_queries=INDEX_IDLE_QUERIES):
+        self.pool = pool
+        self.mode = mode
+        self.min_hits = min_hits
+        self.min_score = min_score
+        self.idle_queries = idle_queries
+
+        self.observed = 0
+        self.candidates = {}            # (table, columns) -> {"hits", "fingerprints"}
+        self.built = OrderedDict()      # index name -> {"table", "columns", "seconds"}
+        self.dropped = []
+        self.timings = OrderedDict()    # fingerprint -> {"sql", "without", "with", "indexes"}
+        self._last_used = {}            # index name -> observed count when last used
+        self._lock = threading.Lock()
+        self._building = False
+
+    # ---------------- recording ----------------
+
+    def observe(self, sql, plan, elapsed, tables):
+        """Records one executed query (plan = EXPLAIN QUERY PLAN details)."""
+        if self.mode == "off" or not plan:
+            return
+
+        fingerprint = sql_fingerprint(sql)
+        used = sorted(set(_USED_INDEX.findall("\n".join(plan))))
+        scanned = scanned_tables(plan, sql, tables)
+        wanted = []
+        if scanned:
+            for table, (predicate, selected) in predicate_columns(sql, tables).items():
+                if table not in scanned:
+                    continue
+                columns = predicate[:MAX_INDEX_COLUMNS]
+                if selected is not None:
+                    extra = [c for c in selected if c not in columns]
+                    if len(columns) + len(extra) <= MAX_INDEX_COLUMNS:
+                        columns += extra
+                wanted.append((table, tuple(columns)))
+
+        with self._lock:
+            self.observed += 1
+            for name in used:
+                self._last_used[name] = self.observed
+
+            for key in wanted:
+                entry = self.candidates.setdefault(key, {"hits": 0, "fingerprints": set()})
+                entry["hits"] += 1
+                entry["fingerprints"].add(fingerprint)
+
+            timing = self.timings.setdefault(
+                fingerprint, {"sql": sql, "without": [], "with": [], "indexes": set()}
+            )
+            self.timings.move_to_end(fingerprint)
+            timing["with" if used else "without"].append(elapsed)
+            timing["indexes"].update(used)
+            while len(self.timings) > 500:
+                self.timings.popitem(last=False)
+
+        if self.mode == "auto":
+            self._maybe_build()
+
+    # ---------------- advice ----------------
+
+    def suggestions(self):
+        """Candidates past the threshold, best first."""
+        with self._lock:
+            candidates = [
+                (key, entry["hits"]) for key, entry in self.candidates.items()
+                if entry["hits"] >= self.min_hits
+            ]
+        if not candidates:
+            return []
+
+        sizes = {}
+        advice = []
+        with self.pool.read() as conn:
+            existing = self._existing(conn)
+            for (table, columns), hits in candidates:
+                name = index_name(table, columns)
+                if name in existing:
+                    continue
+                rows = estimate_rows(conn, table, sizes)
+                score = hits * rows
+                if score >= self.min_score:
+                    advice.append({
+                        "name": name, "table": table, "columns": list(columns),
+                        "hits": hits, "rows": rows, "score": score
+                    })
+        return sorted(advice, key=lambda a: a["score"], reverse=True)
+
+    def _existing(self, conn):
+        return {
+            name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+            if name.startswith(INDEX_PREFIX)
+        }
+
+    def stale_indexes(self):
+        """Advisor indexes no query used within the last idle_queries."""
+        with self.pool.read() as conn:
+            existing = self._existing(conn)
+        with self._lock:
+            for name in list(self.built):
+                if name not in existing:      # table replaced by an upload
+                    del self.built[name]
+            for name in existing:
+                # Indexes left by an earlier process get a fresh grace period
+                self._last_used.setdefault(name, self.observed)
+            return [
+                name for name in existing
+                if self.observed - self._last_used[name] > self.idle_queries
+            ]
+
+    # ---------------- building ----------------
+
+    def create(self, suggestion):
+        """Creates one suggested index; returns the seconds it took."""
+        table, columns = suggestion["table"], suggestion["columns"]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        started = time.perf_counter()
+        with self.pool.write() as conn:
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{suggestion["name"]}" ON "{table}" ({cols})'
+            )
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self.candidates.pop((table, tuple(columns)), None)
+            self.built[suggestion["name"]] = {
+                "table": table, "columns": columns, "seconds": round(seconds, 3)
+            }
+            self._last_used[suggestion["name"]] = self.observed
+        return seconds
+
+    def drop(self, name):
+        with self.pool.write() as conn:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        with self._lock:
+            self.built.pop(name, None)
+            self._last_used.pop(name, None)
+            self.dropped.append(name)
+
+    def maintain(self):
+        """Builds everything past the threshold and drops idle indexes."""
+        for name in self.stale_indexes():
+            self.drop(name)
+        for suggestion in self.suggestions():
+            self.create(suggestion)
+
+    def _maybe_build(self):
+        # One background build at a time; CREATE INDEX holds the writer
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+
+        def work():
+            try:
+                self.maintain()
+            except sqlite3.Error:
+                pass
+            finally:
+                with self._lock:
+                    self._building = False
+
+        threading.Thread(target=work, name="index-advisor", daemon=True).start()
+
+    # ---------------- reporting ----------------
+
+    def report(self):
+        """Speedup per query fingerprint, for queries seen both ways."""
+        rows = []
+        with self._lock:
+            for fingerprint, timing in self.timings.items():
+                if not timing["without"] or not timing["with"]:
+                    continue
+                before = sum(timing["without"]) / len(timing["without"])
+                after = sum(timing["with"]) / len(timing["with"])
+                rows.append({
+                    "fingerprint": fingerprint,
+                    "sql": timing["sql"],
+                    "runs_without": len(timing["without"]),
+                    "runs_with": len(timing["with"]),
+                    "ms_without": round(before * 1000, 2),
+                    "ms_with": round(after * 1000, 2),
+                    "speedup": round(before / after, 1) if after else None,
+                    "indexes": ", ".join(sorted(timing["indexes"])),
+                })
+        return sorted(rows, key=lambda r: r["speedup"] or 0, reverse=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "observed": self.observed,
+                "candidates": len(self.candidates),
+                "built": len(self.built),
+                "dropped": len(self.dropped),
+            }
+
+
+# ====================================================
+#               PROCESS-WIDE REGISTRY
+# ====================================================
+
+_advisors = {}
+_advisors_lock = threading.Lock()
+
+
+def get_index_advisor(db_path):
+    """Returns the shared IndexAdvisor for a database file."""
+    path = os.path.abspath(db_path)
+    with _advisors_lock:
+        if path not in _advisors:
+            _advisors[path] = IndexAdvisor(get_pool(path))
+        return _advisors[path]
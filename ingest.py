@@ -0,0 +1,527 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+from db_pool import bump_data_version
+
+
+# ====================================================
+#               TUNING (ENV OVERRIDABLE)
+# ====================================================
+
+# Rows per executemany batch; memory use is bounded by this, not the file
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+# Rows read before the table is created, used to infer column types
+INGEST_SAMPLE_ROWS = int(os.getenv("INGEST_SAMPLE_ROWS", "1000"))
+
+# Rows kept for the upload preview
+PREVIEW_ROWS = 100
+
+
+# ====================================================
+#               TYPE INFERENCE
+# ====================================================
+
+_INT = re.compile(r"^[+-]?\d+$")
+
+
+def _is_float(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def infer_affinity(values):
+    """INTEGER / REAL / TEXT for a column's sample (blanks are ignored)."""
+    seen = [v for v in values if v not in ("", None)]
+    if not seen:
+        return "TEXT"
+    if all(_INT.match(v) for v in seen):
+        return "INTEGER"
+    if all(_is_float(v) for v in seen):
+        return "REAL"
+    return "TEXT"
+
+
+def _converter(affinity):
+    """Parses CSV text for a column; values that do not fit stay text."""
+    def convert(value):
+        if value == "":
+            return None
+        try:
+            if affinity == "INTEGER":
+                return int(value)
+            if affinity == "REAL":
+                return float(value)
+        except ValueError:
+            pass
+        return value
+    return convert
+
+
+def clean_columns(header):
+    """Non-empty, unique column names for a CSV header."""
+    names = []
+    for i, name in enumerate(header):
+        name = name.strip() or f"column_{i + 1}"
+        base, n = name, 2
+        while name.lower() in (c.lower() for c in names):
+            name = f"{base}_{n}"
+            n += 1
+        names.append(name)
+    return names
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+# ====================================================
+#               LOADING INTO SQLITE
+# ====================================================
+
+# Internal tables (staging, data versions) share this prefix
+INTERNAL_PREFIX = "_qs_"
+STAGING_PREFIX = INTERNAL_PREFIX + "staging_"
+
+
+def _checksum_update(digest, rows):
+    digest.update("\x1e".join(
+        "\x1f".join("" if v is None else str(v) for v in row) for row in rows
+    ).encode("utf-8"))
+
+
+def load_table(pool, table, columns, affinities, chunks, mode="replace",
+               on_progress=None):
+    """
+    Writes row chunks into `table` in one transaction (synchronous=OFF).
+
+    mode "replace" loads a staging table and renames it over the old one
+    at the end, so readers see either the old table or the complete new
+    one, and queries already running keep their snapshot. mode "append"
+    adds the rows to the existing table (creating it, or adding missing
+    columns, as needed). Other tables are never touched.
+
+    on_progress(rows, seconds) is called after every chunk. Returns the
+    row count, a checksum of the loaded values and the table's new size;
+    the load is rolled back if the table's row count does not add up.
+    """
+    if table.lower().startswith(("sqlite_", INTERNAL_PREFIX)):
+        raise ValueError(f"'{table}' is a reserved table name.")
+    if mode not in ("replace", "append"):
+        raise ValueError(f"Unknown upload mode: {mode}")
+
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    rows = 0
+
+    with pool.write() as conn:
+        conn.execute("PRAGMA synchronous=OFF;")
+        try:
+            conn.execute("BEGIN")
+            existing = [c[1] for c in conn.execute(f"PRAGMA table_info({quote(table)})")]
+
+            if mode == "append" and existing:
+                known = {c.lower() for c in existing}
+                for column, affinity in zip(columns, affinities):
+                    if column.lower() not in known:
+                        conn.execute(
+                            f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {affinity}"
+                        )
+                target = table
+                before = conn.execute(f"SELECT COUNT(*) FROM {quote(table)}").fetchone()[0]
+            else:
+                target = STAGING_PREFIX + table if existing else table
+                col_sql = ", ".join(f"{quote(c)} {a}" for c, a in zip(columns, affinities))
+                conn.execute(f"DROP TABLE IF EXISTS {quote(target)}")
+                conn.execute(f"CREATE TABLE {quote(target)} ({col_sql})")
+                before = 0
+
+            insert = (
+                f"INSERT INTO {quote(target)} ({', '.join(quote(c) for c in columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})"
+            )
+            for chunk in chunks:
+                conn.executemany(insert, chunk)
+                _checksum_update(digest, chunk)
+                rows += len(chunk)
+                if on_progress is not None:
+                    on_progress(rows, time.perf_counter() - started)
+
+            total = conn.execute(f"SELECT COUNT(*) FROM {quote(target)}").fetchone()[0]
+            if total != before + rows:
+                raise RuntimeError(
+                    f"Row count check failed: expected {before + rows:,}, found {total:,}."
+                )
+
+            if target != table:
+                # The swap: the old table is only dropped once the new one is complete
+                conn.execute(f"DROP TABLE {quote(table)}")
+                conn.execute(f"ALTER TABLE {quote(target)} RENAME TO {quote(table)}")
+
+            bump_data_version(conn, table)
+            conn.commit()
+        except BaseException:
+            # End the transaction first: the pragma cannot change inside one
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA synchronous=NORMAL;")
+
+    seconds = time.perf_counter() - started
+    return {
+        "table": table,
+        "mode": mode,
+        "rows": rows,
+        "table_rows": total,
+        "checksum": digest.hexdigest(),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds else None,
+    }
+
+
+# ====================================================
+#               STREAMING CSV LOAD
+# ====================================================
+
+def _size(fileobj):
+    """Total bytes of an upload or an opened file, if known."""
+    size = getattr(fileobj, "size", None)
+    if size is None:
+        try:
+            size = os.fstat(fileobj.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+    return size
+
+
+def _text_stream(fileobj):
+    """Text view of an uploaded (binary) or opened (text) file."""
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+
+def ingest_csv(pool, fileobj, table, mode="replace", chunk_rows=INGEST_CHUNK_ROWS,
+               sample_rows=INGEST_SAMPLE_ROWS, on_progress=None):
+    """
+    Streams a CSV into `table` without holding the file in memory: the
+    first sample_rows rows decide the column types, then rows go to
+    load_table chunk by chunk.
+
+    on_progress(rows, bytes_read, total_bytes, seconds) is called after
+    every chunk. Returns load_table's summary plus columns, types and a
+    preview of the first rows.
+    """
+    total_bytes = _size(fileobj)
+    text = _text_stream(fileobj)
+    reader = csv.reader(text)
+
+    try:
+        header = next(reader, None)
+        if not header:
+            raise ValueError("The CSV file is empty.")
+        columns = clean_columns(header)
+        width = len(columns)
+
+        def fit(row):
+            # Ragged rows are padded / cut to the header width
+            if len(row) != width:
+                row = (row + [""] * width)[:width]
+            return row
+
+        sample = [fit(row) for _, row in zip(range(sample_rows), reader)]
+        affinities = [infer_affinity(col) for col in zip(*sample)] or ["TEXT"] * width
+        converters = [_converter(a) for a in affinities]
+
+        def parse(rows):
+            return [tuple(c(v) for c, v in zip(converters, row)) for row in rows]
+
+        def chunks():
+            chunk = sample
+            while chunk:
+                yield parse(chunk)
+                chunk = [fit(row) for _, row in zip(range(chunk_rows), reader)]
+
+        def progress(rows, seconds):
+            if on_progress is not None:
+                position = fileobj.tell() if hasattr(fileobj, "tell") else None
+                on_progress(rows, position, total_bytes, seconds)
+
+        summary = load_table(pool, table, columns, affinities, chunks(), mode, progress)
+    finally:
+        if text is not fileobj:
+            text.detach()   # leave the caller's file open
+
+    summary.update({
+        "columns": columns,
+        "types": dict(zip(columns, affinities)),
+        "preview": parse(sample[:PREVIEW_ROWS]),
+    })
+    return summary
+
+
+# ====================================================
+#               PARQUET / ARROW / JSONL
+# ====================================================
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow uploads need pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+
+def arrow_affinity(pa, dtype):
+    """SQLite affinity for an Arrow type (nested and temporal values become text)."""
+    types = pa.types
+    if types.is_dictionary(dtype):
+        return arrow_affinity(pa, dtype.value_type)
+    if types.is_boolean(dtype) or types.is_integer(dtype):
+        return "INTEGER"
+    if types.is_floating(dtype) or types.is_decimal(dtype):
+        return "REAL"
+    if types.is_binary(dtype) or types.is_large_binary(dtype) or types.is_fixed_size_binary(dtype):
+        return "BLOB"
+    return "TEXT"
+
+
+def _arrow_columns(pa, schema):
+    """Column names, affinities and a per-column Arrow -> Python converter."""
+    columns = clean_columns([field.name for field in schema])
+    affinities = [arrow_affinity(pa, field.type) for field in schema]
+
+    def convert(array, dtype):
+        types = pa.types
+        if types.is_dictionary(dtype):
+            return convert(array.dictionary_decode(), dtype.value_type)
+        if types.is_decimal(dtype):
+            array = array.cast(pa.float64())
+        elif types.is_temporal(dtype):
+            try:
+                array = array.cast(pa.string())
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                return [None if v is None else str(v) for v in array.to_pylist()]
+        elif types.is_nested(dtype):
+            return [None if v is None else json.dumps(v, default=str) for v in array.to_pylist()]
+        return array.to_pylist()
+
+    def rows(batch):
+        values = [convert(col, field.type) for col, field in zip(batch.columns, schema)]
+        return list(zip(*values))
+
+    return columns, affinities, rows
+
+
+def _arrow_batches(pa, batches, chunk_rows):
+    """Re-slices record batches into chunk_rows pieces (zero-copy slices)."""
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_rows):
+            yield batch.slice(start, chunk_rows)
+
+
+def _load_arrow(pool, table, schema, batches, mode, on_progress, done, total):
+    pa = _pyarrow()
+    columns, affinities, to_rows = _arrow_columns(pa, schema)
+    preview = []
+
+    def chunks():
+        for batch in batches:
+            rows = to_rows(batch)
+            if len(preview) < PREVIEW_ROWS:
+                preview.extend(rows[:PREVIEW_ROWS - len(preview)])
+            yield rows
+
+    def progress(rows, seconds):
+        if on_progress is not None:
+            on_progress(rows, done(rows), total, seconds)
+
+    summary = load_table(pool, table, columns, affinities, chunks(), mode, progress)
+    summary.update({
+        "columns": columns,
+        "types": dict(zip(columns, affinities)),
+        "preview": preview,
+    })
+    return summary
+
+
+def ingest_parquet(pool, fileobj, table, mode="replace", chunk_rows=INGEST_CHUNK_ROWS,
+                   on_progress=None):
+    """Loads a Parquet file one row group at a time."""
+    pa = _pyarrow()
+    parquet = pa.parquet.ParquetFile(fileobj)
+
+    def batches():
+        for i in range(parquet.num_row_groups):
+            group = parquet.read_row_group(i)
+            yield from _arrow_batches(pa, group.to_batches(), chunk_rows)
+
+    return _load_arrow(
+        pool, table, parquet.schema_arrow, batches(), mode, on_progress,
+        done=lambda rows: rows, total=parquet.metadata.num_rows
+    )
+
+
+def ingest_arrow(pool, fileobj, table, mode="replace", chunk_rows=INGEST_CHUNK_ROWS,
+                 on_progress=None):
+    """
+    Loads an Arrow IPC file or stream. Paths are memory-mapped and
+    uploads are read in place from their buffer, so record batches are
+    views over the source rather than copies.
+    """
+    pa = _pyarrow()
+    if isinstance(fileobj, (str, os.PathLike)):
+        source = pa.memory_map(os.fspath(fileobj), "r")
+    else:
+        data = fileobj.getbuffer() if hasattr(fileobj, "getbuffer") else fileobj.read()
+        source = pa.BufferReader(pa.py_buffer(data))
+
+    try:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        total = reader.num_record_batches
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+        total = None
+
+    seen = {"batches": 0}
+
+    def counted():
+        for batch in batches:
+            seen["batches"] += 1
+            yield from _arrow_batches(pa, [batch], chunk_rows)
+
+    return _load_arrow(
+        pool, table, reader.schema, counted(), mode, on_progress,
+        done=lambda rows: seen["batches"], total=total
+    )
+
+
+def _json_affinity(values):
+    seen = [v for v in values if v is not None]
+    if not seen:
+        return "TEXT"
+    if all(isinstance(v, (bool, int)) for v in seen):
+        return "INTEGER"
+    if all(isinstance(v, (bool, int, float)) for v in seen):
+        return "REAL"
+    return "TEXT"
+
+
+def _json_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def ingest_jsonl(pool, fileobj, table, mode="replace", chunk_rows=INGEST_CHUNK_ROWS,
+                 sample_rows=INGEST_SAMPLE_ROWS, on_progress=None):
+    """
+    Streams JSON Lines (one object per line). Columns are the keys seen
+    in the first sample_rows objects; keys that only appear later are
+    ignored.
+    """
+    total_bytes = _size(fileobj)
+    text = _text_stream(fileobj)
+
+    def objects():
+        for n, line in enumerate(text, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {n} is not valid JSON: {e}") from e
+            if not isinstance(obj, dict):
+                raise ValueError(f"Line {n} is not a JSON object.")
+            yield obj
+
+    try:
+        stream = objects()
+        sample = [obj for _, obj in zip(range(sample_rows), stream)]
+        if not sample:
+            raise ValueError("The JSONL file is empty.")
+
+        keys = list(dict.fromkeys(k for obj in sample for k in obj))
+        columns = clean_columns(keys)
+        affinities = [_json_affinity([obj.get(k) for obj in sample]) for k in keys]
+
+        def parse(batch):
+            return [tuple(_json_value(obj.get(k)) for k in keys) for obj in batch]
+
+        def chunks():
+            batch = sample
+            while batch:
+                yield parse(batch)
+                batch = [obj for _, obj in zip(range(chunk_rows), stream)]
+
+        def progress(rows, seconds):
+            if on_progress is not None:
+                position = fileobj.tell() if hasattr(fileobj, "tell") else None
+                on_progress(rows, position, total_bytes, seconds)
+
+        summary = load_table(pool, table, columns, affinities, chunks(), mode, progress)
+    finally:
+        if text is not fileobj:
+            text.detach()
+
+    summary.update({
+        "columns": columns,
+        "types": dict(zip(columns, affinities)),
+        "preview": parse(sample[:PREVIEW_ROWS]),
+    })
+    return summary
+
+
+# ====================================================
+#               DISPATCH BY FILE TYPE
+# ====================================================
+
+FORMATS = {
+    "csv": ingest_csv,
+    "parquet": ingest_parquet,
+    "arrow": ingest_arrow,
+    "jsonl": ingest_jsonl,
+}
+
+EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet", ".pq": "parquet",
+    ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow",
+    ".jsonl": "jsonl", ".ndjson": "jsonl",
+}
+
+
+def detect_format(name):
+    fmt = EXTENSIONS.get(os.path.splitext(name or "")[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type: {name}")
+    return fmt
+
+
+def ingest_file(pool, fileobj, table, fmt=None, mode="replace", on_progress=None):
+    """
+    Loads an uploaded/opened file (or a path) into `table`, picking the
+    reader from fmt or the file name. The summary gains "format".
+    """
+    fmt = fmt or detect_format(getattr(fileobj, "name", None) or str(fileobj))
+    if isinstance(fileobj, (str, os.PathLike)) and fmt != "arrow":
+        with open(fileobj, "rb") as f:
+            return ingest_file(pool, f, table, fmt, mode, on_progress)
+
+    summary = FORMATS[fmt](pool, fileobj, table, mode=mode, on_progress=on_progress)
+    summary["format"] = fmt
+    return summary
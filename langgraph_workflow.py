@@ -1,9 +1,36 @@
+import asyncio
+import inspect
+import operator
 import os
-import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Annotated, Optional, TypedDict
 from dotenv import load_dotenv
 
+from langchain_core.runnables import RunnableLambda
 from langchain_groq import ChatGroq
-from langchain_community.utilities import SQLDatabase
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from db_pool import get_pool
+from fewshot import FewShotStore, default_fewshot_path
+from index_advisor import get_index_advisor
+from schema_cache import get_schema_cache
+from sql_cache import SQLCache, default_cache_path
+from sql_guard import GuardRejected, SQLGuard
+from sql_executor import (
+    MAX_BYTES, MAX_ROWS, QUERY_MAX_STEPS, QUERY_TIMEOUT_S,
+    QueryControl, QueryInterrupted, ResultRegistry, execute_query
+)
+from sql_extract import SQLExtractor
+from sql_repair import (
+    RepairStats, affected_tables, build_repair_prompt, local_repair, referenced_tables
+)
+from templates import TemplateMatcher
+from tracing import TraceExporter, build_trace, estimate_tokens, make_span, node_attributes
 
 
 # ====================================================
@@ -12,6 +39,26 @@ from langchain_community.utilities import SQLDatabase
 
 load_dotenv()
 
+DB_PATH = "database.db"
+
+# How many of the best-matching tables (plus FK neighbours) go into the prompt
+SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", "5"))
+
+# Rows/bytes read up front; the rest stays behind the open result stream
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", str(MAX_ROWS)))
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", str(MAX_BYTES)))
+
+# LLM re-prompts allowed per question when generated SQL fails
+REPAIR_MAX_RETRIES = int(os.getenv("REPAIR_MAX_RETRIES", "2"))
+
+# Token-set similarity for reusing SQL cached for a *different* question;
+# unset (the default) means exact matches only
+SQL_CACHE_FUZZY = os.getenv("SQL_CACHE_FUZZY", "")
+
+# Local fixes are cheap but must not loop forever either
+MAX_LOCAL_FIXES = 3
+
+
 def build_llm():
     """Builds the Groq LLM used for SQL generation."""
     api_key = os.getenv("GROQ_API_KEY")
@@ -25,59 +72,120 @@ def build_llm():
     )
 
 
-def build_db():
-    """Connects to the local SQLite database."""
-    return SQLDatabase.from_uri("sqlite:///database.db")
-
-
 # ====================================================
 #               FEATURE 2: GET DATABASE SCHEMA
 # ====================================================
 
-def get_schema():
+def get_schema(db_path=DB_PATH):
     """
     Returns a clean structured schema for use in Streamlit.
+    Served from the same cache the pipeline uses for its prompts.
     """
-    conn = sqlite3.connect("database.db")
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';"
-    )
-    tables = [t[0] for t in cursor.fetchall()]
-
-    schema = {}
+    return get_schema_cache(db_path).get().tables
 
-    for table in tables:
-        cursor.execute(f'PRAGMA table_info("{table}");')
-        cols = cursor.fetchall()
 
-        schema[table] = [
-            {"name": col[1], "type": col[2]}
-            for col in cols
-        ]
+# ====================================================
+#               GRAPH STATE
+# ====================================================
 
-    conn.close()
-    return schema
+class AgentState(TypedDict, total=False):
+    """
+    Everything a checkpoint needs to resume a question. Only plain,
+    serializable values live here; the LLM client, pool and caches are
+    bound to the nodes by QueryPipeline, and live results are looked up
+    by result_id.
+    """
+    question: str
+    schema: str
+    schema_tables: list
+    fingerprint: str
+    cache_hit: Optional[str]
+    cache_question: Optional[str]
+    template: Optional[str]
+    sql: str
+    gen_seconds: float
+    examples: int
+    result: Optional[dict]
+    error: Optional[str]
+    tried_sql: list
+    repair_attempts: int
+    llm_repairs: int
+    repaired_by: Optional[str]
+    repair_exhausted: bool
+    interrupted: Optional[str]
+    result_cached: bool
+    read_tables: list
+    data_stamp: Optional[tuple]
+    prompt_tokens: int
+    completion_tokens: int
+    spans: Annotated[list, operator.add]
+    final: str
 
 
 # ====================================================
 #               NODE IMPLEMENTATIONS
 # ====================================================
 
-def inspect_schema(state):
-    db = state["db"]
-    schema = db.get_table_info()
-    state["schema"] = schema
-    return state
+def inspect_schema(state, pipeline):
+    snapshot = pipeline.schema_cache.get()
+    tables = snapshot.relevant_tables(state["question"], pipeline.top_k)
+    return {
+        "schema": snapshot.render(tables),
+        "schema_tables": tables,
+        "fingerprint": snapshot.fingerprint
+    }
 
 
-def generate_sql(state):
-    llm = state["llm"]
-    question = state["question"]
-    schema = state["schema"]
+def match_template(state, pipeline):
+    """
+    Template-shaped questions ("top 5 rows by id in employees") get
+    their SQL straight from the cached schema: no LLM, no SQL cache.
+    """
+    snapshot = pipeline.schema_cache.get()
+    sql, name = pipeline.templates.match(state["question"], snapshot)
+    if sql is None:
+        return {"template": None}
+    return {
+        "sql": sql,
+        "template": name,
+        "cache_hit": "template",
+        "fingerprint": snapshot.fingerprint,
+        "schema_tables": referenced_tables(sql, snapshot.tables),
+    }
+
+
+def route_after_template(state):
+    if state.get("template"):
+        return "execute_sql"
+    return ["inspect_schema", "lookup_cached_sql"]
+
 
-    prompt = f"""
+def lookup_cached_sql(state, pipeline):
+    """Reuses SQL generated earlier for the same question and schema."""
+    snapshot = pipeline.schema_cache.get()
+    identifiers = list(snapshot.tables) + [
+        col["name"] for cols in snapshot.tables.values() for col in cols
+    ]
+    sql, kind, cached_question = pipeline.sql_cache.get(
+        state["question"], snapshot.fingerprint, identifiers
+    )
+    if sql is None:
+        return {"cache_hit": None}
+    return {"sql": sql, "cache_hit": kind, "cache_question": cached_question}
+
+
+def route_after_cache(state):
+    return "execute_sql" if state.get("cache_hit") else "generate_sql"
+
+
+def build_prompt(question, schema, examples=()):
+    shots = ""
+    if examples:
+        shots = "EXAMPLES (verified on this database):\n" + "\n\n".join(
+            f"Question: {ex['question']}\nSQL: {ex['sql']}" for ex in examples
+        ) + "\n\n"
+
+    return f"""
 You are an expert SQL agent working with SQLite.
 
 Below is the database schema.
@@ -90,71 +198,652 @@ Write ONE SQL query that accurately answers the user's question.
 DATABASE SCHEMA:
 {schema}
 
-USER QUESTION:
+{shots}USER QUESTION:
 {question}
 
 Write ONLY the SQL query:
 """
 
-    sql = llm.invoke(prompt).content
-    state["sql"] = sql
-    return state
+
+def _token_counts(prompt, chunks, usage):
+    """API-reported usage when the stream got that far, else estimates."""
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0)}
+    # Groq streams about one token per chunk
+    return {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": chunks}
+
+
+def stream_sql(pipeline, prompt, thread_id):
+    """
+    Streams the completion and stops reading (closing the stream, which
+    ends the request) as soon as one complete statement has arrived, or
+    when pipeline.cancel(thread_id) is called.
+    The SQL so far is published as pipeline.draft(thread_id).
+    Returns (sql, token counts).
+    """
+    extractor = SQLExtractor()
+    chunks, usage = 0, None
+    stream = pipeline.llm.stream(prompt)
+    try:
+        for chunk in stream:
+            chunks += 1
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            done = extractor.feed(chunk.content)
+            pipeline._drafts[thread_id] = extractor.partial
+            if done or pipeline.cancelled(thread_id):
+                break
+    finally:
+        stream.close()
+    return extractor.sql, _token_counts(prompt, chunks, usage)
+
+
+async def astream_sql(pipeline, prompt, thread_id):
+    extractor = SQLExtractor()
+    chunks, usage = 0, None
+    stream = pipeline.llm.astream(prompt)
+    try:
+        async for chunk in stream:
+            chunks += 1
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            done = extractor.feed(chunk.content)
+            pipeline._drafts[thread_id] = extractor.partial
+            if done or pipeline.cancelled(thread_id):
+                break
+    finally:
+        await stream.aclose()
+    return extractor.sql, _token_counts(prompt, chunks, usage)
+
+
+def _generation_prompt(state, pipeline):
+    """The prompt plus the most similar verified examples for this schema."""
+    examples = pipeline.fewshot.similar(state["question"], pipeline.schema_cache.get().tables)
+    return build_prompt(state["question"], state["schema"], examples), len(examples)
+
+
+def generate_sql(state, config, pipeline):
+    prompt, shots = _generation_prompt(state, pipeline)
+
+    started = time.perf_counter()
+    sql, tokens = stream_sql(pipeline, prompt, config["configurable"]["thread_id"])
+    return {"sql": sql, "gen_seconds": time.perf_counter() - started, "examples": shots,
+            **tokens}
+
+
+async def agenerate_sql(state, config, pipeline):
+    """Async twin of generate_sql; awaits the Groq stream without a thread."""
+    prompt, shots = _generation_prompt(state, pipeline)
+
+    started = time.perf_counter()
+    sql, tokens = await astream_sql(pipeline, prompt, config["configurable"]["thread_id"])
+    return {"sql": sql, "gen_seconds": time.perf_counter() - started, "examples": shots,
+            **tokens}
 
 
 # ====================================================
 # ✅ FIXED SQL EXECUTION (IMPORTANT)
 # ====================================================
 
-def execute_sql(state):
-    """Executes SQL using sqlite3 directly (FULL RESULTS)."""
-    sql = state["sql"]
-
+def execute_sql(state, config, pipeline):
+    """
+    Executes SQL on a pooled read-only connection, streaming rows in
+    batches up to the row/byte budget into a columnar QueryResult. The
+    guard rejects anything but one affordable read-only statement first.
+    The open stream is kept (by result_id) so more pages can be read
+    later without re-running the query.
+
+    The query runs under the pipeline's time/step budget and can be
+    stopped with pipeline.cancel(thread_id); an interrupted query is
+    not sent for repair.
+
+    With a result cache, SQL another session already ran against
+    unchanged data is served from it, and concurrent runs of the same
+    SQL wait for the first one instead of repeating it.
+    """
+    control = pipeline._control(config["configurable"]["thread_id"])
+    if control.cancelled:
+        # Cancelled while the SQL was being generated: don't start it
+        return {"result": None, "error": control.describe(), "interrupted": control.reason,
+                "repair_exhausted": True}
+    tables = pipeline.schema_cache.get().tables
+    # Stamp taken before running: a write during the query makes it stale
+    read = referenced_tables(state["sql"], tables)
+    seen = {"read_tables": read, "data_stamp": pipeline.pool.data_stamp(read)}
+    cache = pipeline.result_cache
+    if cache is None:
+        return {**_execute(state, pipeline, control, tables, seen), **seen}
+
+    with cache.claim(state["sql"]):
+        stored = cache.get(state["sql"])
+        if stored is None:
+            return {**_execute(state, pipeline, control, tables, seen, cache), **seen}
+
+    pipeline.results.add(stored)
+    _remember_sql(state, pipeline)
+    return {"result": stored.summary(), "error": None, "result_cached": True, **seen}
+
+
+def _execute(state, pipeline, control, tables, seen, cache=None):
     try:
-        conn = sqlite3.connect("database.db")
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        conn.close()
+        result = execute_query(
+            pipeline.pool, state["sql"],
+            max_rows=pipeline.max_rows,
+            max_bytes=pipeline.max_bytes,
+            guard=pipeline.guard,
+            tables=tables,
+            control=control
+        )
+    except GuardRejected as e:
+        return {"result": None, "error": f"SQL Guard: {e}"}
+    except QueryInterrupted as e:
+        return {"result": None, "error": str(e), "interrupted": control.reason,
+                "repair_exhausted": True}
+    except Exception as e:
+        return {"result": None, "error": f"SQL Execution Error: {e}"}
 
-        state["rows"] = rows
+    pipeline.index_advisor.observe(state["sql"], result.plan, result.elapsed, tables)
+    if cache is not None:
+        result = cache.save(result, state["sql"], seen["read_tables"], seen["data_stamp"])
+    pipeline.results.add(result)
+    _remember_sql(state, pipeline)
+
+    return {"result": result.summary(), "error": None, "result_cached": False}
+
+
+def _remember_sql(state, pipeline):
+    # Only SQL that actually ran is worth reusing (LLM repairs replace stale
+    # entries). A local fix is a name guess that ran, not a verified answer,
+    # so it is neither cached nor kept as an example.
+    if state.get("repaired_by") == "local":
+        return
+    if not state.get("cache_hit") or state.get("repaired_by"):
+        pipeline.sql_cache.put(
+            state["question"], state["fingerprint"],
+            state["sql"], state.get("gen_seconds", 0.0)
+        )
+        tables = referenced_tables(state["sql"], pipeline.schema_cache.get().tables)
+        pipeline.fewshot.add(state["question"], state["sql"], tables)
 
-    except Exception as e:
-        state["rows"] = f"SQL Execution Error: {e}"
 
-    return state
+def route_after_execute(state):
+    if state.get("error") and not state.get("repair_exhausted"):
+        return "repair_sql"
+    return "format_result"
 
 
-def format_result(state):
-    rows = state["rows"]
+# ====================================================
+#               SELF-REPAIR OF FAILED SQL
+# ====================================================
+
+def _plan_repair(state, pipeline, thread_id):
+    """
+    Returns (update, prompt): a local fix when one applies, otherwise
+    the LLM prompt to send (prompt None = give up).
+    """
+    snapshot = pipeline.schema_cache.get()
+    tried = state.get("tried_sql", []) + [state["sql"]]
+    attempts = state.get("repair_attempts", 0) + 1
+    update = {"tried_sql": tried, "repair_attempts": attempts}
+
+    if pipeline.cancelled(thread_id):
+        update["repair_exhausted"] = True
+        return update, None
+
+    if attempts <= MAX_LOCAL_FIXES + pipeline.max_repairs:
+        fixed = local_repair(state["sql"], state["error"], snapshot)
+        if fixed and fixed not in tried:
+            update.update({"sql": fixed, "repaired_by": "local"})
+            return update, None
+
+    if state.get("llm_repairs", 0) >= pipeline.max_repairs:
+        update["repair_exhausted"] = True
+        return update, None
+
+    tables = affected_tables(state["sql"], state["error"], snapshot)
+    schema = snapshot.render(tables or state.get("schema_tables"))
+    return update, build_repair_prompt(state["sql"], state["error"], schema)
+
+
+def repair_sql(state, config, pipeline):
+    update, prompt = _plan_repair(state, pipeline, config["configurable"]["thread_id"])
+    if prompt is not None:
+        sql, tokens = stream_sql(pipeline, prompt, config["configurable"]["thread_id"])
+        update.update({
+            "sql": sql, "repaired_by": "llm",
+            "llm_repairs": state.get("llm_repairs", 0) + 1,
+            **tokens
+        })
+    return update
+
+
+async def arepair_sql(state, config, pipeline):
+    update, prompt = _plan_repair(state, pipeline, config["configurable"]["thread_id"])
+    if prompt is not None:
+        sql, tokens = await astream_sql(pipeline, prompt, config["configurable"]["thread_id"])
+        update.update({
+            "sql": sql, "repaired_by": "llm",
+            "llm_repairs": state.get("llm_repairs", 0) + 1,
+            **tokens
+        })
+    return update
+
+
+def format_result(state, pipeline, preview_rows=20):
+    summary = state.get("result")
     question = state["question"]
 
-    formatted = f"Question: {question}\n\nResult:\n{rows}"
-    state["final"] = formatted
-    return state
+    if (state.get("error") or state.get("repair_attempts")) and not state.get("interrupted"):
+        pipeline.repair_stats.record(
+            state.get("repaired_by"), not state.get("error"),
+            state.get("llm_repairs", 0)
+        )
+
+    if summary is None:
+        formatted = f"Question: {question}\n\nResult:\n{state['error']}"
+        return {"final": formatted}
+
+    lines = [", ".join(summary["columns"])]
+    result = pipeline.results.get(summary["result_id"])
+    if result is not None:
+        lines += [str(row) for row in result.iter_rows(stop=preview_rows)]
+    formatted = f"Question: {question}\n\nResult:\n" + "\n".join(lines)
+
+    if summary.get("interrupted"):
+        formatted += f"\n\n(Query interrupted ({summary['interrupted']}) after {summary['num_rows']} rows.)"
+    elif summary["truncated"]:
+        formatted += f"\n\n(First {summary['num_rows']} rows loaded; more rows available.)"
+    elif summary["num_rows"] > preview_rows:
+        formatted += f"\n\n({summary['num_rows']} rows in total.)"
+
+    return {"final": formatted}
+
+
+# ====================================================
+#               GRAPH
+# ====================================================
+
+def traced(name, func, afunc=None, executor=None):
+    """
+    The node as a RunnableLambda that also appends a span (start time,
+    duration, attributes read off its update) to state["spans"].
+
+    Under ainvoke, a node without an async twin runs on `executor`
+    (the pipeline's own thread pool), so the event loop never blocks.
+    """
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def with_span(update, start, t0):
+        span = make_span(name, start, time.perf_counter() - t0, node_attributes(update))
+        return {**update, "spans": [span]}
+
+    def run(state, config):
+        start, t0 = time.time(), time.perf_counter()
+        update = func(state, config) if takes_config else func(state)
+        return with_span(update, start, t0)
+
+    async def arun(state, config):
+        start, t0 = time.time(), time.perf_counter()
+        update = await (afunc(state, config) if takes_config else afunc(state))
+        return with_span(update, start, t0)
+
+    async def arun_in_executor(state, config):
+        start, t0 = time.time(), time.perf_counter()
+        call = partial(func, state, config) if takes_config else partial(func, state)
+        update = await asyncio.get_running_loop().run_in_executor(executor, call)
+        return with_span(update, start, t0)
+
+    if afunc is not None:
+        return RunnableLambda(run, afunc=arun, name=name)
+    if executor is not None:
+        return RunnableLambda(run, afunc=arun_in_executor, name=name)
+    return RunnableLambda(run, name=name)
+
+
+def build_graph(pipeline, checkpointer=None):
+    """
+    START ─ match_template ─┬─ inspect_schema ────┬─ route ─┬─ generate_sql ─┬─ execute_sql ─ format_result ─ END
+                           └─ lookup_cached_sql ─┘         └─ (cache hit) ──┘     ↑ ↑  ↓
+                           └─ (template) ─────────────────────────────────────────┘ repair_sql
+
+    Questions matching a template go straight to execution. Otherwise
+    schema loading and the SQL-cache lookup run as parallel branches;
+    a cache hit skips the LLM entirely. Failed SQL loops through
+    repair_sql (local fixes first, then bounded LLM re-prompts).
+
+    Every node except the route join is traced (see traced()).
+    """
+    graph = StateGraph(AgentState)
+
+    def node(name, func, afunc=None):
+        graph.add_node(name, traced(
+            name, partial(func, pipeline=pipeline),
+            partial(afunc, pipeline=pipeline) if afunc else None,
+            executor=pipeline.executor
+        ))
+
+    node("match_template", match_template)
+    node("inspect_schema", inspect_schema)
+    node("lookup_cached_sql", lookup_cached_sql)
+    graph.add_node("route", lambda state: {})
+    node("generate_sql", generate_sql, agenerate_sql)
+    node("execute_sql", execute_sql)
+    node("repair_sql", repair_sql, arepair_sql)
+    node("format_result", format_result)
+
+    graph.add_edge(START, "match_template")
+    graph.add_conditional_edges(
+        "match_template", route_after_template,
+        ["inspect_schema", "lookup_cached_sql", "execute_sql"]
+    )
+    graph.add_edge(["inspect_schema", "lookup_cached_sql"], "route")
+    graph.add_conditional_edges("route", route_after_cache, ["generate_sql", "execute_sql"])
+    graph.add_edge("generate_sql", "execute_sql")
+    graph.add_conditional_edges("execute_sql", route_after_execute, ["repair_sql", "format_result"])
+    graph.add_edge("repair_sql", "execute_sql")
+    graph.add_edge("format_result", END)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+# ====================================================
+#               PIPELINE (BUILT ONCE PER PROCESS)
+# ====================================================
+
+class ThreadBusy(RuntimeError):
+    """A run (possibly one being cancelled) is still in progress on this thread_id."""
+
+
+class QueryPipeline:
+    """
+    Holds the LLM client, connection pool and caches, and the compiled
+    graph that runs over them, so all of it is built once and reused
+    for every question.
+
+    Runs are checkpointed per thread_id: retrying a failed question
+    with the same thread_id continues from the last finished node.
+    A different question on that thread_id starts over instead.
+    Checkpoints of completed runs are dropped. Only one run at a time
+    may use a thread_id; starting another raises ThreadBusy.
+    """
+
+    def __init__(self, db_path=DB_PATH, llm=None, top_k=SCHEMA_TOP_K,
+                 sql_cache=None, max_rows=RESULT_MAX_ROWS,
+                 max_bytes=RESULT_MAX_BYTES, checkpointer=None,
+                 max_repairs=REPAIR_MAX_RETRIES, guard=None,
+                 query_timeout=QUERY_TIMEOUT_S, max_steps=QUERY_MAX_STEPS,
+                 result_cache=None, templates=None, fewshot=None, tracer=None):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.llm = llm if llm is not None else build_llm()
+        self.pool = get_pool(db_path)
+        self.schema_cache = get_schema_cache(db_path)
+        self.top_k = top_k
+        self.templates = templates if templates is not None else TemplateMatcher()
+        self.sql_cache = (
+            sql_cache if sql_cache is not None
+            else SQLCache(default_cache_path(db_path),
+                          fuzzy_threshold=float(SQL_CACHE_FUZZY) if SQL_CACHE_FUZZY else None)
+        )
+        self.fewshot = (
+            fewshot if fewshot is not None
+            else FewShotStore(default_fewshot_path(db_path))
+        )
+        self.results = ResultRegistry()
+        self.tracer = tracer if tracer is not None else TraceExporter()
+        self.result_cache = result_cache
+        self.max_repairs = max_repairs
+        self.guard = guard if guard is not None else SQLGuard()
+        self.index_advisor = get_index_advisor(db_path)
+        self.repair_stats = RepairStats()
+        self.query_timeout = query_timeout
+        self.max_steps = max_steps
+        self._controls = {}
+        self._drafts = {}
+        self._busy = set()          # thread_ids with a run in progress
+        self._cancelled = set()     # ... of which cancel() was called
+        self._controls_lock = threading.Lock()
+        # Schema/cache lookups and SQLite work of async runs (arun); sized
+        # to the connection pool, since each worker holds one connection
+        self.executor = ThreadPoolExecutor(max_workers=self.pool.size,
+                                           thread_name_prefix="pipeline")
+        self.checkpointer = checkpointer if checkpointer is not None else MemorySaver()
+        self.graph = build_graph(self, self.checkpointer)
+
+    def _claim(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._controls_lock:
+            if thread_id in self._busy:
+                raise ThreadBusy(f"A run is still in progress on thread {thread_id!r}")
+            self._busy.add(thread_id)
+
+    def _start(self, question, thread_id):
+        """Returns (graph input, config); input is None when resuming."""
+        config = {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+        self._claim(config)
+        try:
+            if thread_id:
+                pending = self.graph.get_state(config)
+                if pending.next and pending.values.get("question") == question:
+                    return None, config
+                # A new question must not inherit another run's state
+                self.checkpointer.delete_thread(thread_id)
+        except BaseException:
+            self._release(config)
+            raise
+        return {"question": question}, config
+
+    def _start_replay(self, question, sql, thread_id):
+        """
+        Seeds the thread as if generate_sql had just produced `sql`, so
+        the run continues at execute_sql (with repair, the guard and
+        the index advisor) and never calls the LLM unless repair needs it.
+        """
+        config = {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+        self._claim(config)
+        try:
+            # Never build on a stale checkpoint left by an earlier, failed run
+            self.checkpointer.delete_thread(config["configurable"]["thread_id"])
+            snapshot = self.schema_cache.get()
+            self.graph.update_state(config, {
+                "question": question,
+                "sql": sql,
+                "fingerprint": snapshot.fingerprint,
+                "schema_tables": referenced_tables(sql, snapshot.tables),
+                "cache_hit": "history",
+            }, as_node="generate_sql")
+        except BaseException:
+            self._release(config)
+            raise
+        return None, config
+
+    def _control(self, thread_id):
+        """
+        A fresh QueryControl for the thread's next execution, already
+        cancelled if the run was cancelled before it got this far.
+        """
+        control = QueryControl(self.query_timeout, self.max_steps)
+        with self._controls_lock:
+            self._controls[thread_id] = control
+            if thread_id in self._cancelled:
+                control.cancel()
+        return control
+
+    def _release(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._controls_lock:
+            self._controls.pop(thread_id, None)
+            self._busy.discard(thread_id)
+            self._cancelled.discard(thread_id)
+        self._drafts.pop(thread_id, None)
+
+    def draft(self, thread_id):
+        """SQL generated so far for a running question ("" before any arrives)."""
+        return self._drafts.get(thread_id, "")
+
+    def cancel(self, thread_id):
+        """
+        Stops the run for thread_id, from any thread: SQL generation or
+        repair stops at the next chunk, and the query is interrupted or
+        never started. Returns False if nothing is running for it.
+        """
+        with self._controls_lock:
+            if thread_id not in self._busy:
+                return False
+            self._cancelled.add(thread_id)
+            control = self._controls.get(thread_id)
+        if control is not None:
+            control.cancel()
+        return True
+
+    def cancelled(self, thread_id):
+        return thread_id in self._cancelled
+
+    def invalidate(self, tables=None):
+        """
+        Call after writing to the database (e.g. an upload into `tables`):
+        drops the cached schema and the shared results that read them.
+        """
+        self.schema_cache.invalidate()
+        if self.result_cache is not None:
+            self.result_cache.invalidate(tables)
+
+    def confirm(self, question, sql):
+        """Records a user-confirmed (👍) answer as a few-shot example."""
+        tables = referenced_tables(sql, self.schema_cache.get().tables)
+        self.fewshot.add(question, sql, tables, source="confirmed")
+
+    def _trace(self, state, clock):
+        """The run's spans and totals (also appended to TRACE_FILE)."""
+        spans = state.get("spans", [])
+        summary = state.get("result")
+        attributes = {
+            "cache_hit": state.get("cache_hit"),
+            "rows": summary["num_rows"] if summary else 0,
+            "prompt_tokens": sum(s["attributes"].get("prompt_tokens", 0) for s in spans),
+            "completion_tokens": sum(s["attributes"].get("completion_tokens", 0) for s in spans),
+            "result_cached": state.get("result_cached", False),
+            "error": bool(state.get("error")),
+        }
+        trace = build_trace(state["question"], clock[0], time.perf_counter() - clock[1],
+                            spans, attributes)
+        self.tracer.export(trace)
+        return trace
+
+    def _finish(self, state, config, clock):
+        self._release(config)
+        self.checkpointer.delete_thread(config["configurable"]["thread_id"])
+
+        summary = state.get("result")
+        return {
+            "question": state["question"],
+            "sql": state.get("sql"),
+            "result": self.results.get(summary["result_id"]) if summary else None,
+            "error": state.get("error"),
+            "final": state["final"],
+            "cache_hit": state.get("cache_hit"),
+            "cache_question": state.get("cache_question"),
+            "template": state.get("template"),
+            "repaired_by": state.get("repaired_by"),
+            "interrupted": state.get("interrupted"),
+            "result_cached": state.get("result_cached", False),
+            "fingerprint": state.get("fingerprint"),
+            # What the rows were read from, and its data stamp taken before they were
+            "tables": state.get("read_tables", []),
+            "stamp": state.get("data_stamp"),
+            "trace": self._trace(state, clock)
+        }
+
+    def run(self, question: str, thread_id=None):
+        clock = (time.time(), time.perf_counter())
+        graph_input, config = self._start(question, thread_id)
+        try:
+            state = self.graph.invoke(graph_input, config)
+        except BaseException:
+            self._release(config)
+            raise
+        return self._finish(state, config, clock)
+
+    def replay(self, question: str, sql: str, thread_id=None):
+        """Re-executes known SQL for a question (history replay), skipping generation."""
+        clock = (time.time(), time.perf_counter())
+        graph_input, config = self._start_replay(question, sql, thread_id)
+        try:
+            state = self.graph.invoke(graph_input, config)
+        except BaseException:
+            self._release(config)
+            raise
+        return self._finish(state, config, clock)
+
+    async def arun(self, question: str, thread_id=None):
+        clock = (time.time(), time.perf_counter())
+        graph_input, config = self._start(question, thread_id)
+        try:
+            state = await self.graph.ainvoke(graph_input, config)
+        except BaseException:
+            # Includes asyncio cancellation (e.g. a batch timeout): the
+            # query may still be running in a worker thread, so stop it
+            self.cancel(config["configurable"]["thread_id"])
+            self._release(config)
+            raise
+        return self._finish(state, config, clock)
+
+    async def arun_batch(self, questions, concurrency=8, timeout=60.0):
+        """
+        Answers many questions concurrently, at most `concurrency` at a
+        time, each bounded by `timeout` seconds. Results keep input order;
+        a failed or timed-out question gets an "error" entry instead.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(question):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.arun(question), timeout)
+                except asyncio.TimeoutError:
+                    error = f"Timed out after {timeout}s"
+                except Exception as e:
+                    error = f"Pipeline Error: {e}"
+
+                return {
+                    "question": question, "sql": None, "result": None,
+                    "error": error, "final": error, "cache_hit": None
+                }
+
+        return await asyncio.gather(*(one(q) for q in questions))
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """Returns the process-wide QueryPipeline, building it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = QueryPipeline()
+    return _pipeline
 
 
 # ====================================================
 #               RUN WORKFLOW
 # ====================================================
 
-def run_graph(question: str):
-    state = {
-        "question": question,
-        "llm": build_llm(),
-        "db": build_db()
-    }
+def run_graph(question: str, thread_id=None):
+    return get_pipeline().run(question, thread_id=thread_id)
 
-    state = inspect_schema(state)
-    state = generate_sql(state)
-    state = execute_sql(state)
-    state = format_result(state)
 
-    return {
-        "question": state["question"],
-        "sql": state["sql"],
-        "rows": state["rows"],
-        "final": state["final"]
-    }
+async def arun_graph(question: str, thread_id=None):
+    return await get_pipeline().arun(question, thread_id=thread_id)
+
+
+def run_batch(questions, concurrency=8, timeout=60.0):
+    """Blocking entry point for batch jobs (e.g. the nightly report)."""
+    return asyncio.run(
+        get_pipeline().arun_batch(questions, concurrency=concurrency, timeout=timeout)
+    )
 
 
 # ====================================================
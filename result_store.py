@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from db_pool import ConnectionPool
+
+
+# ====================================================
+#               LIMITS (ENV OVERRIDABLE)
+# ====================================================
+
+# Rows materialized per result; anything past this is not stored
+RESULT_STORE_MAX_ROWS = int(os.getenv("RESULT_STORE_MAX_ROWS", "1000000"))
+
+# Results kept on disk; the oldest are dropped first
+RESULT_STORE_MAX_RESULTS = int(os.getenv("RESULT_STORE_MAX_RESULTS", "200"))
+
+STORE_BATCH_ROWS = 10_000
+
+
+# ====================================================
+#               HANDLES
+# ====================================================
+
+class StoredResult:
+    """
+    Small handle to a materialized result: metadata only, rows are read
+    from the store page by page. Has the parts of the QueryResult
+    interface the UI and the exports use (columns, num_rows, iter_rows,
+    result_id, sql, ...), so it can stand in for one.
+    """
+
+    def __init__(self, store, result_id, columns, num_rows, complete, info):
+        self.store = store
+        self.result_id = result_id
+        self.columns = columns
+        self.num_rows = num_rows
+        self.complete = complete
+        self.sql = info.get("sql")
+        self.auto_limited = info.get("auto_limited", False)
+        self.interrupted = info.get("interrupted")
+        self.elapsed = info.get("elapsed", 0.0)
+
+    @property
+    def truncated(self):
+        """True when the query had more rows than the store kept."""
+        return not self.complete
+
+    @property
+    def available(self):
+        return self.store.has(self.result_id)
+
+    def page(self, page, page_size):
+        """Rows of one page (0-based)."""
+        start = page * page_size
+        return self.store.rows(self.result_id, start, start + page_size)
+
+    def page_frame(self, page, page_size):
+        import pandas as pd
+
+        frame = pd.DataFrame(self.page(page, page_size))
+        if frame.empty:
+            frame = pd.DataFrame(columns=range(len(self.columns)))
+        frame.columns = self.columns
+        frame.index = range(page * page_size, page * page_size + len(frame))
+        return frame
+
+    def iter_rows(self, start=0, stop=None):
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        for offset in range(start, stop, STORE_BATCH_ROWS):
+            yield from self.store.rows(
+                self.result_id, offset, min(offset + STORE_BATCH_ROWS, stop)
+            )
+
+    def summary(self):
+        """Same shape as QueryResult.summary() (what graph state carries)."""
+        return {
+            "result_id": self.result_id,
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "truncated": self.truncated,
+            "rows_scanned": self.num_rows,
+            "auto_limited": self.auto_limited,
+            "interrupted": self.interrupted,
+            "elapsed": round(self.elapsed, 4),
+        }
+
+    def close(self):
+        """Nothing to release; the store owns the rows."""
+
+    def __len__(self):
+        return self.num_rows
+
+    def __repr__(self):
+        return f"<StoredResult {self.num_rows} rows x {len(self.columns)} columns>"
+
+
+# ====================================================
+#               STORE
+# ====================================================
+
+class ResultStore:
+    """
+    Query results materialized once into a scratch SQLite file, one
+    table per result (columns c0..cN, rowid = position + 1), so pages
+    are rowid range reads and nothing larger than a page sits in memory.
+
+    The file belongs to this process and is deleted by close().
+    """
+
+    def __init__(self, path=None, max_rows=RESULT_STORE_MAX_ROWS,
+                 max_results=RESULT_STORE_MAX_RESULTS):
+        if path is None:
+            path = os.path.join(tempfile.gettempdir(), f"queryspeak_results_{os.getpid()}.db")
+        self.path = path
+        self.max_rows = max_rows
+        self.max_results = max_results
+        self._lock = threading.Lock()
+
+        self.pool = ConnectionPool(path, size=4)
+        with self.pool.write() as conn:
+            # Scratch data: durability is not worth an fsync per result
+            conn.execute("PRAGMA synchronous=OFF;")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "result_id TEXT PRIMARY KEY, columns TEXT, num_rows INTEGER, "
+                "complete INTEGER, info TEXT, created REAL)"
+            )
+
+    @staticmethod
+    def _table(result_id):
+        return f'"r_{result_id}"'
+
+    def save(self, result):
+        """
+        Writes a QueryResult's loaded rows, then drains its open stream
+        into the store (up to max_rows), and closes it. Rows go in
+        STORE_BATCH_ROWS at a time, each batch in its own short write
+        transaction, so other sessions' saves interleave instead of
+        waiting for the whole drain; the stream is read outside the
+        write lock. The result only becomes visible (get/has) once
+        complete. Returns the StoredResult handle.
+        """
+        n = max(len(result.columns), 1)
+        table = self._table(result.result_id)
+        insert = f"INSERT INTO {table} VALUES ({', '.join('?' for _ in range(n))})"
+        pad = (None,) if not result.columns else ()
+
+        try:
+            with self.pool.write() as conn:
+                conn.execute(f"CREATE TABLE {table} ({', '.join(f'c{i}' for i in range(n))})")
+
+            loaded = min(result.num_rows, self.max_rows)
+            for start in range(0, loaded, STORE_BATCH_ROWS):
+                stop = min(start + STORE_BATCH_ROWS, loaded)
+                self._append(insert, [row + pad for row in result.iter_rows(start, stop)])
+            rows = loaded
+
+            while result.truncated and rows < self.max_rows:
+                batch = result.stream.fetch(
+                    max_rows=min(STORE_BATCH_ROWS, self.max_rows - rows)
+                )
+                if not batch:
+                    break       # closed early (evicted) or interrupted
+                self._append(insert, batch)
+                rows += len(batch)
+
+            complete = (result.num_rows <= self.max_rows and not result.truncated
+                        and not result.interrupted)
+            info = {
+                "sql": result.sql,
+                "auto_limited": result.auto_limited,
+                "interrupted": result.interrupted,
+                "elapsed": result.elapsed,
+            }
+            with self.pool.write() as conn:
+                conn.execute(
+                    "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                    (result.result_id, json.dumps(result.columns), rows,
+                     int(complete), json.dumps(info), time.time())
+                )
+        except BaseException:
+            with self.pool.write() as conn:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            raise
+        finally:
+            result.close()
+
+        self._evict()
+        return StoredResult(self, result.result_id, list(result.columns), rows, complete, info)
+
+    def _append(self, insert, batch):
+        with self.pool.write() as conn:
+            conn.executemany(insert, batch)
+
+    def get(self, result_id):
+        with self.pool.read() as conn:
+            row = conn.execute(
+                "SELECT columns, num_rows, complete, info FROM results WHERE result_id = ?",
+                (result_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        columns, num_rows, complete, info = row
+        return StoredResult(self, result_id, json.loads(columns), num_rows,
+                            bool(complete), json.loads(info))
+
+    def has(self, result_id):
+        with self.pool.read() as conn:
+            return conn.execute(
+                "SELECT 1 FROM results WHERE result_id = ?", (result_id,)
+            ).fetchone() is not None
+
+    def rows(self, result_id, start, stop):
+        """Rows [start, stop) of a stored result ([] once it was dropped)."""
+        if stop <= start:
+            return []
+        try:
+            with self.pool.read() as conn:
+                return conn.execute(
+                    f"SELECT * FROM {self._table(result_id)} "
+                    "WHERE rowid > ? AND rowid <= ? ORDER BY rowid",
+                    (start, stop)
+                ).fetchall()
+        except sqlite3.OperationalError:     # dropped (evicted) result
+            return []
+
+    def drop(self, result_id):
+        with self.pool.write() as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {self._table(result_id)}")
+            conn.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+
+    def _evict(self):
+        with self._lock:
+            with self.pool.read() as conn:
+                old = conn.execute(
+                    "SELECT result_id FROM results ORDER BY created DESC LIMIT -1 OFFSET ?",
+                    (self.max_results,)
+                ).fetchall()
+            for (result_id,) in old:
+                self.drop(result_id)
+
+    def stats(self):
+        with self.pool.read() as conn:
+            results, rows = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(num_rows), 0) FROM results"
+            ).fetchone()
+        size = sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal") if os.path.exists(self.path + suffix)
+        )
+        return {"results": results, "rows": rows, "bytes": size}
+
+    def close(self):
+        self.pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except OSError:
+                pass
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+
+from db_pool import get_pool
+from schema_retrieval import SchemaIndex
+
+
+# ====================================================
+#               SCHEMA SNAPSHOT
+# ====================================================
+
+class SchemaSnapshot:
+    """
+    One introspection pass over the database: column lists for the UI
+    and CREATE TABLE + sample-row blocks for the LLM prompt.
+    """
+
+    def __init__(self, key, tables, table_info, foreign_keys=None, index=None,
+                 fingerprint=None, references=None):
+        self.key = key
+        self.tables = tables            # {table: [{"name": ..., "type": ...}]}
+        self.table_info = table_info    # {table: "CREATE TABLE ... /* rows */"}
+        self.foreign_keys = foreign_keys or {}  # {table: {referenced tables}}
+        self.references = references or {}      # {table: [(column, ref table, ref column)]}
+        self.index = index
+        self.fingerprint = fingerprint  # hash of all CREATE TABLE statements
+
+    def relevant_tables(self, question, k):
+        """
+        Top-k tables for the question plus their FK neighbours in both
+        directions (so link tables like employee_projects come along).
+        Falls back to every table when the schema is small or nothing matches.
+        """
+        if k is None or len(self.tables) <= k or self.index is None:
+            return list(self.tables)
+
+        top = self.index.top_tables(question, k)
+        if not top:
+            return list(self.tables)
+
+        selected = set(top)
+        for table in top:
+            selected |= self.foreign_keys.get(table, set())
+        for table, refs in self.foreign_keys.items():
+            if refs & set(top):
+                selected.add(table)
+
+        return [t for t in self.tables if t in selected]
+
+    def render(self, tables=None):
+        """Returns the prompt text for the given tables (default: all)."""
+        names = self.table_info.keys() if tables is None else tables
+        return "\n\n".join(
+            self.table_info[name] for name in names if name in self.table_info
+        )
+
+
+# ====================================================
+#               CACHE
+# ====================================================
+
+class SchemaCache:
+    """
+    Caches the schema keyed on PRAGMA schema_version and the db file mtime,
+    so it is rebuilt only after DDL (uploads, create_db.py) changes it.
+    """
+
+    def __init__(self, db_path, sample_rows=3, index_rows=20):
+        self.db_path = db_path
+        self.sample_rows = sample_rows
+        self.index_rows = index_rows
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _current_key(self, conn):
+        version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+        try:
+            mtime = os.stat(self.db_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (version, mtime)
+
+    def get(self):
+        """Returns the current SchemaSnapshot, rebuilding it only if stale."""
+        with get_pool(self.db_path).read() as conn:
+            key = self._current_key(conn)
+
+            with self._lock:
+                if self._snapshot is not None and self._snapshot.key == key:
+                    self.hits += 1
+                    return self._snapshot
+
+                self.misses += 1
+                self._snapshot = self._build(conn, key)
+                return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _build(self, conn, key):
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+            "AND name NOT LIKE '\\_qs\\_%' ESCAPE '\\';"
+        )
+        create_sql = cursor.fetchall()
+
+        tables = {}
+        table_info = {}
+        foreign_keys = {}
+        references = {}
+        index = SchemaIndex()
+
+        for table, ddl in create_sql:
+            cursor.execute(f'PRAGMA table_info("{table}");')
+            cols = cursor.fetchall()
+            tables[table] = [{"name": col[1], "type": col[2]} for col in cols]
+
+            cursor.execute(f'PRAGMA foreign_key_list("{table}");')
+            fks = cursor.fetchall()
+            foreign_keys[table] = {fk[2] for fk in fks}
+            references[table] = [(fk[3], fk[2], fk[4]) for fk in fks]
+
+            limit = max(self.sample_rows, self.index_rows)
+            cursor.execute(f'SELECT * FROM "{table}" LIMIT {int(limit)};')
+            rows = cursor.fetchall()
+            sample = rows[:self.sample_rows]
+
+            index.add_table(table, [col[1] for col in cols], rows)
+
+            lines = [f"{self.sample_rows} rows from {table} table:"]
+            lines.append("\t".join(col[1] for col in cols))
+            lines.extend("\t".join(str(v) for v in row) for row in sample)
+
+            table_info[table] = f"{ddl}\n\n/*\n" + "\n".join(lines) + "\n*/"
+
+        # Stable across processes; changes only when a table definition does
+        ddl = "\n".join(sorted(sql or "" for _, sql in create_sql))
+        fingerprint = hashlib.sha1(ddl.encode("utf-8")).hexdigest()
+
+        return SchemaSnapshot(key, tables, table_info, foreign_keys, index, fingerprint,
+                              references)
+
+
+# ====================================================
+#               PROCESS-WIDE REGISTRY
+# ====================================================
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_schema_cache(db_path):
+    """Returns the shared SchemaCache for a database file."""
+    path = os.path.abspath(db_path)
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = SchemaCache(db_path)
+        return _caches[path]
@@ -0,0 +1,95 @@
+import math
+import re
+from collections import Counter
+
+
+# ====================================================
+#               TOKENIZATION
+# ====================================================
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "and", "or",
+    "with", "from", "all", "list", "show", "give", "me", "what", "which",
+    "who", "how", "many", "much", "is", "are", "their", "its", "each",
+    "per", "please", "find", "get", "display",
+}
+
+
+def tokenize(text):
+    """Lowercases, splits snake_case/camelCase and strips plural 's'."""
+    text = _CAMEL.sub(r"\1 \2", str(text)).lower()
+    tokens = []
+    for tok in _WORD.findall(text):
+        if tok in STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+# ====================================================
+#               BM25 INDEX OVER TABLES
+# ====================================================
+
+class SchemaIndex:
+    """
+    BM25 index with one document per table, built from the table name,
+    its column names and a sample of its values. Names are weighted
+    above values so "salary" finds the salary column before a row that
+    happens to mention it.
+    """
+
+    TABLE_WEIGHT = 3
+    COLUMN_WEIGHT = 2
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.doc_freq = Counter()
+        self.total_len = 0
+        self.avg_len = 0.0
+
+    def add_table(self, table, columns, rows):
+        tokens = tokenize(table) * self.TABLE_WEIGHT
+        for col in columns:
+            tokens += tokenize(col) * self.COLUMN_WEIGHT
+        for row in rows:
+            for value in row:
+                if isinstance(value, str):
+                    tokens += tokenize(value)
+
+        counts = Counter(tokens)
+        self.docs[table] = (counts, len(tokens))
+        self.doc_freq.update(counts.keys())
+        self.total_len += len(tokens)
+        self.avg_len = self.total_len / len(self.docs)
+
+    def score(self, question):
+        terms = set(tokenize(question))
+        n_docs = len(self.docs)
+        scores = {}
+
+        for table, (counts, length) in self.docs.items():
+            total = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                df = self.doc_freq[term]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = 1 - self.b + self.b * length / (self.avg_len or 1)
+                total += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+            if total > 0:
+                scores[table] = total
+
+        return scores
+
+    def top_tables(self, question, k):
+        scores = self.score(question)
+        ranked = sorted(scores, key=lambda t: scores[t], reverse=True)
+        return ranked[:k]
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# ====================================================
+#               SETTINGS (ENV OVERRIDABLE)
+# ====================================================
+
+# "memory" or "sqlite" (entries in a local file instead of RAM). Either
+# way the cache is single-process: the results it points at live in the
+# process's own ResultStore and data stamps are process-local.
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "memory")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+
+# Entries kept per cache; the least recently used go first
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "512"))
+
+
+# ====================================================
+#               BACKENDS
+# ====================================================
+
+class MemoryBackend:
+    """Thread-safe in-process LRU of JSON-able values."""
+
+    def __init__(self, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    Same interface, stored in a local SQLite file (values as JSON), so a
+    large cache does not sit in memory. `namespace` lets several caches
+    live in one file. Several processes may point at the same file, but
+    ResultCache keys are per process (see ResultCache.key), so they do
+    not share entries.
+    """
+
+    def __init__(self, path, namespace="default", max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_cache (
+                namespace TEXT,
+                key TEXT,
+                value TEXT,
+                last_used REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM shared_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE shared_cache SET last_used = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO shared_cache VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time())
+            )
+            self._conn.execute(
+                """
+                DELETE FROM shared_cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM shared_cache WHERE namespace = ?
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entries)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM shared_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+            self._conn.commit()
+
+    def items(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM shared_cache WHERE namespace = ?",
+                (self.namespace,)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM shared_cache WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM shared_cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+
+def make_backend(namespace, kind=SHARED_CACHE_BACKEND, path=SHARED_CACHE_PATH,
+                 max_entries=SHARED_CACHE_MAX_ENTRIES):
+    """Backend chosen by SHARED_CACHE_BACKEND ("memory" or "sqlite")."""
+    if kind == "sqlite":
+        return SQLiteBackend(path or ".queryspeak_shared.db", namespace, max_entries)
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {kind!r}")
+
+
+# ====================================================
+#               RESULT CACHE
+# ====================================================
+
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Whitespace and a trailing ';' never change the rows a query returns."""
+    return _SPACE.sub(" ", sql).strip().rstrip(";").strip()
+
+
+class ResultCache:
+    """
+    SQL -> stored result, shared by every session of the process: the
+    second analyst to run the same SQL gets the rows the first one
+    stored instead of running the query again. It is not shared across
+    processes: the ResultStore file is per process, and the pool's
+    data stamp includes a process-local epoch.
+
+    An entry remembers the tables the SQL reads and their data stamp
+    when it ran; it is served only while that stamp is unchanged (and
+    the result is still in the store), so uploads and other writes
+    invalidate it. invalidate(tables) drops entries eagerly.
+    """
+
+    def __init__(self, pool, store, backend=None):
+        self.pool = pool
+        self.store = store
+        self.backend = backend if backend is not None else make_backend("results")
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def key(self, sql):
+        # The store path is per process, so a shared SQLite backend file
+        # never hands one process another's (unreadable) entries
+        raw = f"{os.path.abspath(self.pool.db_path)}|{self.store.path}|{normalize_sql(sql)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def claim(self, sql):
+        """
+        Held while looking up and running sql, so concurrent sessions
+        asking for the same SQL run it once; the others wait and hit.
+        """
+        key = self.key(sql)
+        with self._lock:
+            entry = self._running.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._running.pop(key, None)
+
+    def get(self, sql):
+        """The stored result for sql if it is still current, else None."""
+        key = self.key(sql)
+        entry = self.backend.get(key)
+        result = None
+        # A changed stamp is just a miss; the entry is replaced by the
+        # next save of this SQL, or ages out
+        if entry is not None and json.dumps(self.pool.data_stamp(entry["tables"])) == entry["stamp"]:
+            result = self.store.get(entry["result_id"])
+            if result is None:        # evicted from the store: never servable again
+                self.backend.delete(key)
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += result.elapsed
+        return result
+
+    def save(self, result, sql, tables, stamp):
+        """
+        Stores a QueryResult (see ResultStore.save) and registers it for
+        sql with the data stamp taken before it ran. Interrupted results
+        are stored but not shared. Returns the StoredResult.
+        """
+        stored = self.store.save(result)
+        if not stored.interrupted:
+            self.backend.put(self.key(sql), {
+                "result_id": stored.result_id,
+                "tables": sorted(tables),
+                "stamp": json.dumps(stamp),
+            })
+        return stored
+
+    def invalidate(self, tables=None):
+        """Drops entries reading any of `tables` (all entries for None)."""
+        if tables is None:
+            dropped = len(self.backend)
+            self.backend.clear()
+            return dropped
+
+        wanted = {t.lower() for t in tables}
+        dropped = 0
+        for key, entry in self.backend.items():
+            if wanted & {t.lower() for t in entry["tables"]}:
+                self.backend.delete(key)
+                dropped += 1
+        return dropped
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
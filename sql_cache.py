@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+# ====================================================
+#               QUESTION NORMALIZATION
+# ====================================================
+
+# Politeness and filler words that never change the SQL we want
+FILLER = {
+    "please", "kindly", "can", "could", "would", "you", "me", "us", "i",
+    "want", "need", "to", "see", "the", "a", "an", "just", "now",
+}
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+def question_tokens(question):
+    return [t for t in _WORD.findall(question.lower()) if t not in FILLER]
+
+
+def normalize_question(question):
+    """'List all employees, please!' -> 'list all employees'"""
+    return " ".join(question_tokens(question))
+
+
+def _numbers(tokens):
+    return {t for t in tokens if t.isdigit()}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Words that flip or reorder the answer when they are the difference
+# between two otherwise similar questions ("employees who are [not] managers")
+NEGATIONS = {
+    "not", "no", "never", "none", "nobody", "without", "except", "excluding",
+    "exclude", "nor", "neither", "don", "doesn", "didn", "isn", "aren", "wasn",
+    "weren", "haven", "hasn", "cannot", "t",
+}
+COMPARATIVES = {
+    "more", "less", "fewer", "greater", "smaller", "larger", "bigger", "higher",
+    "lower", "above", "below", "over", "under", "than", "least", "most", "before",
+    "after", "earlier", "later", "older", "younger", "between", "within",
+    "exactly", "equal", "min", "max", "minimum", "maximum",
+}
+ORDERING = {
+    "top", "bottom", "first", "last", "asc", "ascending", "desc", "descending",
+    "increasing", "decreasing", "highest", "lowest", "largest", "smallest",
+    "best", "worst", "oldest", "newest", "latest", "earliest",
+}
+MEANING_WORDS = NEGATIONS | COMPARATIVES | ORDERING
+
+
+def _stem(token):
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def identifier_words(names):
+    """Table/column names as question words: department_name -> department_name, department, name."""
+    words = set()
+    for name in names:
+        name = name.lower()
+        words.add(_stem(name))
+        words.update(_stem(part) for part in name.split("_") if part)
+    return words
+
+
+# ====================================================
+#               PERSISTENT SQL CACHE
+# ====================================================
+
+class SQLCache:
+    """
+    Question -> generated SQL cache in a local SQLite sidecar file.
+
+    Keys are the normalized question plus the schema fingerprint, so any
+    schema change makes old entries unreachable. Entries expire after
+    `ttl` seconds and the least recently used are evicted past
+    `max_entries`.
+
+    Fuzzy matching is opt-in: with `fuzzy_threshold` set, a miss falls
+    back to the most similar cached question (token-set Jaccard) for the
+    same schema, as long as both mention the same numbers and the words
+    they differ in are not negations, comparatives, ordering words or
+    table/column names (those change the SQL).
+    """
+
+    def __init__(self, path, max_entries=1000, ttl=7 * 24 * 3600,
+                 fuzzy_threshold=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fuzzy_threshold = fuzzy_threshold
+
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                question TEXT,
+                sql TEXT,
+                gen_seconds REAL,
+                created REAL,
+                last_used REAL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sql_cache_fp ON sql_cache (fingerprint, last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question, fingerprint):
+        raw = f"{normalize_question(question)}|{fingerprint}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question, fingerprint, identifiers=()):
+        """
+        Returns (sql, kind, cached question) with kind "exact"/"fuzzy",
+        or (None, None, None). `identifiers` are the schema's table and
+        column names, which a fuzzy match may not differ in.
+        """
+        now = time.time()
+        key = self.make_key(question, fingerprint)
+
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sql_cache WHERE created < ?", (now - self.ttl,)
+            )
+            row = self._conn.execute(
+                "SELECT key, question, sql, gen_seconds FROM sql_cache WHERE key = ?", (key,)
+            ).fetchone()
+            kind = "exact"
+
+            if row is None and self.fuzzy_threshold:
+                row = self._fuzzy_match(question, fingerprint, identifiers)
+                kind = "fuzzy"
+
+            if row is None:
+                self.misses += 1
+                self._conn.commit()
+                return None, None, None
+
+            hit_key, cached_q, sql, gen_seconds = row
+            self._conn.execute(
+                "UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, hit_key)
+            )
+            self._conn.commit()
+
+            if kind == "exact":
+                self.hits += 1
+            else:
+                self.fuzzy_hits += 1
+            self.saved_seconds += gen_seconds or 0.0
+            return sql, kind, cached_q
+
+    def _fuzzy_match(self, question, fingerprint, identifiers=()):
+        tokens = question_tokens(question)
+        wanted = set(tokens)
+        numbers = _numbers(tokens)
+        protected = identifier_words(identifiers)
+        best, best_score = None, 0.0
+
+        rows = self._conn.execute(
+            "SELECT key, question, sql, gen_seconds FROM sql_cache "
+            "WHERE fingerprint = ? ORDER BY last_used DESC LIMIT ?",
+            (fingerprint, self.max_entries),
+        )
+        for key, cached_q, sql, gen_seconds in rows:
+            cached = question_tokens(cached_q)
+            if _numbers(cached) != numbers:
+                continue
+            differing = wanted ^ set(cached)
+            if differing & MEANING_WORDS or {_stem(t) for t in differing} & protected:
+                continue
+            score = jaccard(wanted, set(cached))
+            if score >= self.fuzzy_threshold and score > best_score:
+                best, best_score = (key, cached_q, sql, gen_seconds), score
+
+        return best
+
+    def put(self, question, fingerprint, sql, gen_seconds=0.0):
+        now = time.time()
+        key = self.make_key(question, fingerprint)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sql_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, question, sql, gen_seconds, now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM sql_cache WHERE key IN (
+                    SELECT key FROM sql_cache ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sql_cache")
+            self._conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.fuzzy_hits + self.misses
+        return {
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.fuzzy_hits) / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+def default_cache_path(db_path):
+    """Sidecar file next to the database: database.db -> .queryspeak_cache.db"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ".queryspeak_cache.db")
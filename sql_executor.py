@@ -0,0 +1,428 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from sql_guard import read_only
+
+
+# ====================================================
+#               RESULT BUDGETS
+# ====================================================
+
+BATCH_SIZE = 500
+MAX_ROWS = 10_000
+MAX_BYTES = 32 * 1024 * 1024
+
+
+# Per-query budgets: wall-clock seconds and SQLite VM steps (0 = unlimited)
+QUERY_TIMEOUT_S = float(os.getenv("QUERY_TIMEOUT_S", "30"))
+QUERY_MAX_STEPS = int(os.getenv("QUERY_MAX_STEPS", "0"))
+
+# The progress handler runs every this many VM instructions
+PROGRESS_INTERVAL = 1000
+
+
+def row_nbytes(row):
+    """Cheap size estimate: text/blob length, 8 bytes for anything else."""
+    return sum(
+        len(v) if isinstance(v, (str, bytes)) else 8
+        for v in row
+    )
+
+
+# ====================================================
+#               TIMEOUT / CANCELLATION
+# ====================================================
+
+class QueryInterrupted(Exception):
+    """The query was stopped by its time/step budget or cancelled."""
+
+
+class QueryControl:
+    """
+    Wall-clock and VM-step budget plus a cancel switch for one query,
+    enforced through Connection.set_progress_handler. cancel() may be
+    called from any thread; it also interrupt()s the running statement.
+    """
+
+    def __init__(self, timeout=QUERY_TIMEOUT_S, max_steps=QUERY_MAX_STEPS):
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.reason = None          # None / "timeout" / "steps" / "cancelled"
+        self.elapsed = 0.0          # time spent attached, over all fetches
+        self._cancelled = threading.Event()
+        self._conn = None
+        self._started = None
+        self._steps = 0
+
+    def attach(self, conn):
+        """
+        Meters work done on conn (execute + first page, or a later page
+        fetch) against the query's budget. The budget is cumulative:
+        every fetch spends from the same time and step allowance, while
+        idle time between fetches is not counted. A no-op while attached.
+        """
+        if self._conn is conn:
+            return
+        self._conn = conn
+        self._started = time.perf_counter()
+        conn.set_progress_handler(self._tick, PROGRESS_INTERVAL)
+
+    def detach(self):
+        if self._conn is not None:
+            self.elapsed += time.perf_counter() - self._started
+            self._conn.set_progress_handler(None, 0)
+            self._conn = None
+
+    def _tick(self):
+        self._steps += PROGRESS_INTERVAL
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self.timeout and self.elapsed + time.perf_counter() - self._started > self.timeout:
+            self.reason = "timeout"
+        elif self.max_steps and self._steps > self.max_steps:
+            self.reason = "steps"
+        return 1 if self.reason else 0
+
+    def cancel(self):
+        self._cancelled.set()
+        # interrupt() aborts without consulting the progress handler
+        self.reason = self.reason or "cancelled"
+        conn = self._conn
+        if conn is not None:
+            conn.interrupt()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def describe(self):
+        return {
+            "timeout": f"Query stopped after exceeding its {self.timeout:g}s time limit.",
+            "steps": f"Query stopped after exceeding its {self.max_steps:,} step budget.",
+            "cancelled": "Query cancelled.",
+        }.get(self.reason, "Query interrupted.")
+
+
+# ====================================================
+#               STREAMING CURSOR
+# ====================================================
+
+class ResultStream:
+    """
+    An executed query whose rows are read lazily with fetchmany().
+    The first page is read by execute_query; later pages (the preview's
+    "load more", full downloads) continue from the same cursor instead
+    of running the query again.
+    """
+
+    def __init__(self, conn, cursor, batch_size=BATCH_SIZE, release=None,
+                 control=None):
+        self._conn = conn
+        self._cursor = cursor
+        self._release = release
+        self.control = control
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pending = []
+        self._cursor_done = False
+        self.batch_size = batch_size
+        self.rows_scanned = 0
+        self.cut_short = False      # closed with rows still unread
+
+    @property
+    def exhausted(self):
+        return self._cursor_done and not self._pending
+
+    def _read(self, n):
+        batch = self._pending[:n]
+        del self._pending[:n]
+
+        if len(batch) < n and not self._cursor_done:
+            want = n - len(batch)
+            more = self._step(self._cursor.fetchmany, want)
+            self.rows_scanned += len(more)
+            if len(more) < want:
+                self._cursor_done = True
+                self.close()
+            batch.extend(more)
+
+        return batch
+
+    def _step(self, fn, *args):
+        """Cursor read under the query budget; an interrupt ends the stream."""
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError:
+            if self.control is None or self.control.reason is None:
+                raise
+            self._cursor_done = True
+            self.close()
+            return [] if args else None
+
+    @property
+    def interrupted(self):
+        return self.control.reason if self.control is not None else None
+
+    def fetch(self, max_rows=None, max_bytes=None):
+        """Reads up to max_rows rows / max_bytes bytes; returns the rows."""
+        with self._lock:
+            if self.control is not None and not self._closed:
+                self.control.attach(self._conn)
+            try:
+                return self._fetch(max_rows, max_bytes)
+            finally:
+                if self.control is not None:
+                    self.control.detach()
+
+    def _fetch(self, max_rows, max_bytes):
+        rows = []
+        size = 0
+
+        while not self.exhausted:
+            want = self.batch_size
+            if max_rows is not None:
+                want = min(want, max_rows - len(rows))
+            if want <= 0:
+                break
+
+            batch = self._read(want)
+            over_budget = False
+            for i, row in enumerate(batch):
+                rows.append(row)
+                size += row_nbytes(row)
+                if max_bytes is not None and size >= max_bytes:
+                    # Unread rows go back in front of the buffer
+                    self._pending[:0] = batch[i + 1:]
+                    over_budget = True
+                    break
+
+            if over_budget:
+                break
+
+        # A budget that ends exactly on the last row would otherwise
+        # report "truncated" for a complete result, so peek one row.
+        if not self.exhausted and not self._pending:
+            row = self._step(self._cursor.fetchone)
+            if row is None:
+                self._cursor_done = True
+                self.close()
+            else:
+                self.rows_scanned += 1
+                self._pending.append(row)
+
+        return rows
+
+    def fetch_all(self):
+        """Yields the remaining rows batch by batch."""
+        while not self.exhausted:
+            batch = self.fetch(max_rows=self.batch_size)
+            if batch:
+                yield batch
+
+    def close(self):
+        """Finalizes the cursor and hands the connection back (once)."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._cursor_done:
+            self._cursor_done = True
+            self.cut_short = True
+        if self.control is not None:
+            self.control.detach()
+        try:
+            self._cursor.close()
+            if self._release is not None:
+                self._release(self._conn)
+            else:
+                self._conn.close()
+        except sqlite3.Error:
+            pass
+
+    def __del__(self):
+        self.close()
+
+
+# ====================================================
+#               COLUMNAR RESULT
+# ====================================================
+
+class QueryResult:
+    """
+    Columnar query result: column names from cursor.description and one
+    list per column, filled batch by batch straight from the cursor.
+    Further pages come from the still-open stream on demand.
+    """
+
+    def __init__(self, columns, stream=None):
+        self.result_id = uuid.uuid4().hex
+        self.columns = list(columns)
+        self.data = [[] for _ in self.columns]
+        self.num_rows = 0
+        self.stream = stream
+        self.sql = None
+        self.auto_limited = False
+        self.plan = []
+        self._frame = None
+
+    def extend(self, rows):
+        if not rows:
+            return
+        for column, values in zip(self.data, zip(*rows)):
+            column.extend(values)
+        self.num_rows += len(rows)
+        self._frame = None
+
+    @property
+    def truncated(self):
+        return self.stream is not None and (not self.stream.exhausted or self.stream.cut_short)
+
+    @property
+    def rows_scanned(self):
+        return self.stream.rows_scanned if self.stream is not None else self.num_rows
+
+    @property
+    def interrupted(self):
+        """None, or why the stream was cut off: timeout / steps / cancelled."""
+        return self.stream.interrupted if self.stream is not None else None
+
+    @property
+    def elapsed(self):
+        control = self.stream.control if self.stream is not None else None
+        return control.elapsed if control is not None else 0.0
+
+    def fetch_more(self, max_rows=BATCH_SIZE, max_bytes=None):
+        """Appends the next page from the open stream; returns rows added."""
+        if not self.truncated:
+            return 0
+        rows = self.stream.fetch(max_rows=max_rows, max_bytes=max_bytes)
+        self.extend(rows)
+        return len(rows)
+
+    def fetch_all(self):
+        while self.truncated and self.fetch_more(max_rows=self.stream.batch_size * 20):
+            pass
+
+    def iter_rows(self, start=0, stop=None):
+        """Row tuples, for callers that want rows rather than columns."""
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        for i in range(start, stop):
+            yield tuple(column[i] for column in self.data)
+
+    def to_frame(self):
+        """pandas DataFrame built from the column arrays (cached)."""
+        if self._frame is None:
+            import pandas as pd
+
+            # Positional keys keep duplicate names like a.id / b.id apart
+            frame = pd.DataFrame({i: col for i, col in enumerate(self.data)})
+            frame.columns = self.columns
+            self._frame = frame
+        return self._frame
+
+    def summary(self):
+        """Small, serializable description (what graph state carries)."""
+        return {
+            "result_id": self.result_id,
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "truncated": self.truncated,
+            "rows_scanned": self.rows_scanned,
+            "auto_limited": self.auto_limited,
+            "interrupted": self.interrupted,
+            "elapsed": round(self.elapsed, 4),
+        }
+
+    def to_dict(self):
+        return {
+            "columns": self.columns,
+            "data": self.data,
+            "num_rows": self.num_rows,
+            "truncated": self.truncated,
+            "rows_scanned": self.rows_scanned,
+        }
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+    def __len__(self):
+        return self.num_rows
+
+    def __repr__(self):
+        more = ", truncated" if self.truncated else ""
+        return f"<QueryResult {self.num_rows} rows x {len(self.columns)} columns{more}>"
+
+
+class ResultRegistry:
+    """
+    Live QueryResults by result_id, so serializable graph state can
+    refer to a result whose stream is still open. Only the newest
+    `capacity` are remembered. Evicted results are closed, so their
+    pooled connection and read snapshot do not hold back WAL
+    checkpoints; the rows they already read stay usable.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            self._results[result.result_id] = result
+            evicted = []
+            while len(self._results) > self.capacity:
+                evicted.append(self._results.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return result.result_id
+
+    def get(self, result_id):
+        with self._lock:
+            return self._results.get(result_id)
+
+
+def execute_query(pool, sql, max_rows=MAX_ROWS, max_bytes=MAX_BYTES,
+                  batch_size=BATCH_SIZE, guard=None, tables=(), control=None):
+    """
+    Runs sql on a pooled read-only connection and streams the first page
+    within the row/byte budget into a QueryResult; result.truncated tells
+    whether more rows are pending. The connection goes back to the pool
+    once the stream is exhausted or closed.
+
+    With a guard, the statement is checked (and possibly auto-LIMITed)
+    first; GuardRejected is raised for SQL that must not run. The
+    control's time/step budget covers execution and every page fetch;
+    QueryInterrupted is raised if it runs out before the first row.
+    """
+    control = control if control is not None else QueryControl()
+    conn = pool.acquire()
+    verdict = None
+    try:
+        control.attach(conn)
+        with read_only(conn):
+            if guard is not None:
+                verdict = guard.check(conn, sql, tables)
+                sql = verdict["sql"]
+            cursor = conn.cursor()
+            cursor.execute(sql)
+    except Exception as e:
+        control.detach()
+        pool.release(conn)
+        if control.reason and isinstance(e, sqlite3.OperationalError):
+            raise QueryInterrupted(control.describe()) from e
+        raise
+
+    columns = [d[0] for d in cursor.description or []]
+    stream = ResultStream(conn, cursor, batch_size, release=pool.release,
+                          control=control)
+    result = QueryResult(columns, stream)
+    result.sql = sql
+    result.auto_limited = bool(verdict and verdict["auto_limited"])
+    result.plan = verdict["plan"] if verdict else []
+    result.extend(stream.fetch(max_rows=max_rows, max_bytes=max_bytes))
+    return result
@@ -0,0 +1,116 @@
+import re
+import sqlite3
+
+
+# ====================================================
+#               SQL FROM A STREAMED COMPLETION
+# ====================================================
+
+FENCE = "```"
+
+# Where the statement starts when the model skipped the code fence: a
+# line starting with SELECT or WITH <name> AS (. A SELECT in the middle
+# of a line ("Here I select the employees:") is only a last resort once
+# the stream has ended, never while it is still arriving.
+_LINE_START = re.compile(
+    r"^[ \t]*(select\b|with\s+(?:recursive\s+)?\w+\s*(?:\([^)]*\)\s*)?as\s*\()",
+    re.I | re.M
+)
+_ANY_SELECT = re.compile(r"\b(select)\b", re.I)
+
+
+class SQLExtractor:
+    """
+    Pulls one SQL statement out of LLM output while it streams in.
+
+    Handles a ```sql fence (with commentary around it) or bare SQL after
+    some preamble. feed() returns True as soon as the statement is
+    complete: at the closing fence, or at the first ';' that ends a
+    statement (sqlite3.complete_statement, so ';' inside string literals
+    and comments does not count). The rest of the stream can then be
+    dropped. Until a fence or a line starting a statement has arrived
+    the text is only buffered, so streaming and extract_sql() on the
+    whole response always agree.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._end = None          # end of the statement in self.text
+        self._scanned = 0         # ';' before this offset were checked
+
+    def feed(self, chunk):
+        if not self.done:
+            self.text += chunk or ""
+            self._scan()
+        return self.done
+
+    def _body_start(self):
+        """Offset where the SQL begins, or None while it is not known yet."""
+        fence = self.text.find(FENCE)
+        match = _LINE_START.search(self.text)
+        if fence != -1 and (match is None or fence < match.start(1)):
+            newline = self.text.find("\n", fence)
+            return None if newline == -1 else newline + 1
+        return match.start(1) if match else None
+
+    def _scan(self):
+        start = self._body_start()
+        if start is None:
+            return
+
+        # Searched from the body on, so the opening fence never counts
+        close = self.text.find(FENCE, start)
+        if close != -1:
+            self._end = close
+            self.done = True
+
+        limit = self._end if self._end is not None else len(self.text)
+        semi = _statement_end(self.text, start, max(start, self._scanned), limit)
+        if semi is not None:
+            self._end = semi
+            self.done = True
+            return
+        self._scanned = max(start, limit - 1)
+
+    @property
+    def partial(self):
+        """The statement as far as it has arrived (for progress display)."""
+        start = self._body_start()
+        if start is None:
+            return ""
+        end = self._end if self._end is not None else len(self.text)
+        return self.text[start:end].rstrip("`").strip()
+
+    @property
+    def sql(self):
+        """The statement without fences or a trailing ';'."""
+        sql = self.partial
+        if not sql and not self.done:
+            match = _ANY_SELECT.search(self.text)
+            if match:
+                # No fence and no statement line: the first SELECT anywhere
+                start = match.start(1)
+                end = _statement_end(self.text, start, start, len(self.text))
+                sql = self.text[start:end if end is not None else None].strip()
+            else:
+                # Unrecognized shape: the raw output minus fences
+                sql = self.text.replace(FENCE + "sql", "").replace(FENCE, "").strip()
+        return sql.rstrip(";").strip()
+
+
+def _statement_end(text, start, offset, limit):
+    """Offset of the first ';' in text[offset:limit] that completes the statement at start."""
+    semi = text.find(";", offset, limit)
+    while semi != -1:
+        if sqlite3.complete_statement(text[start:semi + 1]):
+            return semi
+        semi = text.find(";", semi + 1, limit)
+    return None
+
+
+def extract_sql(text):
+    """The SQL statement in a complete LLM response."""
+    extractor = SQLExtractor()
+    extractor.feed(text)
+    return extractor.sql
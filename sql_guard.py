@@ -0,0 +1,206 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+
+
+# ====================================================
+#               THRESHOLDS (ENV OVERRIDABLE)
+# ====================================================
+
+# Full scans of tables bigger than this get an automatic LIMIT
+GUARD_SCAN_ROWS = int(os.getenv("GUARD_SCAN_ROWS", "1000000"))
+GUARD_AUTO_LIMIT = int(os.getenv("GUARD_AUTO_LIMIT", "100000"))
+
+# Nested-loop joins of unindexed scans whose row product exceeds this are rejected
+GUARD_JOIN_ROWS = int(os.getenv("GUARD_JOIN_ROWS", "100000000"))
+
+
+class GuardRejected(Exception):
+    """Generated SQL that must not run: not read-only, or too expensive."""
+
+
+# ====================================================
+#               READ-ONLY AUTHORIZER
+# ====================================================
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    if action in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+@contextmanager
+def read_only(conn):
+    """
+    Denies anything but reads while statements are prepared on conn
+    (DDL, DML, PRAGMA, ATTACH, transactions). The authorizer runs at
+    prepare time, so it only needs to be installed around execute().
+    """
+    conn.set_authorizer(_authorize)
+    try:
+        yield conn
+    finally:
+        conn.set_authorizer(None)
+
+
+# ====================================================
+#               PLAN INSPECTION
+# ====================================================
+
+_TABLE_REF = re.compile(
+    r'\b(?:from|join)\s+["`\[]?(\w+)["`\]]?(?:\s+(?:as\s+)?(?!(?:on|using|where|join|'
+    r'inner|left|right|cross|natural|group|order|limit|union|having)\b)(\w+))?',
+    re.I
+)
+# Further tables of a comma join: FROM a, b AS x, c
+_COMMA_REF = re.compile(
+    r',\s*["`\[]?(\w+)["`\]]?(?:\s+(?:as\s+)?(?!(?:on|using|where|join|'
+    r'inner|left|right|cross|natural|group|order|limit|union|having)\b)(\w+))?',
+    re.I
+)
+_FROM_CLAUSE = re.compile(
+    r"\bfrom\b(.*?)(?=\b(?:where|group|order|limit|having|union|except|intersect|window)\b|\)|$)",
+    re.I | re.S
+)
+_LIMIT = re.compile(r"\blimit\s+\d+(\s*(,|offset)\s*\d+)?\s*$", re.I)
+
+
+def strip_comments(sql):
+    """Removes -- and /* */ comments outside string literals and quoted names."""
+    out = []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in "'\"`[":
+            close = "]" if ch == "[" else ch
+            end = sql.find(close, i + 1)
+            end = n - 1 if end == -1 else end
+            out.append(sql[i:end + 1])
+            i = end + 1
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            out.append(" ")
+            i = n if end == -1 else end + 2
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def table_aliases(sql, tables):
+    """{name used in the plan: real table} for tables in FROM/JOIN and comma joins."""
+    known = {t.lower(): t for t in tables}
+    aliases = {}
+    refs = _TABLE_REF.findall(sql)
+    for clause in _FROM_CLAUSE.findall(sql):
+        refs += _COMMA_REF.findall(clause)
+    for table, alias in refs:
+        real = known.get(table.lower())
+        if real:
+            aliases[table.lower()] = real
+            if alias:
+                aliases[alias.lower()] = real
+    return aliases
+
+
+def estimate_rows(conn, table, cache):
+    """MAX(rowid) is an O(log n) stand-in for COUNT(*) on rowid tables."""
+    if table not in cache:
+        try:
+            cache[table] = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.Error:
+            cache[table] = 0
+    return cache[table]
+
+
+class SQLGuard:
+    """
+    Pre-execution check of generated SQL: one complete, read-only
+    statement whose EXPLAIN QUERY PLAN is affordable.
+    """
+
+    def __init__(self, scan_rows=GUARD_SCAN_ROWS, join_rows=GUARD_JOIN_ROWS,
+                 auto_limit=GUARD_AUTO_LIMIT):
+        self.scan_rows = scan_rows
+        self.join_rows = join_rows
+        self.auto_limit = auto_limit
+
+    def check(self, conn, sql, tables=()):
+        """
+        Returns {"sql", "plan", "auto_limited"} or raises GuardRejected.
+        Run inside read_only(conn) so the plan's prepare is authorized.
+        """
+        # A trailing "-- comment" would swallow the ";" appended below
+        sql = strip_comments(sql).strip().rstrip(";").strip()
+        if not sql or not sqlite3.complete_statement(sql + ";"):
+            raise GuardRejected("SQL is empty or not a complete statement.")
+
+        # Plan names are aliases or real tables; sqlite_master covers
+        # tables the caller's list (the pruned prompt schema) lacks. Read
+        # first: EXPLAIN opens no transaction, so it would be planned
+        # against the schema as the connection last loaded it (without an
+        # index created since); this read reloads a changed schema.
+        known = set(tables) | {
+            name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.ProgrammingError as e:
+            raise GuardRejected("Only one statement can run at a time.") from e
+        except sqlite3.DatabaseError as e:
+            if "not authorized" in str(e):
+                raise GuardRejected("Only read-only SELECT queries are allowed.") from e
+            raise
+
+        aliases = {t.lower(): t for t in known}
+        aliases.update(table_aliases(sql, known))
+        sizes = {}
+        loops = {}
+        big_scan = False
+
+        for _, parent, _, detail in plan:
+            if not detail.startswith("SCAN "):
+                continue
+            name = detail.split()[1].lower()
+            table = aliases.get(name)
+            rows = estimate_rows(conn, table, sizes) if table else 0
+            loops.setdefault(parent, []).append(rows)
+            big_scan = big_scan or rows > self.scan_rows
+
+        for scans in loops.values():
+            if len(scans) < 2:
+                continue
+            product = 1
+            for rows in scans:
+                product *= max(rows, 1)
+            if product > self.join_rows:
+                raise GuardRejected(
+                    f"Query joins {len(scans)} full table scans without an index "
+                    f"(~{product:,} row combinations). Add a join condition on indexed columns."
+                )
+
+        auto_limited = False
+        if big_scan and not _LIMIT.search(sql):
+            sql = f"SELECT * FROM (\n{sql}\n) LIMIT {int(self.auto_limit)}"
+            auto_limited = True
+
+        return {
+            "sql": sql,
+            "plan": [row[3] for row in plan],
+            "auto_limited": auto_limited
+        }
@@ -0,0 +1,157 @@
+import difflib
+import re
+import threading
+
+from sql_tools import classify_error, missing_identifier
+
+
+# ====================================================
+#               LOCAL (NO-LLM) REPAIRS
+# ====================================================
+
+def _close_match(name, candidates, cutoff=0.6):
+    by_lower = {c.lower(): c for c in candidates}
+    match = difflib.get_close_matches(name.lower(), list(by_lower), n=1, cutoff=cutoff)
+    return by_lower[match[0]] if match else None
+
+
+_STRING = re.compile(r"('(?:[^']|'')*')")
+
+# A comma left before a clause keyword, a closing parenthesis or the end
+_STRAY_COMMA = re.compile(r"\s*,\s*(?=(?:from|where|group|having|order|limit|union)\b)", re.I)
+_TRAILING_COMMA = re.compile(r"\s*,\s*(?=\)|;?\s*$)")
+_DOUBLE_COMMA = re.compile(r",(?:\s*,)+")
+
+
+def _outside_strings(sql, fix):
+    """Applies fix() to the SQL text between its '...' literals."""
+    parts = _STRING.split(sql)
+    return "".join(part if i % 2 else fix(part) for i, part in enumerate(parts))
+
+
+def _replace_identifier(sql, old, new):
+    """Swaps a (possibly quoted) identifier, leaving longer names and string literals alone."""
+    pattern = re.compile(r'(?<![\w.])(["`\[]?)' + re.escape(old) + r'(["`\]]?)(?!\w)', re.I)
+    return _outside_strings(sql, lambda text: pattern.sub(
+        lambda m: m.group(1) + new + m.group(2), text))
+
+
+def _fix_commas(sql):
+    """Drops doubled and dangling commas, the syntax slip safe to fix blind."""
+    def fix(text):
+        text = _DOUBLE_COMMA.sub(",", text)
+        text = _STRAY_COMMA.sub(" ", text)
+        return _TRAILING_COMMA.sub("", text)
+    return _outside_strings(sql.strip(), fix)
+
+
+def referenced_tables(sql, tables):
+    """Schema tables whose names appear in the SQL text."""
+    lowered = sql.lower()
+    return [
+        t for t in tables
+        if re.search(r'(?<![\w])' + re.escape(t.lower()) + r'(?!\w)', lowered)
+    ]
+
+
+def local_repair(sql, error, snapshot):
+    """
+    Cheap fixes tried before asking the LLM again: fuzzy-match an
+    unknown table or column against the cached schema, or drop stray
+    commas on syntax errors. Returns new SQL or None.
+    """
+    kind = classify_error(error)
+    name = missing_identifier(error)
+
+    if kind == "no_such_table" and name:
+        match = _close_match(name, snapshot.tables)
+        if match:
+            return _replace_identifier(sql, name, match)
+
+    if kind == "no_such_column" and name:
+        qualifier, _, column = name.rpartition(".")
+        tables = referenced_tables(sql, snapshot.tables) or list(snapshot.tables)
+        columns = {c["name"] for t in tables for c in snapshot.tables[t]}
+        match = _close_match(column, columns)
+        if match:
+            if qualifier:
+                return _replace_identifier(sql, f"{qualifier}.{column}", f"{qualifier}.{match}")
+            return _replace_identifier(sql, column, match)
+
+    if kind == "syntax":
+        fixed = _fix_commas(sql)
+        if fixed != sql.strip():
+            return fixed
+
+    return None
+
+
+# ====================================================
+#               LLM REPAIR PROMPT
+# ====================================================
+
+def affected_tables(sql, error, snapshot):
+    """Tables the failing SQL touches, plus the best guess for a missing one."""
+    tables = referenced_tables(sql, snapshot.tables)
+    name = missing_identifier(error)
+    if classify_error(error) == "no_such_table" and name:
+        guess = _close_match(name, snapshot.tables, cutoff=0.3)
+        if guess and guess not in tables:
+            tables.append(guess)
+    return tables
+
+
+def build_repair_prompt(sql, error, schema):
+    return f"""
+The SQLite query below failed. Fix it.
+
+- Use table and column names exactly as shown.
+- Output ONLY the corrected SQL query.
+
+ERROR:
+{error}
+
+FAILED SQL:
+{sql}
+
+RELEVANT TABLES:
+{schema}
+
+Write ONLY the corrected SQL query:
+"""
+
+
+# ====================================================
+#               METRICS
+# ====================================================
+
+class RepairStats:
+    """How failed SQL ended up: fixed locally, fixed by the LLM, or not at all."""
+
+    def __init__(self):
+        self.failures = 0
+        self.fixed_locally = 0
+        self.fixed_by_llm = 0
+        self.unrepaired = 0
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, repaired_by, ok, llm_calls):
+        with self._lock:
+            self.failures += 1
+            self.llm_calls += llm_calls
+            if not ok:
+                self.unrepaired += 1
+            elif repaired_by == "llm":
+                self.fixed_by_llm += 1
+            else:
+                self.fixed_locally += 1
+
+    def stats(self):
+        return {
+            "failures": self.failures,
+            "fixed_locally": self.fixed_locally,
+            "fixed_by_llm": self.fixed_by_llm,
+            "unrepaired": self.unrepaired,
+            "llm_calls": self.llm_calls,
+        }
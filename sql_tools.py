@@ -0,0 +1,147 @@
+import re
+
+
+# ##############################################################
+# 7B FEATURE — SQL EXPLANATION (LOCAL)
+# ##############################################################
+def explain_sql(sql):
+    sql_lower = sql.lower()
+    explanation = []
+
+    if "select" in sql_lower:
+        explanation.append("• The query retrieves data from the database.")
+
+    if " from " in sql_lower:
+        table_name = sql_lower.split(" from ")[1].split()[0]
+        explanation.append(f"• It reads data from the **{table_name}** table.")
+
+    if " where " in sql_lower:
+        condition = sql_lower.split(" where ")[1].split("order by")[0]
+        explanation.append(f"• It filters rows using: **{condition.strip()}**.")
+
+    if " order by " in sql_lower:
+        order_col = sql_lower.split(" order by ")[1].split()[0]
+        explanation.append(f"• Ordered using: **{order_col}**.")
+
+    if " group by " in sql_lower:
+        group_col = sql_lower.split(" group by ")[1].split()[0]
+        explanation.append(f"• Groups rows using: **{group_col}**.")
+
+    if " join " in sql_lower:
+        explanation.append("• Query involves a JOIN between tables.")
+
+    if " limit " in sql_lower:
+        limit_val = sql_lower.split(" limit ")[1].split()[0]
+        explanation.append(f"• Output limited to **{limit_val}** rows.")
+
+    if not explanation:
+        return "No explanation available."
+
+    return "\n".join(explanation)
+
+
+# ##############################################################
+# 7D FEATURE — SQL OPTIMIZER (LOCAL)
+# ##############################################################
+def optimize_sql(sql, schema):
+    optimized = sql.strip()
+    optimized = optimized.replace("DISTINCT DISTINCT", "DISTINCT")
+
+    while "  " in optimized:
+        optimized = optimized.replace("  ", " ")
+
+    if "select *" in optimized.lower():
+        try:
+            tbl = optimized.lower().split(" from ")[1].split()[0]
+            if tbl in schema:
+                cols = ", ".join([c["name"] for c in schema[tbl]])
+                optimized = optimized.replace("*", cols)
+        except:
+            pass
+
+    optimized = optimized.replace("( ", "(").replace(" )", ")")
+    optimized = optimized.replace("= TRUE", " = 1").replace("= FALSE", " = 0")
+
+    if "limit" not in optimized.lower():
+        optimized += " LIMIT 100"
+
+    for kw in ["select", "from", "where", "group by", "order by", "limit", "join"]:
+        optimized = optimized.replace(kw, kw.upper())
+        optimized = optimized.replace(kw.title(), kw.upper())
+
+    return optimized
+
+
+# ##############################################################
+# 7C FEATURE — SQL FIXER ENGINE
+# ##############################################################
+def fix_sql(sql, schema):
+    s = sql.strip()
+
+    while ",," in s:
+        s = s.replace(",,", ",")
+
+    s = s.replace(", FROM", " FROM")
+
+    parts = s.lower().split("select")
+    if len(parts) > 1 and "from" in parts[1]:
+        cols_section = parts[1].split("from")[0]
+        if " " in cols_section and "," not in cols_section:
+            s = s.replace(cols_section, ", ".join(cols_section.strip().split()))
+
+    if "from" not in s.lower():
+        tables = list(schema.keys())
+        if tables:
+            s += f" FROM {tables[0]}"
+
+    if " join " in s.lower() and " on " not in s.lower():
+        s += " ON 1=1"
+
+    if s.lower().startswith("select") and "from" in s.lower():
+        after = s.lower().split("select")[1].split("from")[0].strip()
+        if after == "":
+            tbl = s.lower().split("from")[1].split()[0]
+            if tbl in schema:
+                cols = ", ".join([c["name"] for c in schema[tbl]])
+                s = s.replace("SELECT", f"SELECT {cols}")
+
+    if "order by" in s.lower():
+        try:
+            tbl = s.lower().split("from")[1].split()[0]
+            valid = [c["name"] for c in schema.get(tbl, [])]
+            col = s.lower().split("order by")[1].strip().split()[0]
+            if col not in valid:
+                s = s.replace(f"ORDER BY {col}", "")
+        except:
+            pass
+
+    return s.strip()
+
+
+# ##############################################################
+# 9C FEATURE — SQL ERROR CLASSIFIER
+# ##############################################################
+ERROR_HINTS = {
+    "no_such_table": ("❌ Table does not exist.", "Check table name."),
+    "no_such_column": ("❌ Column not found.", "Verify column names."),
+    "syntax": ("❌ SQL Syntax Error.", "Check commas, parentheses, missing keywords."),
+}
+
+
+def classify_error(error):
+    """Maps a SQLite error message to no_such_table / no_such_column / syntax / other."""
+    err = str(error).lower()
+
+    if "no such table" in err:
+        return "no_such_table"
+    if "no such column" in err:
+        return "no_such_column"
+    if "syntax error" in err or "incomplete input" in err:
+        return "syntax"
+    return "other"
+
+
+def missing_identifier(error):
+    """'no such column: e.nme' -> 'e.nme' (None if the error names nothing)."""
+    match = re.search(r"no such (?:table|column): ([\w.\"\[\]`]+)", str(error), re.I)
+    return match.group(1).strip('"[]`') if match else None
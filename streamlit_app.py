@@ -1,16 +1,22 @@
 # streamlit_app.py
 import streamlit as st
 import pandas as pd
-import ast
-import io
-import sqlite3
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.lib import colors
-
-from langgraph_workflow import run_graph, get_schema
+from langgraph_workflow import QueryPipeline, ThreadBusy, get_schema
+from sql_tools import ERROR_HINTS, classify_error, explain_sql
+from db_pool import get_pool
+from exports import FORMATS as EXPORT_FORMATS, ExportCache
+from result_store import ResultStore, StoredResult
+from shared_cache import ResultCache
+from tracing import timed_span
+from ingest import ingest_file
+from sql_executor import QueryControl
+from schema_cache import get_schema_cache
 import streamlit.components.v1 as components   # For mic input
 
 
@@ -29,125 +35,35 @@ if "dark_mode" not in st.session_state:
 if "latest_result" not in st.session_state:
     st.session_state.latest_result = None
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-SQLITE_DB_PATH = "database.db"
-
-
-# ##############################################################
-# 7B FEATURE — SQL EXPLANATION (LOCAL)
-# ##############################################################
-def explain_sql(sql):
-    sql_lower = sql.lower()
-    explanation = []
-
-    if "select" in sql_lower:
-        explanation.append("• The query retrieves data from the database.")
-
-    if " from " in sql_lower:
-        table_name = sql_lower.split(" from ")[1].split()[0]
-        explanation.append(f"• It reads data from the **{table_name}** table.")
-
-    if " where " in sql_lower:
-        condition = sql_lower.split(" where ")[1].split("order by")[0]
-        explanation.append(f"• It filters rows using: **{condition.strip()}**.")
-
-    if " order by " in sql_lower:
-        order_col = sql_lower.split(" order by ")[1].split()[0]
-        explanation.append(f"• Ordered using: **{order_col}**.")
-
-    if " group by " in sql_lower:
-        group_col = sql_lower.split(" group by ")[1].split()[0]
-        explanation.append(f"• Groups rows using: **{group_col}**.")
-
-    if " join " in sql_lower:
-        explanation.append("• Query involves a JOIN between tables.")
-
-    if " limit " in sql_lower:
-        limit_val = sql_lower.split(" limit ")[1].split()[0]
-        explanation.append(f"• Output limited to **{limit_val}** rows.")
-
-    if not explanation:
-        return "No explanation available."
-
-    return "\n".join(explanation)
-
-
-# ##############################################################
-# 7D FEATURE — SQL OPTIMIZER (LOCAL)
-# ##############################################################
-def optimize_sql(sql, schema):
-    optimized = sql.strip()
-    optimized = optimized.replace("DISTINCT DISTINCT", "DISTINCT")
-
-    while "  " in optimized:
-        optimized = optimized.replace("  ", " ")
-
-    if "select *" in optimized.lower():
-        try:
-            tbl = optimized.lower().split(" from ")[1].split()[0]
-            if tbl in schema:
-                cols = ", ".join([c["name"] for c in schema[tbl]])
-                optimized = optimized.replace("*", cols)
-        except:
-            pass
-
-    optimized = optimized.replace("( ", "(").replace(" )", ")")
-    optimized = optimized.replace("= TRUE", " = 1").replace("= FALSE", " = 0")
-
-    if "limit" not in optimized.lower():
-        optimized += " LIMIT 100"
-
-    for kw in ["select", "from", "where", "group by", "order by", "limit", "join"]:
-        optimized = optimized.replace(kw, kw.upper())
-        optimized = optimized.replace(kw.title(), kw.upper())
+if "cancelled_question" not in st.session_state:
+    st.session_state.cancelled_question = None
 
-    return optimized
 
+SQLITE_DB_PATH = "database.db"
 
-# ##############################################################
-# 7C FEATURE — SQL FIXER ENGINE
-# ##############################################################
-def fix_sql(sql, schema):
-    s = sql.strip()
-
-    while ",," in s:
-        s = s.replace(",,", ",")
-
-    s = s.replace(", FROM", " FROM")
-
-    parts = s.lower().split("select")
-    if len(parts) > 1 and "from" in parts[1]:
-        cols_section = parts[1].split("from")[0]
-        if " " in cols_section and "," not in cols_section:
-            s = s.replace(cols_section, ", ".join(cols_section.strip().split()))
-
-    if "from" not in s.lower():
-        tables = list(schema.keys())
-        if tables:
-            s += f" FROM {tables[0]}"
+# Questions running at once across ALL sessions: the worker pool below is
+# shared by every browser tab of this server process, and a question
+# beyond the limit waits for a free worker. Workers mostly wait on the
+# LLM; concurrent SQLite reads are capped separately by SQLITE_POOL_SIZE.
+ASK_WORKERS = int(os.getenv("ASK_WORKERS", "16"))
 
-    if " join " in s.lower() and " on " not in s.lower():
-        s += " ON 1=1"
 
-    if s.lower().startswith("select") and "from" in s.lower():
-        after = s.lower().split("select")[1].split("from")[0].strip()
-        if after == "":
-            tbl = s.lower().split("from")[1].split()[0]
-            if tbl in schema:
-                cols = ", ".join([c["name"] for c in schema[tbl]])
-                s = s.replace("SELECT", f"SELECT {cols}")
+@st.cache_resource
+def load_pipeline():
+    """One QueryPipeline per server process, shared by every rerun/session."""
+    return QueryPipeline(SQLITE_DB_PATH, result_cache=load_result_cache())
 
-    if "order by" in s.lower():
-        try:
-            tbl = s.lower().split("from")[1].split()[0]
-            valid = [c["name"] for c in schema.get(tbl, [])]
-            col = s.lower().split("order by")[1].strip().split()[0]
-            if col not in valid:
-                s = s.replace(f"ORDER BY {col}", "")
-        except:
-            pass
 
-    return s.strip()
+@st.cache_resource
+def load_executor():
+    """
+    Worker threads that run questions while the page stays responsive.
+    One pool per server process (ASK_WORKERS threads), shared by all sessions.
+    """
+    return ThreadPoolExecutor(max_workers=ASK_WORKERS, thread_name_prefix="ask")
 
 
 # ==============================================================  
@@ -256,69 +172,212 @@ apply_theme()
 # ==============================================================  
 # Helper Functions  
 # ==============================================================  
-def parse_sql_rows(rows):
-    if isinstance(rows, str):
-        try:
-            return ast.literal_eval(rows)
-        except:
-            return rows
-    return rows
+PAGE_SIZE = 100
+
+
+@st.cache_resource
+def load_results():
+    """On-disk store of materialized results; sessions only keep handles."""
+    return ResultStore()
+
+
+@st.cache_resource
+def load_result_cache():
+    """
+    Results shared by all sessions: the same SQL over unchanged data is
+    answered from the result store instead of running again.
+    """
+    return ResultCache(get_pool(SQLITE_DB_PATH), load_results())
 
 
-def add_to_history(question, sql, rows):
+def _run_and_store(pipeline, store, question, thread_id, sql=None):
+    # Re-asking right after a cancel: the cancelled run of this question
+    # stops at its next chunk or query step, then this one may start
+    while True:
+        try:
+            if sql:
+                res = pipeline.replay(question, sql, thread_id=thread_id)
+            else:
+                res = pipeline.run(question, thread_id=thread_id)
+            break
+        except ThreadBusy:
+            time.sleep(0.05)
+
+    if res["result"] is not None and not isinstance(res["result"], StoredResult):
+        res["result"], span = timed_span("store_result", store.save, res["result"])
+        span["attributes"]["rows"] = len(res["result"])
+        add_span(pipeline, res["trace"], span)
+    # res["tables"] and res["stamp"] (taken by the pipeline before the query
+    # ran) let history replay tell whether the stored result is still current
+    return res
+
+
+def add_span(pipeline, trace, span):
+    """Adds a span measured outside the graph (storing, exports) to a trace."""
+    trace["spans"].append(span)
+    pipeline.tracer.export_span(trace, span)
+
+
+def _discard(future):
+    """Closes the result of a run nobody is waiting for any more."""
+    if future.exception() is None and future.result().get("result") is not None:
+        future.result()["result"].close()
+
+
+def ask(question, sql=None):
+    """
+    Runs the pipeline under a per-session, per-question thread id, so
+    re-asking after a failure (e.g. a Groq timeout) resumes from the
+    last finished step instead of starting over. With sql, that SQL is
+    executed instead of generating new SQL (history replay).
+
+    The run happens on a worker thread, which also writes the result to
+    the result store, while this one shows the elapsed time, the SQL as
+    the LLM streams it, and a cancel button. Pressing it (or any other widget) reruns the script, which
+    stops the polling loop; the finally block then interrupts the query
+    still running in SQLite.
+    """
+    thread_id = f"{st.session_state.session_id}:{question.strip().lower()}"
+    if sql:
+        thread_id += ":replay"
+    pipeline = load_pipeline()
+    future = load_executor().submit(
+        _run_and_store, pipeline, load_results(), question, thread_id, sql
+    )
+
+    status = st.empty()
+    draft = st.empty()
+    stop = st.empty()
+    stop.button("⏹ Cancel query", key=f"cancel:{thread_id}",
+                on_click=lambda: setattr(st.session_state, "cancelled_question", question))
+    started = time.perf_counter()
+    try:
+        while not future.done():
+            if future.running():
+                status.caption(f"⏳ Running… {time.perf_counter() - started:.1f}s")
+            else:
+                status.caption(f"⏳ Waiting for a free worker (ASK_WORKERS={ASK_WORKERS})…")
+            partial_sql = pipeline.draft(thread_id)
+            if partial_sql:
+                draft.code(partial_sql, language="sql")
+            time.sleep(0.1)
+        return future.result()
+    finally:
+        # A run still queued for a worker is dropped; a started one is stopped
+        if not future.done() and not future.cancel():
+            pipeline.cancel(thread_id)
+            future.add_done_callback(_discard)
+        status.empty()
+        draft.empty()
+        stop.empty()
+
+
+def set_latest_result(res):
+    old = st.session_state.latest_result
+    if old and old is not res and old.get("result") is not None:
+        old["result"].close()
+    st.session_state.latest_result = res
+
+
+def add_to_history(question, res):
     st.session_state.history = [
         item for item in st.session_state.history
         if item["question"].lower() != question.lower()
     ]
     st.session_state.history.append({
         "question": question,
-        "sql": sql,
-        "rows": rows,
+        "sql": res["sql"],
+        "result": res["result"],
+        "final": res.get("final"),
+        "fingerprint": res.get("fingerprint"),
+        "tables": res.get("tables", []),
+        "stamp": res.get("stamp"),
         "time": datetime.now().strftime("%H:%M:%S")
     })
     st.session_state.history = st.session_state.history[-15:]
 
 
-def df_from_rows(rows):
-    if isinstance(rows, list) and len(rows) > 0:
-        first = rows[0]
-        if isinstance(first, tuple):
-            df = pd.DataFrame([list(r) for r in rows])
-            df.columns = [f"Column {i+1}" for i in range(df.shape[1])]
-            return df
-        elif isinstance(first, dict):
-            return pd.DataFrame(rows)
-    return None
+def replay(item, mode):
+    """
+    ↺ from the history. mode "stored" serves the stored result when the
+    tables it was read from have not changed; otherwise (or in mode
+    "rerun") the stored SQL runs again without the LLM. Only a changed
+    schema fingerprint sends the question back through generation.
+    """
+    pipeline = load_pipeline()
+    if item["result"] is None or item["fingerprint"] != pipeline.schema_cache.get().fingerprint:
+        return ask(item["question"])
+
+    result = item["result"]
+    if (mode == "stored" and result.available
+            and pipeline.pool.data_stamp(item["tables"]) == item["stamp"]):
+        return {
+            "question": item["question"], "sql": item["sql"], "result": result,
+            "error": None, "final": item["final"], "cache_hit": "history",
+            "replayed": "stored", "fingerprint": item["fingerprint"],
+            "tables": item["tables"], "stamp": item["stamp"]
+        }
+
+    res = ask(item["question"], sql=item["sql"])
+    res["replayed"] = "rerun"
+    return res
 
 
 # ==============================================================  
-# Download Helpers  
+# Trace Waterfall  
 # ==============================================================  
-def export_as_csv(df):
-    return df.to_csv(index=False).encode("utf-8")
-
-
-def export_as_excel(df):
-    buf = io.BytesIO()
-    df.to_excel(buf, index=False, sheet_name="Results")
-    return buf.getvalue()
-
-
-def export_as_pdf(df):
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=letter)
-    data = [df.columns.tolist()] + df.values.tolist()
+def render_waterfall(trace):
+    """One bar per stage span, offset by its start within the question."""
+    spans = trace["spans"]
+    origin = trace["start"]
+    end = max([origin + trace["duration_ms"] / 1000]
+              + [s["start"] + s["duration_ms"] / 1000 for s in spans])
+    total = max(end - origin, 1e-6)
+
+    rows = []
+    for span in spans:
+        left = (span["start"] - origin) / total * 100
+        width = max(span["duration_ms"] / 1000 / total * 100, 0.5)
+        details = ", ".join(f"{k}={v}" for k, v in span["attributes"].items())
+        rows.append(
+            f'<div style="display:flex;align-items:center;font-size:12px;margin:2px 0;">'
+            f'<div style="width:140px;">{span["name"]}</div>'
+            f'<div style="flex:1;position:relative;height:14px;background:#0b1220;">'
+            f'<div title="{details}" style="position:absolute;left:{left:.2f}%;width:{width:.2f}%;'
+            f'height:100%;background:#7C3AED;border-radius:3px;"></div></div>'
+            f'<div style="width:80px;text-align:right;">{span["duration_ms"]:.1f} ms</div></div>'
+        )
+    st.markdown("".join(rows), unsafe_allow_html=True)
+
+    attrs = trace["attributes"]
+    st.caption(
+        f"{trace['duration_ms']:.0f} ms in the pipeline · {attrs.get('rows', 0):,} rows · "
+        f"{attrs.get('prompt_tokens', 0):,} prompt / {attrs.get('completion_tokens', 0):,} "
+        f"completion tokens · cache: {attrs.get('cache_hit') or 'miss'}"
+    )
 
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#7C3AED")),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN',(0,0),(-1,-1),'CENTER'),
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-    ]))
 
-    doc.build([table])
-    return buf.getvalue()
+# ==============================================================  
+# Download Helpers  
+# ==============================================================  
+@st.cache_resource
+def load_exports():
+    """Export files by result id, built only when a download is clicked."""
+    return ExportCache()
+
+
+def export_data(result, fmt, trace=None):
+    """Deferred download contents (runs when the button is clicked)."""
+    def build():
+        # An open file, not its bytes: Streamlit reads it once, and the
+        # file closes as soon as Streamlit drops it
+        f, span = timed_span(f"export_{fmt}", load_exports().open_file, result, fmt,
+                             attributes={"rows": len(result)})
+        span["attributes"]["bytes"] = os.fstat(f.fileno()).st_size
+        if trace is not None:
+            add_span(load_pipeline(), trace, span)
+        return f
+    return build
 
 
 # ==============================================================  
@@ -326,44 +385,42 @@ def export_as_pdf(df):
 # ==============================================================  
 def debug_sql(sql):
     try:
-        conn = sqlite3.connect(SQLITE_DB_PATH)
-        cur = conn.cursor()
+        with get_pool(SQLITE_DB_PATH).read() as conn:
+            cur = conn.cursor()
+            control = QueryControl()
 
-        try:
-            cur.execute(sql)
-            rows = cur.fetchall()
+            try:
+                control.attach(conn)
+                cur.execute(sql)
+                rows = cur.fetchmany(10)
+                cur.close()
 
-            return {
-                "ok": True,
-                "message": "SQL executed successfully!",
-                "rows": rows[:10]
-            }
-
-        except Exception as e:
-            err = str(e).lower()
-
-            if "no such table" in err:
                 return {
-                    "ok": False,
-                    "message": f"❌ Table does not exist.\n\nDetails: {e}\n\nHint: Check table name."
+                    "ok": True,
+                    "message": "SQL executed successfully!",
+                    "rows": rows
                 }
 
-            if "no such column" in err:
-                return {
-                    "ok": False,
-                    "message": f"❌ Column not found.\n\nDetails: {e}\n\nHint: Verify column names."
-                }
+            except Exception as e:
+                if control.reason:
+                    return {"ok": False, "message": f"⏹ {control.describe()}"}
+
+                kind = classify_error(e)
+
+                if kind in ERROR_HINTS:
+                    title, hint = ERROR_HINTS[kind]
+                    return {
+                        "ok": False,
+                        "message": f"{title}\n\nDetails: {e}\n\nHint: {hint}"
+                    }
 
-            if "syntax error" in err:
                 return {
                     "ok": False,
-                    "message": f"❌ SQL Syntax Error.\n\nDetails: {e}\n\nHint: Check commas, parentheses, missing keywords."
+                    "message": f"❌ Unknown SQL Error:\n\n{e}"
                 }
 
-            return {
-                "ok": False,
-                "message": f"❌ Unknown SQL Error:\n\n{e}"
-            }
+            finally:
+                control.detach()
 
     except Exception as e:
         return {"ok": False, "message": f"❌ Severe Error: {e}"}
@@ -393,24 +450,112 @@ with st.sidebar:
 
     st.header("📚 Database Schema")
     try:
-        schema = get_schema()
+        schema = get_schema(SQLITE_DB_PATH)
         if schema:
             for table, cols in schema.items():
                 with st.expander(f"📂 {table}"):
                     for col in cols:
                         st.markdown(f"- **{col['name']}** — {col['type']}")
+
+        cache_stats = get_schema_cache(SQLITE_DB_PATH).stats()
+        st.caption(
+            f"Schema cache: {cache_stats['hits']} hits / "
+            f"{cache_stats['misses']} misses"
+        )
     except:
         st.error("Schema error")
 
     st.markdown("---")
 
+    st.header("⚡ SQL Cache")
+    try:
+        sql_stats = load_pipeline().sql_cache.stats()
+        st.caption(
+            f"Hit rate {sql_stats['hit_rate']:.0%} "
+            f"({sql_stats['hits']} exact, {sql_stats['fuzzy_hits']} fuzzy, "
+            f"{sql_stats['misses']} misses) — "
+            f"{sql_stats['saved_seconds']:.1f}s of LLM time saved"
+        )
+
+        shots = load_pipeline().fewshot.stats()
+        st.caption(
+            f"Few-shot examples: {shots['examples']} stored "
+            f"({shots['confirmed']} confirmed), used for "
+            f"{shots['served']} of {shots['lookups']} generations"
+        )
+
+        tpl = load_pipeline().templates.stats()
+        st.caption(
+            f"Templates answered {tpl['handled']} of {tpl['questions']} questions "
+            f"({tpl['fraction']:.0%}) without the LLM"
+        )
+
+        shared = load_result_cache().stats()
+        st.caption(
+            f"Shared results: {shared['entries']} cached, "
+            f"{shared['hits']} hits / {shared['misses']} misses — "
+            f"{shared['saved_seconds']:.1f}s of query time saved"
+        )
+
+        repair = load_pipeline().repair_stats.stats()
+        st.caption(
+            f"Self-repair: {repair['fixed_locally']} fixed locally, "
+            f"{repair['fixed_by_llm']} via LLM ({repair['llm_calls']} calls), "
+            f"{repair['unrepaired']} unrepaired"
+        )
+    except Exception:
+        st.caption("Pipeline not ready.")
+
+    st.markdown("---")
+
+    st.header("🗂 Index Advisor")
+    try:
+        advisor = load_pipeline().index_advisor
+        adv = advisor.stats()
+        st.caption(
+            f"Mode: {adv['mode']} — {adv['observed']} queries observed, "
+            f"{adv['built']} indexes built, {adv['dropped']} dropped"
+        )
+
+        for name, info in advisor.built.items():
+            st.caption(f"✅ {info['table']}({', '.join(info['columns'])}) in {info['seconds']}s")
+
+        if adv["mode"] == "suggest":
+            for i, tip in enumerate(advisor.suggestions()):
+                label = f"Create index on {tip['table']}({', '.join(tip['columns'])})"
+                if st.button(label, key=f"idx{i}"):
+                    advisor.create(tip)
+                    st.rerun()
+
+        speedups = advisor.report()
+        if speedups:
+            with st.expander("Speedup per query"):
+                st.dataframe(
+                    pd.DataFrame(speedups)[["fingerprint", "speedup", "ms_without", "ms_with", "sql"]],
+                    use_container_width=True
+                )
+    except Exception:
+        st.caption("Index advisor not ready.")
+
+    st.markdown("---")
+
     st.header("🕘 Query History")
+    store_stats = load_results().stats()
+    st.caption(
+        f"{store_stats['results']} results stored "
+        f"({store_stats['rows']:,} rows, {store_stats['bytes'] / 1e6:.1f} MB on disk)"
+    )
+    replay_mode = st.radio(
+        "Replay",
+        ["Stored result if data unchanged", "Re-run stored SQL"],
+        key="replay_mode"
+    )
     for i, item in enumerate(reversed(st.session_state.history)):
         if st.button(f"↺ {item['question']} ({item['time']})", key=f"hist{i}"):
             st.session_state.question_input = item["question"]
-            res = run_graph(item["question"])
-            st.session_state.latest_result = res
-            add_to_history(item["question"], res["sql"], res["rows"])
+            res = replay(item, "stored" if replay_mode.startswith("Stored") else "rerun")
+            set_latest_result(res)
+            add_to_history(item["question"], res)
             st.rerun()
 
 
@@ -472,18 +617,25 @@ components.html(mic_html, height=70)
 
 
 st.markdown("---")
-st.header("📂 Upload CSV into Database")
+st.header("📂 Upload Data into Database")
 
 uploaded_file = st.file_uploader(
-    "Upload a CSV file to store in the database",
-    type=["csv"]
+    "Upload a CSV, Parquet, Arrow or JSONL file to store in the database",
+    type=["csv", "parquet", "arrow", "feather", "jsonl", "ndjson"]
 )
 
 table_name_input = st.text_input(
-    "Enter table name for this CSV data (SQLite)",
+    "Enter table name for this data (SQLite)",
     key="upload_table_name"
 )
 
+upload_mode = st.radio(
+    "If the table already exists",
+    ["Replace it", "Append rows"],
+    horizontal=True,
+    key="upload_mode"
+)
+
 # Session state
 if "uploaded_df" not in st.session_state:
     st.session_state.uploaded_df = None
@@ -492,46 +644,47 @@ if "uploaded_table" not in st.session_state:
     st.session_state.uploaded_table = None
 
 
-if st.button("📥 Upload CSV into SQLite"):
+if st.button("📥 Upload into SQLite"):
     if not uploaded_file:
-        st.warning("Please upload a CSV file first.")
+        st.warning("Please upload a file first.")
     elif not table_name_input.strip():
         st.warning("Please enter a valid table name.")
     else:
         try:
-            df_upload = pd.read_csv(uploaded_file)
-
-            conn = sqlite3.connect(SQLITE_DB_PATH)
-            cursor = conn.cursor()
-
-            # 🔥 IMPORTANT FIX: delete ALL old tables
-            cursor.execute("""
-                SELECT name FROM sqlite_master
-                WHERE type='table' AND name NOT LIKE 'sqlite_%';
-            """)
+            table = table_name_input.strip()
+            pool = get_pool(SQLITE_DB_PATH)
 
-            for table in cursor.fetchall():
-                cursor.execute(f'DROP TABLE IF EXISTS "{table[0]}"')
+            # Stream the file in chunks instead of loading it whole
+            progress = st.progress(0.0, text="Starting upload...")
 
-            conn.commit()
+            def show_progress(rows, position, total, seconds):
+                rate = rows / seconds if seconds else 0
+                done = min(position / total, 1.0) if position and total else 0.0
+                progress.progress(done, text=f"{rows:,} rows — {rate:,.0f} rows/s")
 
-            # Insert ONLY uploaded CSV
-            df_upload.to_sql(
-                table_name_input.strip(),
-                conn,
-                if_exists="replace",
-                index=False
+            summary = ingest_file(
+                pool, uploaded_file, table,
+                mode="append" if upload_mode.startswith("Append") else "replace",
+                on_progress=show_progress
             )
+            progress.empty()
 
-            conn.close()
+            # Shared results that read this table are stale for every session
+            load_pipeline().invalidate([table])
 
-            # Store for preview
-            st.session_state.uploaded_df = df_upload
-            st.session_state.uploaded_table = table_name_input.strip()
+            # Store for preview (a sample, not the whole file)
+            st.session_state.uploaded_df = pd.DataFrame(
+                summary["preview"], columns=summary["columns"]
+            )
+            st.session_state.uploaded_table = table
 
             st.success(
-                f"✅ Uploaded {len(df_upload)} rows into table "
-                f"'{table_name_input.strip()}'"
+                f"✅ Uploaded {summary['rows']:,} rows of {summary['format'].upper()} into table '{table}' "
+                f"in {summary['seconds']:.1f}s ({summary['rows_per_sec'] or 0:,} rows/s)"
+            )
+            st.caption(
+                f"{summary['mode'].capitalize()} — table now has {summary['table_rows']:,} rows · "
+                f"checksum {summary['checksum'][:16]}"
             )
 
         except Exception as e:
@@ -541,7 +694,7 @@ if st.button("📥 Upload CSV into SQLite"):
 # ------------------ Preview ------------------
 
 if st.session_state.uploaded_df is not None:
-    st.markdown("### 👀 Preview of uploaded data")
+    st.markdown("### 👀 Preview of uploaded data (first rows)")
     st.dataframe(
         st.session_state.uploaded_df,
         height=450,
@@ -564,16 +717,21 @@ if st.button("Run SQL Agent"):
     question = st.session_state.question_input
 
     if question.strip():
-        with st.spinner("Running agent..."):
-            ans = run_graph(question)
+        st.session_state.cancelled_question = None
+        ans = ask(question)
 
-        st.session_state.latest_result = ans
-        add_to_history(question, ans["sql"], ans["rows"])
+        set_latest_result(ans)
+        add_to_history(question, ans)
 
 
 
 
 
+if st.session_state.cancelled_question:
+    st.warning(f"⏹ Query cancelled: {st.session_state.cancelled_question}")
+    st.session_state.cancelled_question = None
+
+
 # ==============================================================  
 # RESULTS + FEATURE 7B + 7C + 7D + 9C  
 # ==============================================================  
@@ -600,41 +758,100 @@ if st.session_state.latest_result:
         unsafe_allow_html=True
     )
 
+    if ans.get("cache_hit") == "fuzzy":
+        st.warning(
+            f"⚠ This SQL was cached for a different question: "
+            f"“{ans.get('cache_question')}” — check that it answers yours."
+        )
+
     # ===================== SQL (COLLAPSED) =====================
     with st.expander("🔍 SQL", expanded=False):
         st.code(sql_generated)
+        if ans.get("replayed") == "stored":
+            st.caption("↺ Stored result — the data has not changed since it ran")
+        elif ans.get("cache_hit") == "history":
+            st.caption("↺ Stored SQL re-executed — no LLM call")
+        elif ans.get("cache_hit") == "template":
+            st.caption(f"📐 Answered by the '{ans['template']}' template — no LLM call")
+        elif ans.get("cache_hit") == "fuzzy":
+            st.caption(f"≈ Served from SQL cache, fuzzy match of “{ans.get('cache_question')}” — no LLM call")
+        elif ans.get("cache_hit"):
+            st.caption(f"⚡ Served from SQL cache ({ans['cache_hit']} match) — no LLM call")
+        if ans.get("result_cached"):
+            st.caption("🗄 Result shared from an earlier run of this SQL — the data has not changed")
+        if ans.get("repaired_by"):
+            st.caption(f"🛠 SQL auto-repaired ({ans['repaired_by']} fix)")
+        if ans.get("result") is not None and ans["result"].auto_limited:
+            st.caption("🛡 Full scan of a large table — LIMIT added automatically:")
+            st.code(ans["result"].sql)
+        if ans.get("result") is not None:
+            st.caption(f"⏱ {ans['result'].elapsed:.2f}s in SQLite")
+        if ans.get("interrupted"):
+            st.caption(f"⏹ Query stopped ({ans['interrupted']}) before returning rows")
+
+    # ===================== TRACE (COLLAPSED) =====================
+    if ans.get("trace"):
+        with st.expander("⏱ Trace", expanded=False):
+            render_waterfall(ans["trace"])
 
 # ===================== ACTION BUTTONS =====================
-    b1 = st.columns(1)[0]
+    b1, b2 = st.columns(2)
 
     with b1:
      explain = st.button("Explain")
 
+    with b2:
+     if ans.get("result") is not None and not ans.get("error"):
+         if st.button("👍 Correct answer"):
+             # Kept as a few-shot example for similar questions
+             load_pipeline().confirm(ans["question"], sql_generated)
+             st.success("Thanks — this answer will guide similar questions.")
+
 
     if explain:
         with st.expander("🧠 Explanation", expanded=True):
             st.markdown(explain_sql(sql_generated))
 
      # ===================== TABLE PREVIEW =====================
-    rows = parse_sql_rows(ans["rows"])
-    df = df_from_rows(rows)
+    result = ans.get("result")
+
+    if result is not None and not result.available:
+        st.warning("This result is no longer stored — ask the question again.")
 
-    if df is not None:
+    elif result is not None and len(result) > 0:
         st.markdown("### 📊 Preview")
-        st.dataframe(df.head(10), use_container_width=True)
 
-        if len(df) > 10:
-            with st.expander("Show full table"):
-                st.dataframe(df, use_container_width=True)
+        # Only the visible page is read from the result store
+        pages = -(-len(result) // PAGE_SIZE)
+        page = 1
+        if pages > 1:
+            page = st.number_input(
+                f"Page (of {pages:,})", min_value=1, max_value=pages, value=1,
+                key=f"page:{result.result_id}"
+            )
+        st.dataframe(result.page_frame(page - 1, PAGE_SIZE), use_container_width=True)
+
+        start = (page - 1) * PAGE_SIZE
+        st.caption(f"Rows {start + 1:,}–{min(start + PAGE_SIZE, len(result)):,} of {len(result):,}")
+
+        if result.interrupted:
+            st.warning(
+                f"Query stopped ({result.interrupted}) after {len(result)} rows — "
+                "the result is incomplete."
+            )
+        elif result.truncated:
+            st.caption(
+                f"Only the first {len(result):,} rows were stored — "
+                "narrow the query to see the rest."
+            )
 
         with st.expander("⬇️ Download", expanded=False):
             d1, d2, d3 = st.columns(3)
-            with d1:
-                st.download_button("CSV", export_as_csv(df), "results.csv")
-            with d2:
-                st.download_button("Excel", export_as_excel(df), "results.xlsx")
-            with d3:
-                st.download_button("PDF", export_as_pdf(df), "results.pdf")
+            for col, label, fmt in ((d1, "CSV", "csv"), (d2, "Excel", "xlsx"), (d3, "PDF", "pdf")):
+                file_name, mime = EXPORT_FORMATS[fmt]
+                with col:
+                    st.download_button(label, export_data(result, fmt, ans.get("trace")),
+                                       file_name, mime=mime)
 
 else:
     st.info("Ask a question or select a suggestion.")
@@ -0,0 +1,252 @@
+import os
+import re
+import threading
+
+from sql_cache import normalize_question
+
+
+# ====================================================
+#               SETTINGS (ENV OVERRIDABLE)
+# ====================================================
+
+# "on" answers template-shaped questions without the LLM; "off" disables it
+TEMPLATE_FAST_PATH = os.getenv("TEMPLATE_FAST_PATH", "on")
+
+
+# ====================================================
+#               NAME RESOLUTION
+# ====================================================
+
+def _variants(word):
+    """Singular/plural spellings of a word: employee <-> employees, category <-> categories."""
+    word = word.lower()
+    forms = [word, word + "s", word + "es"]
+    if word.endswith("ies"):
+        forms.append(word[:-3] + "y")
+    if word.endswith("es"):
+        forms.append(word[:-2])
+    if word.endswith("s"):
+        forms.append(word[:-1])
+    if word.endswith("y"):
+        forms.append(word[:-1] + "ies")
+    return forms
+
+
+def resolve(word, names):
+    """
+    The name in `names` that `word` refers to (case-insensitive, allowing
+    singular/plural), or None. Deliberately no fuzzy matching: a wrong
+    guess here would silently answer a different question.
+    """
+    lookup = {name.lower(): name for name in names}
+    for form in _variants(word.replace(" ", "_")):
+        if form in lookup:
+            return lookup[form]
+    return None
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def name_column(table, columns):
+    """The column that names a row: name, <table>_name, or the first TEXT column."""
+    lookup = {c["name"].lower(): c["name"] for c in columns}
+    for candidate in ["name"] + [f"{form}_name" for form in _variants(table)]:
+        if candidate in lookup:
+            return lookup[candidate]
+    for col in columns:
+        if "char" in col["type"].lower() or "text" in col["type"].lower():
+            return col["name"]
+    return None
+
+
+# ====================================================
+#               TEMPLATES
+# ====================================================
+
+_VERB = r"(?:list|show|get|display|give|return)?\s*"
+
+ROW_COUNTS = re.compile(
+    rf"^{_VERB}(?:all\s+)?tables\s+(?:and|with)\s+(?:their\s+)?row\s+counts?$"
+    rf"|^{_VERB}row\s+counts?\s+(?:of|for|in)\s+(?:all|every|each)\s+tables?$"
+    r"|^how\s+many\s+rows\s+(?:are\s+)?in\s+(?:each|every)\s+table$"
+)
+
+LIST_WITH_NAMES = re.compile(
+    rf"^{_VERB}(?:all\s+)?(?P<table>\w+)\s+(?:with|and)\s+(?:their\s+)?(?P<other>\w+?)\s+names?$"
+)
+
+LIST_ROWS = re.compile(
+    rf"^{_VERB}(?:all\s+)?(?:(?:rows|records|data|everything)\s+(?:from|in|of)\s+)?"
+    r"(?P<table>\w+)(?:\s+table)?$"
+)
+
+TOP_N = re.compile(
+    rf"^{_VERB}(?P<end>top|bottom|first|last)\s+(?P<n>\d+)\s+"
+    r"(?:(?:rows|records)\s+by\s+(?P<column>\w+)\s+(?:in|from|of)\s+(?P<table>\w+)"
+    r"|(?P<table2>\w+)\s+by\s+(?P<column2>\w+))$"
+)
+
+_AGGREGATES = {
+    "average": "AVG", "avg": "AVG", "mean": "AVG",
+    "min": "MIN", "minimum": "MIN", "lowest": "MIN",
+    "max": "MAX", "maximum": "MAX", "highest": "MAX",
+    "sum": "SUM", "total": "SUM",
+}
+_AGG_WORD = "|".join(_AGGREGATES)
+
+AGGREGATE = re.compile(
+    rf"^{_VERB}(?:what\s+(?:is|are)\s+)?"
+    rf"(?P<aggs>(?:(?:{_AGG_WORD})\s+(?:and\s+)?)+)(?:of\s+)?"
+    r"(?P<column>\w+)\s+(?:in|from|of|for)\s+(?P<table>\w+)$"
+)
+
+
+def row_counts(match, snapshot):
+    if not snapshot.tables:
+        return None
+    return "\nUNION ALL\n".join(
+        f"SELECT {_literal(table)} AS table_name, COUNT(*) AS row_count FROM {quote(table)}"
+        for table in snapshot.tables
+    )
+
+
+def list_rows(match, snapshot):
+    table = resolve(match["table"], snapshot.tables)
+    return f"SELECT * FROM {quote(table)}" if table else None
+
+
+def top_n(match, snapshot):
+    table = resolve(match["table"] or match["table2"], snapshot.tables)
+    if table is None:
+        return None
+    column = resolve(match["column"] or match["column2"],
+                     [c["name"] for c in snapshot.tables[table]])
+    if column is None:
+        return None
+    # "first N by C" reads C ascending; "last N by C" means the N highest,
+    # the same rows (and SQL) as "top N by C"
+    order = "ASC" if match["end"] in ("bottom", "first") else "DESC"
+    return (f"SELECT * FROM {quote(table)} ORDER BY {quote(column)} {order} "
+            f"LIMIT {int(match['n'])}")
+
+
+def aggregate(match, snapshot):
+    table = resolve(match["table"], snapshot.tables)
+    if table is None:
+        return None
+    column = resolve(match["column"], [c["name"] for c in snapshot.tables[table]])
+    if column is None:
+        return None
+
+    functions = []
+    for word in match["aggs"].split():
+        fn = _AGGREGATES.get(word)
+        if fn and fn not in functions:
+            functions.append(fn)
+    selects = ", ".join(
+        f"{fn}({quote(column)}) AS {quote(f'{fn.lower()}_{column}')}" for fn in functions
+    )
+    return f"SELECT {selects} FROM {quote(table)}"
+
+
+def _join(left, right, snapshot):
+    """ON clause joining two tables through a foreign key, either direction."""
+    for column, ref, ref_column in snapshot.references.get(left, []):
+        if ref == right:
+            return f"{quote(right)}.{quote(ref_column or 'rowid')} = {quote(left)}.{quote(column)}"
+    for column, ref, ref_column in snapshot.references.get(right, []):
+        if ref == left:
+            return f"{quote(right)}.{quote(column)} = {quote(left)}.{quote(ref_column or 'rowid')}"
+    return None
+
+
+def list_with_names(match, snapshot):
+    table = resolve(match["table"], snapshot.tables)
+    other = resolve(match["other"], snapshot.tables)
+    if table is None or other is None or table == other:
+        return None
+
+    own = name_column(table, snapshot.tables[table])
+    theirs = name_column(other, snapshot.tables[other])
+    if own is None or theirs is None:
+        return None
+    select = (f"SELECT {quote(table)}.{quote(own)}, {quote(other)}.{quote(theirs)} "
+              f"FROM {quote(table)}")
+
+    direct = _join(table, other, snapshot)
+    if direct:
+        return f"{select} JOIN {quote(other)} ON {direct}"
+
+    # Many-to-many through a link table that references both
+    for link in snapshot.tables:
+        if link in (table, other):
+            continue
+        first = _join(link, table, snapshot)
+        second = _join(link, other, snapshot)
+        if first and second:
+            return f"{select} JOIN {quote(link)} ON {first} JOIN {quote(other)} ON {second}"
+    return None
+
+
+# First match wins; list_rows, the loosest shape, goes last
+TEMPLATES = [
+    ("row_counts", ROW_COUNTS, row_counts),
+    ("list_with_names", LIST_WITH_NAMES, list_with_names),
+    ("top_n", TOP_N, top_n),
+    ("aggregate", AGGREGATE, aggregate),
+    ("list_rows", LIST_ROWS, list_rows),
+]
+
+
+# ====================================================
+#               MATCHER
+# ====================================================
+
+class TemplateMatcher:
+    """
+    Answers questions of a few fixed shapes (the sidebar's Smart
+    Suggestions) with SQL built from the cached schema, no LLM call.
+    A question that matches no template, or names a table or column
+    the schema does not have, falls through to generate_sql.
+    """
+
+    def __init__(self, enabled=TEMPLATE_FAST_PATH != "off"):
+        self.enabled = enabled
+        self.questions = 0
+        self.matched = {}
+        self._lock = threading.Lock()
+
+    def match(self, question, snapshot):
+        """Returns (sql, template name) or (None, None)."""
+        if not self.enabled:
+            return None, None
+
+        text = normalize_question(question)
+        found = None, None
+        for name, pattern, build in TEMPLATES:
+            m = pattern.match(text)
+            sql = build(m, snapshot) if m else None
+            if sql:
+                found = sql, name
+                break
+
+        with self._lock:
+            self.questions += 1
+            if found[1]:
+                self.matched[found[1]] = self.matched.get(found[1], 0) + 1
+        return found
+
+    def stats(self):
+        handled = sum(self.matched.values())
+        return {
+            "questions": self.questions,
+            "handled": handled,
+            "fraction": handled / self.questions if self.questions else 0.0,
+            "by_template": dict(self.matched),
+        }
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from db_pool import bump_data_version, get_pool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = get_pool(str(tmp_path / "x.db"))
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+        conn.execute("CREATE TABLE u (v INTEGER)")
+    return pool
+
+
+def external_insert(pool, table):
+    conn = sqlite3.connect(pool.db_path)
+    conn.execute(f"INSERT INTO {table} VALUES (1)")
+    conn.commit()
+    conn.close()
+
+
+def pool_insert(pool, table):
+    with pool.write() as conn:
+        conn.execute(f"INSERT INTO {table} VALUES (1)")
+        bump_data_version(conn, table)
+
+
+def test_pool_write_only_moves_its_table(pool):
+    before = pool.data_stamp(["t"])
+    pool_insert(pool, "u")
+    assert pool.data_stamp(["t"]) == before
+
+
+def test_external_commit_moves_every_stamp(pool):
+    before = pool.data_stamp(["t"])
+    external_insert(pool, "t")
+    assert pool.data_stamp(["t"]) != before
+
+
+def test_external_commit_next_to_a_pool_write_is_counted(pool):
+    before = pool.data_stamp(["t"])
+    external_insert(pool, "t")
+    pool_insert(pool, "u")
+    assert pool.data_stamp(["t"]) != before
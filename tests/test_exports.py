@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+import exports
+from db_pool import get_pool
+from exports import ExportCache
+from sql_executor import execute_query
+
+COUNT_TO = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c LIMIT {n}) SELECT x FROM c"
+
+
+@pytest.fixture
+def result(tmp_path):
+    result = execute_query(get_pool(str(tmp_path / "x.db")), COUNT_TO.format(n=100))
+    result.fetch_all()
+    yield result
+    result.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExportCache(str(tmp_path / "exports"))
+
+
+def test_export_is_built_once_and_opened_as_a_file(cache, result):
+    with cache.open_file(result, "csv") as f:
+        lines = f.read().decode().splitlines()
+    assert lines[0] == "x" and lines[1:] == [str(i) for i in range(1, 101)]
+
+    cache.open_file(result, "csv").close()
+    assert cache.stats() == {"hits": 1, "builds": 1, "files": 1}
+
+
+def test_failed_build_leaves_no_part_file(cache, result, monkeypatch):
+    def broken(result, path):
+        with open(path, "w") as f:
+            f.write("x\n1\n")
+        raise OSError("disk full")
+
+    monkeypatch.setitem(exports.WRITERS, "csv", broken)
+    with pytest.raises(OSError, match="disk full"):
+        cache.path(result, "csv")
+
+    assert os.listdir(cache.directory) == []
+    assert cache._building == {}
+
+    monkeypatch.undo()
+    assert cache.path(result, "csv").endswith(".csv")
@@ -0,0 +1,98 @@
+import pytest
+
+from bench.synth import build_database
+from db_pool import get_pool
+from index_advisor import INDEX_ADVISOR_MODE, IndexAdvisor, predicate_columns, scanned_tables
+from schema_cache import get_schema_cache
+from sql_executor import execute_query
+from sql_guard import SQLGuard
+
+SCAN = "SELECT name FROM employees WHERE department = 'Sales'"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return build_database(str(tmp_path / "company.db"), n_employees=100)
+
+
+@pytest.fixture
+def tables(db_path):
+    return get_schema_cache(db_path).get().tables
+
+
+def plan_of(db_path, sql):
+    """EXPLAIN QUERY PLAN details, as the guard records them for the advisor."""
+    return execute_query(get_pool(db_path), sql, guard=SQLGuard()).plan
+
+
+def test_default_mode_only_suggests():
+    assert INDEX_ADVISOR_MODE == "suggest"
+
+
+def test_predicate_columns_put_equality_first(tables):
+    sql = ("SELECT name FROM employees WHERE salary > 10 AND department = 'hire_date' "
+           "ORDER BY hire_date")
+    assert predicate_columns(sql, tables) == {
+        "employees": (["department", "salary", "hire_date"], ["name"])
+    }
+
+
+def test_predicate_columns_resolve_aliases_and_star(tables):
+    sql = ("SELECT * FROM employees e JOIN departments d ON e.department = d.department_name "
+           "WHERE d.manager = 'x'")
+    assert predicate_columns(sql, tables) == {
+        "employees": (["department"], None),
+        "departments": (["department_name", "manager"], None),
+    }
+
+
+def test_scanned_tables_ignore_index_lookups(db_path, tables):
+    assert scanned_tables(plan_of(db_path, SCAN), SCAN, tables) == {"employees"}
+
+    by_key = "SELECT name FROM employees WHERE id = 3"
+    assert scanned_tables(plan_of(db_path, by_key), by_key, tables) == set()
+    assert scanned_tables(["SCAN e USING COVERING INDEX ix"], "SELECT 1 FROM employees e",
+                          tables) == set()
+
+
+@pytest.mark.parametrize("min_score, suggested", [(200, True), (201, False)])
+def test_suggestion_needs_hits_times_rows(db_path, tables, min_score, suggested):
+    advisor = IndexAdvisor(get_pool(db_path), mode="suggest", min_hits=2, min_score=min_score)
+    plan = plan_of(db_path, SCAN)
+
+    advisor.observe(SCAN, plan, 0.01, tables)
+    assert advisor.suggestions() == []
+
+    advisor.observe(SCAN.replace("Sales", "HR"), plan, 0.01, tables)
+    tips = advisor.suggestions()
+    assert bool(tips) == suggested
+    if suggested:
+        assert tips[0]["columns"] == ["department", "name"] and tips[0]["score"] == 200
+        assert advisor.built == {}
+
+
+def test_idle_advisor_index_is_dropped(db_path, tables):
+    advisor = IndexAdvisor(get_pool(db_path), mode="suggest", min_hits=1, min_score=1,
+                           idle_queries=2)
+    advisor.observe(SCAN, plan_of(db_path, SCAN), 0.01, tables)
+    tip = advisor.suggestions()[0]
+    advisor.create(tip)
+
+    used = plan_of(db_path, SCAN)
+    assert any(tip["name"] in detail for detail in used)
+    other = "SELECT 1 FROM departments WHERE id = 1"
+    for _ in range(3):
+        advisor.observe(SCAN, used, 0.001, tables)
+        advisor.observe(other, plan_of(db_path, other), 0.001, tables)
+    assert advisor.stale_indexes() == []
+
+    for _ in range(3):
+        advisor.observe(other, plan_of(db_path, other), 0.001, tables)
+    assert advisor.stale_indexes() == [tip["name"]]
+
+    advisor.maintain()
+    assert advisor.dropped == [tip["name"]]
+    assert tip["name"] not in advisor.built
+    with get_pool(db_path).read() as conn:
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?",
+                                (tip["name"],)).fetchone()
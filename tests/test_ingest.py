@@ -0,0 +1,46 @@
+import io
+import sqlite3
+
+import pytest
+
+from db_pool import get_pool
+from ingest import ingest_csv, ingest_jsonl
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return get_pool(str(tmp_path / "test.db"))
+
+
+def synchronous(pool):
+    with pool.write() as conn:
+        return conn.execute("PRAGMA synchronous").fetchone()[0]
+
+
+def test_malformed_row_propagates_and_restores_the_writer(pool):
+    lines = [b'{"id": %d, "name": "n%d"}' % (i, i) for i in range(6)]
+    lines.insert(4, b'{"id": 99, "name": ')
+    data = io.BytesIO(b"\n".join(lines))
+
+    with pytest.raises(ValueError, match="Line 5 is not valid JSON"):
+        ingest_jsonl(pool, data, "people", sample_rows=2, chunk_rows=2)
+
+    assert synchronous(pool) == 1   # NORMAL, not left at OFF (0)
+    with pool.read() as conn:
+        with pytest.raises(sqlite3.OperationalError, match="no such table"):
+            conn.execute("SELECT * FROM people")
+
+    # The writer is usable again
+    summary = ingest_csv(pool, io.BytesIO(b"id,name\n1,a\n2,b\n"), "people")
+    assert summary["table_rows"] == 2
+
+
+def test_failed_append_keeps_existing_rows(pool):
+    ingest_csv(pool, io.BytesIO(b"id,name\n1,a\n2,b\n"), "people")
+    data = io.BytesIO(b'{"id": 3, "name": "c"}\n{"id": 4, "name": "d"}\nnot json\n')
+
+    with pytest.raises(ValueError, match="Line 3"):
+        ingest_jsonl(pool, data, "people", mode="append", sample_rows=1, chunk_rows=1)
+
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM people").fetchone()[0] == 2
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bench.llm import StubLLM
+from bench.synth import build_database
+from langgraph_workflow import QueryPipeline, ThreadBusy
+from sql_cache import SQLCache
+from templates import TemplateMatcher
+
+SQL = "SELECT COUNT(*) FROM employees"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return build_database(str(tmp_path / "company.db"), n_employees=50)
+
+
+def make_pipeline(db_path, llm):
+    return QueryPipeline(db_path, llm=llm, sql_cache=SQLCache(":memory:"),
+                         templates=TemplateMatcher(enabled=False))
+
+
+def test_async_runs_execute_on_the_pipeline_pool(db_path, monkeypatch):
+    pipeline = make_pipeline(db_path, StubLLM(lambda prompt: SQL))
+    threads = set()
+
+    import langgraph_workflow
+    execute = langgraph_workflow.execute_query
+
+    def recording(*args, **kwargs):
+        threads.add(threading.current_thread().name)
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(langgraph_workflow, "execute_query", recording)
+    answers = asyncio.run(pipeline.arun_batch([f"how many employees {i}" for i in range(4)]))
+
+    assert [a["error"] for a in answers] == [None] * 4
+    assert threads and all(name.startswith("pipeline") for name in threads)
+
+
+def test_local_repairs_are_not_cached(db_path):
+    llm = StubLLM(lambda prompt: "SELECT nme FROM employees")
+    pipeline = make_pipeline(db_path, llm)
+
+    first = pipeline.run("list employee names")
+    assert first["error"] is None and first["repaired_by"] == "local"
+    assert first["sql"] == "SELECT name FROM employees"
+
+    second = pipeline.run("list employee names")
+    assert second["cache_hit"] is None and llm.calls == 2
+
+
+def test_cancel_during_generation_never_runs_the_query(db_path, monkeypatch):
+    llm = StubLLM(lambda prompt: SQL + " WHERE salary > 0 ORDER BY name", per_chunk=0.05)
+    pipeline = make_pipeline(db_path, llm)
+    executed = []
+
+    import langgraph_workflow
+    monkeypatch.setattr(langgraph_workflow, "execute_query",
+                        lambda *args, **kwargs: executed.append(args))
+
+    with ThreadPoolExecutor(1) as workers:
+        future = workers.submit(pipeline.run, "how many employees", "t1")
+        while not pipeline.draft("t1"):
+            time.sleep(0.01)
+        assert pipeline.cancel("t1")
+        res = future.result(timeout=5)
+
+    assert res["interrupted"] == "cancelled" and res["result"] is None
+    assert executed == [] and llm.calls == 1
+    assert llm.chunks_sent < len(SQL + " WHERE salary > 0 ORDER BY name") // 8
+    assert not pipeline.cancel("t1")
+
+
+def test_second_run_on_a_busy_thread_is_rejected(db_path):
+    pipeline = make_pipeline(db_path, StubLLM(lambda prompt: SQL, latency=0.3))
+
+    with ThreadPoolExecutor(1) as workers:
+        future = workers.submit(pipeline.run, "how many employees", "t1")
+        while "t1" not in pipeline._busy:
+            time.sleep(0.01)
+        with pytest.raises(ThreadBusy):
+            pipeline.run("how many employees", "t1")
+        assert future.result(timeout=5)["error"] is None
+
+    assert pipeline.run("how many employees", "t1")["error"] is None
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from db_pool import get_pool
+from result_store import STORE_BATCH_ROWS, ResultStore
+from sql_executor import QueryControl, execute_query
+
+# Rows without a table: 1..n from a recursive CTE
+COUNT_TO = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c LIMIT {n}) SELECT x FROM c"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return get_pool(str(tmp_path / "source.db"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+
+def test_timeout_covers_the_whole_drain(pool, store):
+    control = QueryControl(timeout=0.05)
+    result = execute_query(pool, COUNT_TO.format(n=50_000_000), max_rows=1000, control=control)
+
+    started = time.perf_counter()
+    stored = store.save(result)
+
+    assert time.perf_counter() - started < 2
+    assert stored.interrupted == "timeout"
+    assert stored.truncated and 0 < stored.num_rows < 50_000_000
+
+
+def test_rows_are_written_in_short_transactions(pool, store):
+    n = 3 * STORE_BATCH_ROWS + 5
+    result = execute_query(pool, COUNT_TO.format(n=n), max_rows=STORE_BATCH_ROWS + 1)
+    writes = store.pool.writes
+
+    stored = store.save(result)
+
+    assert stored.num_rows == n and not stored.truncated
+    assert stored.page(0, 3) == [(1,), (2,), (3,)]
+    assert store.pool.writes - writes >= 5    # create, 4 batches, metadata
+
+
+def test_failed_save_leaves_nothing_behind(pool, store):
+    result = execute_query(pool, COUNT_TO.format(n=10), max_rows=5)
+    result.stream.fetch = lambda **kwargs: 1 / 0
+
+    with pytest.raises(ZeroDivisionError):
+        store.save(result)
+    assert not store.has(result.result_id)
+    assert store.rows(result.result_id, 0, 5) == []
@@ -0,0 +1,47 @@
+from schema_cache import SchemaSnapshot
+from schema_retrieval import SchemaIndex, tokenize
+
+
+def build_index():
+    index = SchemaIndex()
+    index.add_table("employees", ["id", "name", "salary", "department"],
+                    [(1, "Alice", 90000, "Engineering")])
+    index.add_table("departments", ["id", "department_name", "manager"],
+                    [(1, "Engineering", "Bob")])
+    index.add_table("projects", ["id", "project_name", "department_id"],
+                    [(1, "Apollo", 1)])
+    index.add_table("employee_projects", ["employee_id", "project_id", "role"], [])
+    return index
+
+
+def test_tokenize_splits_names_and_drops_stopwords():
+    assert tokenize("Show all employeeProjects") == ["employee", "project"]
+    assert tokenize("department_name") == ["department", "name"]
+    assert tokenize("address") == ["address"]
+
+
+def test_names_rank_above_values():
+    assert build_index().top_tables("average salary", 1) == ["employees"]
+    assert build_index().top_tables("who manages each department", 1) == ["departments"]
+
+
+def test_no_matching_terms_scores_nothing():
+    assert build_index().score("weather forecast") == {}
+
+
+def test_relevant_tables_adds_foreign_key_neighbours():
+    snapshot = SchemaSnapshot(
+        key=None,
+        tables={t: [] for t in ("employees", "departments", "projects", "employee_projects")},
+        table_info={},
+        foreign_keys={"employee_projects": {"employees", "projects"},
+                      "projects": {"departments"}},
+        index=build_index(),
+    )
+    # projects references departments, and the link table references projects
+    assert snapshot.relevant_tables("project names", 1) == \
+        ["departments", "projects", "employee_projects"]
+    # Nothing matches: every table
+    assert snapshot.relevant_tables("weather", 1) == list(snapshot.tables)
+    # Small schemas are never pruned
+    assert snapshot.relevant_tables("salary", 10) == list(snapshot.tables)
@@ -0,0 +1,53 @@
+import pytest
+
+from db_pool import bump_data_version, get_pool
+from result_store import ResultStore
+from shared_cache import ResultCache, SQLiteBackend
+from sql_executor import execute_query
+
+SQL = "SELECT n FROM t"
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = get_pool(str(tmp_path / "source.db"))
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE t (n INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    return pool
+
+
+def make_cache(tmp_path, pool, name):
+    store = ResultStore(str(tmp_path / f"{name}.db"))
+    return ResultCache(pool, store, SQLiteBackend(str(tmp_path / "shared.db"), "results"))
+
+
+def run(cache, pool):
+    stamp = pool.data_stamp(["t"])
+    return cache.save(execute_query(pool, SQL), SQL, ["t"], stamp)
+
+
+def test_hit_while_data_is_unchanged(tmp_path, pool):
+    cache = make_cache(tmp_path, pool, "a")
+    stored = run(cache, pool)
+    assert cache.get(SQL + " ;").result_id == stored.result_id
+
+
+def test_changed_stamp_is_a_miss_that_keeps_the_entry(tmp_path, pool):
+    cache = make_cache(tmp_path, pool, "a")
+    run(cache, pool)
+    with pool.write() as conn:
+        bump_data_version(conn, "t")
+
+    assert cache.get(SQL) is None
+    assert len(cache.backend) == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_processes_sharing_a_backend_file_keep_their_own_entries(tmp_path, pool):
+    first = make_cache(tmp_path, pool, "first")     # stores stand in for two processes
+    second = make_cache(tmp_path, pool, "second")
+    run(first, pool)
+
+    assert second.get(SQL) is None
+    assert first.get(SQL) is not None
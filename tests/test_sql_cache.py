@@ -0,0 +1,56 @@
+import pytest
+
+from sql_cache import SQLCache, normalize_question
+
+SCHEMA = ["employees", "departments", "id", "name", "salary", "department",
+          "department_name", "manager"]
+
+
+@pytest.fixture
+def cache():
+    return SQLCache(":memory:")
+
+
+@pytest.fixture
+def fuzzy():
+    return SQLCache(":memory:", fuzzy_threshold=0.5)
+
+
+def test_normalize_question_drops_filler_and_punctuation():
+    assert normalize_question("Can you list all employees, please!") == "list all employees"
+
+
+def test_exact_hit_survives_rewording_filler(cache):
+    cache.put("List all employees", "fp", "SELECT * FROM employees")
+    assert cache.get("please list all employees!", "fp") == \
+        ("SELECT * FROM employees", "exact", "List all employees")
+
+
+def test_schema_change_misses(cache):
+    cache.put("List all employees", "fp", "SELECT * FROM employees")
+    assert cache.get("List all employees", "other-fp") == (None, None, None)
+
+
+def test_fuzzy_is_off_by_default(cache):
+    cache.put("employees who are not managers", "fp", "SELECT 1")
+    assert cache.get("which employees who are not managers", "fp", SCHEMA)[0] is None
+
+
+def test_fuzzy_hit_reports_the_cached_question(fuzzy):
+    fuzzy.put("list every employee who is a manager", "fp", "SELECT 1")
+    assert fuzzy.get("show every employee who is a manager", "fp", SCHEMA) == \
+        ("SELECT 1", "fuzzy", "list every employee who is a manager")
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("employees who are not managers", "employees who are managers"),
+    ("employees earning more than average", "employees earning less than average"),
+    ("employees with salary above average", "employees with salary below average"),
+    ("top employees by salary", "bottom employees by salary"),
+    ("employees sorted by salary asc", "employees sorted by salary desc"),
+    ("average salary per department", "average salary per manager"),
+    ("employees with 5 projects", "employees with 6 projects"),
+])
+def test_fuzzy_rejects_meaning_changes(fuzzy, cached, asked):
+    fuzzy.put(cached, "fp", "SELECT 1")
+    assert fuzzy.get(asked, "fp", SCHEMA) == (None, None, None)
@@ -0,0 +1,35 @@
+import sqlite3
+
+import pytest
+
+from db_pool import get_pool
+from sql_executor import ResultRegistry, execute_query
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (n INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(50)])
+    conn.commit()
+    conn.close()
+    return get_pool(path)
+
+
+def test_registry_closes_evicted_streams(pool):
+    registry = ResultRegistry(capacity=2)
+    results = [execute_query(pool, "SELECT n FROM t", max_rows=5, batch_size=5)
+               for _ in range(3)]
+    for result in results:
+        registry.add(result)
+
+    assert registry.get(results[0].result_id) is None
+    assert results[0].stream.cut_short
+    # Rows already read stay usable; the rest are gone
+    assert results[0].num_rows == 5 and results[0].truncated
+    results[0].fetch_all()
+    assert results[0].num_rows < 50 and results[0].truncated
+
+    results[2].fetch_all()
+    assert results[2].num_rows == 50 and not results[2].truncated
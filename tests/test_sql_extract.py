@@ -0,0 +1,56 @@
+import pytest
+
+from sql_extract import SQLExtractor, extract_sql
+
+
+def stream(text, size):
+    """Feeds text in chunks of `size`; returns (sql, chars fed before done)."""
+    extractor = SQLExtractor()
+    fed = 0
+    for i in range(0, len(text), size):
+        fed = i + size
+        if extractor.feed(text[i:i + size]):
+            break
+    return extractor.sql, min(fed, len(text))
+
+
+CASES = [
+    # preamble that itself contains "select"
+    ("Here I select the employees:\n```sql\nSELECT name FROM employees\n```\nThis lists them.",
+     "SELECT name FROM employees"),
+    # fenced block with commentary around it
+    ("Sure!\n```sql\nSELECT COUNT(*)\nFROM employees;\n```\nIt counts rows.",
+     "SELECT COUNT(*)\nFROM employees"),
+    # unfenced statement after a preamble
+    ("The query is:\nSELECT * FROM t WHERE x > 1; Hope this helps.",
+     "SELECT * FROM t WHERE x > 1"),
+    # ';' inside a string literal does not end the statement
+    ("```sql\nSELECT * FROM t WHERE note = 'a;b'\n```",
+     "SELECT * FROM t WHERE note = 'a;b'"),
+    ("SELECT 'x; y' AS v FROM t; -- then more text",
+     "SELECT 'x; y' AS v FROM t"),
+    # a CTE on its own line; prose starting with "With" is not SQL
+    ("With pleasure:\nWITH top AS (SELECT 1) SELECT * FROM top;",
+     "WITH top AS (SELECT 1) SELECT * FROM top"),
+]
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+@pytest.mark.parametrize("size", [1, 3, 7, 10_000])
+def test_streaming_matches_whole_response(text, expected, size):
+    sql, _ = stream(text, size)
+    assert sql == expected
+    assert extract_sql(text) == expected
+
+
+def test_stops_reading_at_the_end_of_the_statement():
+    text = "```sql\nSELECT 1;\n```\n" + "Explanation. " * 100
+    _, fed = stream(text, 4)
+    assert fed < 20
+
+
+def test_mid_line_select_is_only_a_last_resort():
+    extractor = SQLExtractor()
+    assert not extractor.feed("Here I select the rows")
+    assert extractor.partial == ""          # still buffering, nothing committed
+    assert extract_sql("Use this: select id from t; ok") == "select id from t"
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from sql_guard import GuardRejected, SQLGuard, read_only, strip_comments, table_aliases
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    for table in ("a", "b", "c"):
+        conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, v TEXT)")
+        conn.executemany(f"INSERT INTO {table} (v) VALUES (?)", [("x",)] * 1000)
+    return conn
+
+
+def check(conn, sql, **kwargs):
+    with read_only(conn):
+        return SQLGuard(**kwargs).check(conn, sql, ["a", "b", "c"])
+
+
+def test_table_aliases_include_comma_joins():
+    assert table_aliases("SELECT * FROM a, b AS y, c z WHERE a.id = 1", ["a", "b", "c"]) == \
+        {"a": "a", "b": "b", "y": "b", "c": "c", "z": "c"}
+
+
+def test_comma_cartesian_join_is_rejected(conn):
+    with pytest.raises(GuardRejected, match="3 full table scans"):
+        check(conn, "SELECT * FROM a, b, c", join_rows=10_000_000)
+
+
+def test_aliased_comma_join_is_rejected(conn):
+    with pytest.raises(GuardRejected, match="2 full table scans"):
+        check(conn, "SELECT * FROM a x, b AS y", join_rows=100_000)
+
+
+def test_indexed_join_passes(conn):
+    verdict = check(conn, "SELECT * FROM a, b WHERE a.id = b.id", join_rows=100_000)
+    assert not verdict["auto_limited"]
+
+
+def test_trailing_line_comment_is_accepted(conn):
+    verdict = check(conn, "SELECT v FROM a LIMIT 5 -- first five")
+    assert verdict["sql"] == "SELECT v FROM a LIMIT 5"
+
+
+def test_comment_markers_inside_literals_are_kept():
+    assert strip_comments("SELECT '--x' /* c */ FROM a -- d\n") == "SELECT '--x'   FROM a \n"
+
+
+def test_incomplete_and_write_statements_are_rejected(conn):
+    with pytest.raises(GuardRejected, match="complete"):
+        check(conn, "SELECT 'unterminated")
+    with pytest.raises(GuardRejected, match="read-only"):
+        check(conn, "DELETE FROM a")
+
+
+def test_plan_sees_index_created_by_another_connection(tmp_path):
+    path = str(tmp_path / "x.db")
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE a (id INTEGER PRIMARY KEY, v TEXT)")
+    writer.commit()
+    reader = sqlite3.connect(path)
+    sql = "SELECT id FROM a WHERE v = 'x'"
+    assert check(reader, sql)["plan"] == ["SCAN a"]
+
+    writer.execute("CREATE INDEX a_v ON a (v)")
+    writer.commit()
+    assert "INDEX a_v" in check(reader, sql)["plan"][0]
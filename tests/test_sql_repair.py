@@ -0,0 +1,39 @@
+import pytest
+
+from bench.synth import build_database
+from schema_cache import get_schema_cache
+from sql_repair import local_repair
+
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    path = build_database(str(tmp_path_factory.mktemp("repair") / "company.db"), n_employees=10)
+    return get_schema_cache(path).get()
+
+
+def test_misspelled_column_is_fixed_outside_string_literals(snapshot):
+    sql = "SELECT * FROM departments WHERE department_nam LIKE 'department_nam%'"
+    fixed = local_repair(sql, "no such column: department_nam", snapshot)
+    assert fixed == "SELECT * FROM departments WHERE department_name LIKE 'department_nam%'"
+
+
+def test_misspelled_table_keeps_quotes(snapshot):
+    fixed = local_repair('SELECT name FROM "employes"', "no such table: employes", snapshot)
+    assert fixed == 'SELECT name FROM "employees"'
+
+
+@pytest.mark.parametrize("sql, fixed", [
+    ("SELECT name, FROM employees", "SELECT name FROM employees"),
+    ("SELECT name,, salary FROM employees ORDER BY salary",
+     "SELECT name, salary FROM employees ORDER BY salary"),
+    ("SELECT COUNT(*) FROM employees GROUP BY department,", "SELECT COUNT(*) FROM employees GROUP BY department"),
+    ("SELECT name, FROM employees WHERE name = 'a, FROM b'",
+     "SELECT name FROM employees WHERE name = 'a, FROM b'"),
+])
+def test_syntax_fix_only_drops_stray_commas(snapshot, sql, fixed):
+    assert local_repair(sql, 'near "FROM": syntax error', snapshot) == fixed
+
+
+def test_unfixable_syntax_error_is_left_to_the_llm(snapshot):
+    sql = "SELECT name FROM employees ORDER BY salary DESC LIMT 5"
+    assert local_repair(sql, 'near "LIMT": syntax error', snapshot) is None
@@ -0,0 +1,81 @@
+import runpy
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from schema_cache import get_schema_cache
+from templates import TemplateMatcher
+
+CREATE_DB = Path(__file__).resolve().parent.parent / "create_db.py"
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    """The demo database, built by create_db.py in a scratch directory."""
+    directory = tmp_path_factory.mktemp("templates")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(directory)
+        runpy.run_path(str(CREATE_DB))
+    return str(directory / "database.db")
+
+
+@pytest.fixture(scope="module")
+def snapshot(db_path):
+    return get_schema_cache(db_path).get()
+
+
+def match(question, snapshot):
+    return TemplateMatcher(enabled=True).match(question, snapshot)
+
+
+@pytest.mark.parametrize("question, template, sql", [
+    ("List all tables and their row counts", "row_counts",
+     "SELECT 'employees' AS table_name, COUNT(*) AS row_count FROM \"employees\"\nUNION ALL\n"
+     "SELECT 'departments' AS table_name, COUNT(*) AS row_count FROM \"departments\"\nUNION ALL\n"
+     "SELECT 'projects' AS table_name, COUNT(*) AS row_count FROM \"projects\"\nUNION ALL\n"
+     "SELECT 'employee_projects' AS table_name, COUNT(*) AS row_count FROM \"employee_projects\""),
+    ("list projects with their department names", "list_with_names",
+     'SELECT "projects"."project_name", "departments"."department_name" FROM "projects" '
+     'JOIN "departments" ON "departments"."id" = "projects"."department_id"'),
+    ("list employees with their project names", "list_with_names",
+     'SELECT "employees"."name", "projects"."project_name" FROM "employees" '
+     'JOIN "employee_projects" ON "employees"."id" = "employee_projects"."employee_id" '
+     'JOIN "projects" ON "projects"."id" = "employee_projects"."project_id"'),
+    ("top 3 employees by salary", "top_n",
+     'SELECT * FROM "employees" ORDER BY "salary" DESC LIMIT 3'),
+    ("bottom 2 rows by salary in employees", "top_n",
+     'SELECT * FROM "employees" ORDER BY "salary" ASC LIMIT 2'),
+    ("What is the average salary in employees?", "aggregate",
+     'SELECT AVG("salary") AS "avg_salary" FROM "employees"'),
+    ("min and max salary of employees", "aggregate",
+     'SELECT MIN("salary") AS "min_salary", MAX("salary") AS "max_salary" FROM "employees"'),
+    ("show all employees", "list_rows", 'SELECT * FROM "employees"'),
+    ("show everything from departments", "list_rows", 'SELECT * FROM "departments"'),
+])
+def test_template_sql(snapshot, db_path, question, template, sql):
+    assert match(question, snapshot) == (sql, template)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(sql).fetchall()
+
+
+def test_first_is_ascending_and_last_is_the_same_as_top(snapshot):
+    first, _ = match("first 3 employees by salary", snapshot)
+    assert first == 'SELECT * FROM "employees" ORDER BY "salary" ASC LIMIT 3'
+    assert match("last 3 employees by salary", snapshot) == match("top 3 employees by salary", snapshot)
+
+
+@pytest.mark.parametrize("question", [
+    "list employees with their manager names",          # manager is a column, not a table
+    "average salary in employees by department",
+    "total salary of employees hired after 2021",
+    "top 3 employees by bonus",                          # no such column
+    "show all customers",                                # no such table
+    "which department has the most projects",
+])
+def test_other_questions_fall_through(snapshot, question):
+    assert match(question, snapshot) == (None, None)
+
+
+def test_disabled_matcher_never_matches(snapshot):
+    assert TemplateMatcher(enabled=False).match("show all employees", snapshot) == (None, None)
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+
+# ====================================================
+#               SETTINGS (ENV OVERRIDABLE)
+# ====================================================
+
+# File finished traces are appended to ("" = don't write any)
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+
+# "jsonl": one line per question with all its spans
+# "otel":  one line per span, OpenTelemetry (OTLP/JSON) field names
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "jsonl")
+
+# Span attributes copied from a node's state update when present
+SPAN_KEYS = (
+    "cache_hit", "template", "examples", "repaired_by", "result_cached",
+    "interrupted", "prompt_tokens", "completion_tokens",
+)
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Rough BPE-like count (words and punctuation) when the API reports none."""
+    return len(_TOKEN.findall(text or ""))
+
+
+# ====================================================
+#               SPANS
+# ====================================================
+
+def make_span(name, start, seconds, attributes=None):
+    """A span as a plain dict (it travels in graph state and session state)."""
+    return {
+        "name": name,
+        "span_id": uuid.uuid4().hex[:16],
+        "start": start,
+        "duration_ms": round(seconds * 1000, 3),
+        "attributes": attributes or {},
+    }
+
+
+def node_attributes(update):
+    """Span attributes for a graph node, read off its state update."""
+    attrs = {key: update[key] for key in SPAN_KEYS if update.get(key) not in (None, False)}
+    if update.get("result"):
+        attrs["rows"] = update["result"]["num_rows"]
+    if "schema_tables" in update:
+        attrs["tables"] = len(update["schema_tables"])
+    if update.get("error"):
+        attrs["error"] = update["error"][:200]
+    return attrs
+
+
+def build_trace(question, start, seconds, spans, attributes=None):
+    """The whole question: a root span's timing plus its stage spans."""
+    return {
+        "trace_id": uuid.uuid4().hex,
+        "question": question,
+        "start": start,
+        "duration_ms": round(seconds * 1000, 3),
+        "attributes": attributes or {},
+        "spans": sorted(spans, key=lambda s: s["start"]),
+    }
+
+
+# ====================================================
+#               EXPORT
+# ====================================================
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otel_span(trace_id, span, parent=None):
+    start = int(span["start"] * 1e9)
+    return {
+        "traceId": trace_id,
+        "spanId": span["span_id"],
+        "parentSpanId": parent or "",
+        "name": span["name"],
+        "kind": 1,                               # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(start + int(span["duration_ms"] * 1e6)),
+        "attributes": [
+            {"key": key, "value": _otel_value(value)}
+            for key, value in span["attributes"].items()
+        ],
+    }
+
+
+def otel_spans(trace):
+    """The trace as OTLP/JSON spans: a "question" root plus one child per stage."""
+    root = {
+        "name": "question", "span_id": trace["trace_id"][:16],
+        "start": trace["start"], "duration_ms": trace["duration_ms"],
+        "attributes": {"question": trace["question"], **trace["attributes"]},
+    }
+    return [_otel_span(trace["trace_id"], root)] + [
+        _otel_span(trace["trace_id"], span, root["span_id"]) for span in trace["spans"]
+    ]
+
+
+class TraceExporter:
+    """Appends finished traces to a local file as JSON lines (thread-safe)."""
+
+    def __init__(self, path=TRACE_FILE, fmt=TRACE_FORMAT):
+        if fmt not in ("jsonl", "otel"):
+            raise ValueError(f"Unknown TRACE_FORMAT: {fmt!r}")
+        self.path = path
+        self.fmt = fmt
+        self.exported = 0
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        if not self.path:
+            return
+        if self.fmt == "otel":
+            lines = [json.dumps(span) for span in otel_spans(trace)]
+        else:
+            lines = [json.dumps(trace)]
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            self.exported += 1
+
+    def export_span(self, trace, span):
+        """A span added after the question finished (e.g. a download)."""
+        if not self.path:
+            return
+        if self.fmt == "otel":
+            line = json.dumps(_otel_span(trace["trace_id"], span, trace["trace_id"][:16]))
+        else:
+            line = json.dumps({"trace_id": trace["trace_id"], "span": span})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def timed_span(name, func, *args, attributes=None):
+    """Runs func(*args) and returns (its result, a span for the call)."""
+    start, t0 = time.time(), time.perf_counter()
+    value = func(*args)
+    return value, make_span(name, start, time.perf_counter() - t0, attributes)